@@ -0,0 +1,185 @@
+import io
+import os
+import csv
+import zlib
+import sqlite3
+import tempfile
+
+CSV_HEADER = ["image_name", "label", "session_id", "timestamp"]
+
+
+class AnnotationStore:
+    def __init__(self, db_path):
+        """
+        SQLite-backed annotation store indexed by image name.
+        Keeps the same "last row wins" semantics as annotations.csv.
+        WAL mode, unless the store was marked shared (see set_shared()).
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS annotations (
+                                     image_name TEXT PRIMARY KEY,
+                                     label TEXT NOT NULL,
+                                     session_id TEXT,
+                                     timestamp TEXT)""")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.shared = self.get_meta("shared") == "1"
+        self._set_journal_mode()
+
+    def set_shared(self):
+        """
+        Switches to a rollback journal for annotators on several machines: WAL relies on
+        shared memory, which network filesystems (NFS/SMB) do not provide. The choice is
+        stored in the database, so every later open keeps it.
+        """
+        if not self.shared:
+            self.set_meta("shared", 1)
+            self.shared = True
+            self._set_journal_mode()
+
+    def _set_journal_mode(self):
+        if not self.shared:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            return
+        mode = self.conn.execute("PRAGMA journal_mode=DELETE").fetchone()[0]
+        self.conn.execute("PRAGMA synchronous=FULL")
+        if mode.lower() != "delete":
+            print(f"Warning: {self.db_path} is still in {mode} mode; close other annotators using it and reopen.")
+
+    def add_many(self, rows, sync=False):
+        """
+        Inserts or replaces annotations [(image_name, label, session_id, timestamp)] in one transaction.
+        With sync=True the commit is fsynced (synchronous=FULL) instead of relying on WAL checkpoints.
+        """
+        if sync and not self.shared:
+            self.conn.execute("PRAGMA synchronous=FULL")
+        try:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?)", rows)
+        finally:
+            if sync and not self.shared:
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def rename_many(self, mapping):
+        """
+        Renames annotation rows {old_name: new_name} in one transaction.
+        Rows are parked under a "/"-prefixed name first (impossible for a file name),
+        so chains like a -> b, b -> c never collide halfway through.
+        """
+        with self.conn:
+            self.conn.executemany("UPDATE annotations SET image_name = '/' || ? WHERE image_name = ?",
+                                  [(new, old) for old, new in mapping.items()])
+            self.conn.execute("UPDATE OR REPLACE annotations SET image_name = substr(image_name, 2) "
+                              "WHERE substr(image_name, 1, 1) = '/'")
+
+    def get(self, image_name):
+        """Returns (label, session_id, timestamp) for image_name, or None."""
+        row = self.conn.execute("SELECT label, session_id, timestamp FROM annotations WHERE image_name = ?",
+                                (image_name,)).fetchone()
+        return tuple(row) if row else None
+
+    def __contains__(self, image_name):
+        return self.conn.execute("SELECT 1 FROM annotations WHERE image_name = ?",
+                                 (image_name,)).fetchone() is not None
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM annotations").fetchone()[0]
+
+    def load_all(self):
+        """Returns a dictionary {image_name: (label, session_id, timestamp)}."""
+        return {row[0]: (row[1], row[2], row[3])
+                for row in self.conn.execute("SELECT image_name, label, session_id, timestamp FROM annotations")}
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def import_csv(self, csv_path):
+        """
+        Imports a four-column annotations CSV. Returns the number of rows read.
+        If the file only grew since the last import/export, just the appended rows are read
+        and they replace what the store holds (they are newer). If it was rewritten, every row
+        is read but only adds images the store does not have, so relabels made in the store
+        and not exported yet are never overwritten by an older CSV row.
+        """
+        if not os.path.isfile(csv_path):
+            return 0
+        offset = int(self.get_meta("csv_offset", 0))
+        with open(csv_path, 'rb') as file:
+            appended = self._csv_continues(file, offset)
+            start = offset if appended else 0
+            file.seek(start)
+            data = file.read()
+        end = data.rfind(b"\n") + 1  # A line still being written is picked up next time
+        text = data[:end].decode("utf-8")
+        rows = [row for row in csv.reader(io.StringIO(text, newline=''))
+                if len(row) == 4 and row != CSV_HEADER]
+        if appended:
+            self.add_many(rows)
+        else:
+            latest = {row[0]: row for row in rows}  # Last row wins within the CSV
+            with self.conn:
+                self.conn.executemany("INSERT OR IGNORE INTO annotations VALUES (?, ?, ?, ?)", latest.values())
+        self._remember_csv(csv_path, start + end)
+        return len(rows)
+
+    def export_csv(self, csv_path):
+        """
+        Writes all annotations to a four-column CSV, atomically replacing csv_path.
+        The temporary file is unique per export, so annotators sharing the folder never write into each other's.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(csv_path) or ".",
+                                        prefix=os.path.basename(csv_path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(CSV_HEADER)
+                writer.writerows(self.conn.execute(
+                    "SELECT image_name, label, session_id, timestamp FROM annotations ORDER BY rowid"))
+            os.chmod(tmp_path, 0o644)  # mkstemp creates it private; annotations.csv is read by other users' tools
+            os.replace(tmp_path, csv_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._remember_csv(csv_path)
+
+    def csv_changed(self, csv_path):
+        """True if csv_path was modified outside this store since the last import/export."""
+        if not os.path.isfile(csv_path):
+            return False
+        return self.get_meta("csv_signature") != self._csv_signature(csv_path)
+
+    def close(self):
+        self.conn.close()
+
+    def _remember_csv(self, csv_path, offset=None):
+        """Records how far csv_path has been read, plus a fingerprint of the bytes just before that point."""
+        offset = os.path.getsize(csv_path) if offset is None else offset
+        with open(csv_path, 'rb') as file:
+            tail = self._csv_tail(file, offset)
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                  [("csv_signature", self._csv_signature(csv_path)),
+                                   ("csv_offset", str(offset)), ("csv_tail", tail)])
+
+    def _csv_continues(self, file, offset):
+        """True if the file still holds what was read up to offset, i.e. it was only appended to."""
+        size = os.fstat(file.fileno()).st_size
+        return 0 < offset <= size and self._csv_tail(file, offset) == self.get_meta("csv_tail")
+
+    @staticmethod
+    def _csv_tail(file, offset, length=4096):
+        file.seek(max(0, offset - length))
+        return str(zlib.crc32(file.read(min(offset, length))))
+
+    @staticmethod
+    def _csv_signature(csv_path):
+        stat = os.stat(csv_path)
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
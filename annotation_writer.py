@@ -0,0 +1,148 @@
+import os
+import glob
+import json
+import time
+import uuid
+import hashlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from tracing import span
+
+
+def default_journal_dir():
+    """Local folder for write-behind journals, so they never live on a slow network mount."""
+    return os.path.join(os.path.expanduser("~"), ".cache", "jersey_annotator", "journals")
+
+
+def try_lock(f):
+    """Takes an exclusive lock on an open file without waiting; False if another process holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+class AnnotationWriter:
+    def __init__(self, csv_handler, output_folder, max_pending=50, max_delay=2.0, journal_dir=None):
+        """
+        Write-behind buffer in front of CSVHandler for one output folder.
+        Appends are kept in memory and recorded in a small local journal; they reach
+        the CSV/store in batches when max_pending rows accumulate, when max_delay
+        seconds have passed (see flush_if_due) or on an explicit flush().
+        Each writer journals to its own locked file (<folder key>.<pid>.<random>.journal),
+        so two annotators on one output folder never share a journal and a reused PID never
+        picks up a dead writer's file; journals left behind by a crashed writer (no longer
+        locked) are replayed before the new writer's journal is created.
+        """
+        self.csv_handler = csv_handler
+        self.output_folder = output_folder
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self.pending = []  # [(image_path, label, session_id, timestamp)]
+        self.last_flush_time = time.monotonic()
+        self.last_flush_latency = 0.0
+        self.flush_count = 0
+        journal_dir = journal_dir or default_journal_dir()
+        os.makedirs(journal_dir, exist_ok=True)
+        folder_key = hashlib.sha1(os.path.abspath(output_folder).encode("utf-8")).hexdigest()[:16]
+        self.journal_pattern = os.path.join(journal_dir, f"{folder_key}*.journal")
+        self.journal_path = None
+        self.replay_journals()
+        self.journal_path = os.path.join(journal_dir, f"{folder_key}.{os.getpid()}.{uuid.uuid4().hex[:8]}.journal")
+        # Locked under a name replay_journals() does not match, then moved into place, so no
+        # other writer can ever see this journal unlocked and take it for a dead one
+        new_path = self.journal_path + ".new"
+        self.journal = open(new_path, "a")
+        try_lock(self.journal)
+        os.replace(new_path, self.journal_path)
+
+    def append(self, image_path, label, session_id):
+        """Queues one annotation; returns without touching the output folder."""
+        self.append_many([(image_path, label, session_id)])
+
+    def append_many(self, rows):
+        """Queues several annotations [(image_path, label, session_id)] stamped with the current time."""
+        if not rows:
+            return
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        rows = [(image_path, label, session_id, timestamp) for image_path, label, session_id in rows]
+        # Journal first, synced: the rows survive a crash of the process or a power loss
+        self.journal.write("".join(json.dumps(row) + "\n" for row in rows))
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.pending.extend(rows)
+        if len(self.pending) >= self.max_pending:
+            self.flush()
+
+    def flush_if_due(self):
+        """Flushes if rows have been pending for longer than max_delay seconds."""
+        if self.pending and time.monotonic() - self.last_flush_time >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        """Writes all pending rows in one batch, fsyncs them and only then clears the journal."""
+        if self.pending:
+            start = time.perf_counter()
+            with span("annotations.flush", rows=len(self.pending)):
+                self.csv_handler.save_annotations(self.pending, self.output_folder, sync=True)
+            self.pending = []
+            self.journal.truncate(0)
+            os.fsync(self.journal.fileno())
+            self.last_flush_latency = time.perf_counter() - start
+            self.flush_count += 1
+        self.last_flush_time = time.monotonic()
+
+    def replay_journals(self):
+        """
+        Writes rows from journals of writers that died before flushing them. A journal
+        still locked belongs to a running annotator and is left alone; a replayed one is
+        deleted only after its rows were written with sync=True.
+        """
+        for path in glob.glob(self.journal_pattern):
+            if path == self.journal_path:
+                continue
+            try:
+                f = open(path, "r")
+            except OSError:
+                continue  # Replayed and removed by another writer in the meantime
+            with f:
+                if not try_lock(f):
+                    continue
+                f.seek(0)
+                rows = []
+                for line in f:
+                    try:
+                        rows.append(tuple(json.loads(line)))
+                    except ValueError:
+                        break  # Torn final line from the crash; everything before it is intact
+                if rows:
+                    print(f"Replaying {len(rows)} unsaved annotation(s) from {path}")
+                    self.csv_handler.save_annotations(rows, self.output_folder, sync=True)
+            os.remove(path)
+
+    def pending_count(self):
+        return len(self.pending)
+
+    def stats(self):
+        return {
+            "pending": len(self.pending),
+            "last_flush_latency_ms": self.last_flush_latency * 1000,
+            "flush_count": self.flush_count,
+        }
+
+    def close(self):
+        """Flushes remaining rows and removes the journal."""
+        self.flush()
+        self.journal.close()
+        if os.path.isfile(self.journal_path):
+            os.remove(self.journal_path)
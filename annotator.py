@@ -2,44 +2,128 @@ import sys
 import os
 import json
 import time
+import getpass
 
 # Attempt to import PyQt5, exit if not installed
 try:
     from PyQt5.QtWidgets import (QApplication, QLabel, QPushButton, QFileDialog,
                                  QVBoxLayout, QHBoxLayout, QWidget, QProgressBar,
-                                 QFrame, QCheckBox, QSizePolicy, QGridLayout)
-    from PyQt5.QtGui import QPixmap, QFont, QIcon
-    from PyQt5.QtCore import Qt
+                                 QFrame, QCheckBox, QSizePolicy, QGridLayout, QComboBox,
+                                 QStackedWidget, QInputDialog, QMessageBox)
+    from PyQt5.QtGui import QFont, QIcon
+    from PyQt5.QtCore import Qt, QTimer
 except ModuleNotFoundError:
     print("Error: PyQt5 is not installed. Please install it using 'pip install PyQt5'")
     sys.exit(1)
 
 from image_loader import ImageLoader
+from image_prefetcher import ImagePrefetcher, decode_image
+from display_cache import DisplayCache
+from thumbnail_grid import ThumbnailModel, ThumbnailGrid
+from thumbnailer import DEFAULT_THUMBNAIL_DIR
 from csv_handler import CSVHandler
+from annotation_writer import AnnotationWriter
 from augmentor import Augmentor
-from rename_dialog import RenameDialog  # For renaming images
+from augmentation_queue import AugmentationQueue
+from rename_dialog import RenameDialog, RenameWorker  # For renaming images
+from rename_engine import RenameEngine, RenameCollisionError
 from session_manager import SessionManager  # For session saving/resuming
+from tracing import tracer, span, trace_setting
+from work_coordinator import WorkCoordinator, LEASE_DB_FILE, folder_key
+from prelabeler import Prelabeler
+from prelabel import PREDICTIONS_DB_FILE
+from video_source import VIDEO_EXTENSIONS
+from roi_store import RoiStore, CropCache, qimage_to_bgr
+from roi_selector import RoiSelector
+from label_stats import LabelStats
+
+NUMBER_STYLE = "border: 2px solid #99AAB5; background-color: #23272A; padding: 10px;"
+SUGGESTION_STYLE = "border: 2px dashed #FAA61A; background-color: #23272A; padding: 10px; color: #FAA61A;"
 
 class ImageAnnotator(QWidget):
     def __init__(self):
         """Initializes the Image Annotator GUI."""
         super().__init__()
-        self.input_folder = ""  # Stores the input images folder
+        self.input_folder = ""  # Stores the input images folder (or video file)
+        self.video_stride = 1  # Every n-th frame is labeled when the input is a video
         self.session_manager = None  # Will be initialized when output folder is set
         # Initialize current session data
-        self.session_data = {
-            "session_id": time.strftime("%Y%m%d_%H%M%S"),
-            "start_time": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "images_annotated": 0,
-            "suitable_images": 0  # Counter for suitable images in this session
-        }
+        self.session_data = self.new_session_data()
+        self.label_stats = LabelStats(self.session_data)
         self.initUI()
-        self.image_loader = ImageLoader()
-        self.csv_handler = CSVHandler()
+        self.csv_handler = CSVHandler(use_store=True)
+        # Sub-folders only on request: annotations are keyed by file name, which must then be unique
+        self.image_loader = ImageLoader(self.csv_handler, recursive=os.environ.get("ANNOTATOR_RECURSIVE") == "1")
+        self.prefetcher = ImagePrefetcher(self.image_loader, ahead=3, behind=1, budget_mb=256,
+                                          on_ready=self.on_image_decoded)
+        self.display_cache = DisplayCache(self.prefetcher)
+        # Grid view for batch labeling; tiles are decoded only as they scroll into view
+        self.thumbnail_model = ThumbnailModel(self.image_loader)
+        self.thumbnail_grid = ThumbnailGrid(self.thumbnail_model)
+        self.thumbnail_grid.doubleClicked.connect(self.open_grid_image)
+        self.thumbnail_grid.selectionModel().selectionChanged.connect(self.update_grid_selection)
+        self.view_stack.addWidget(self.thumbnail_grid)
+        # ROI mode: a jersey box per image; augmentation works on the crop only
+        self.roi_mode = False
+        self.roi_store = None  # RoiStore of the output folder (rois.csv)
+        self.last_roi = None  # Proposed for the next image, as jersey positions change little between frames
+        self.crop_cache = CropCache(budget_mb=64)
+        self.roi_selector = RoiSelector(self.image_label, on_changed=self.on_roi_drawn)
         self.augmentor = Augmentor()
+        self.augmentation_queue = AugmentationQueue()
+        # Poll the augmentation pool for finished jobs and feed the progress bar
+        self.augmentation_timer = QTimer(self)
+        self.augmentation_timer.setInterval(200)
+        self.augmentation_timer.timeout.connect(self.collect_augmentations)
+        self.augmentation_timer.start()
+        self.annotation_writer = None  # Write-behind buffer, created with the output folder
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(500)
+        self.flush_timer.timeout.connect(self.flush_annotations_if_due)
+        self.flush_timer.start()
+        # Model suggestions: {manifest index: (label, confidence)}, shown in the number display
+        self.predictions = {}
+        self.suggested_label = None
+        self.showing_suggestion = False
+        self.prelabeler = None
+        self.prelabel_generation = 0  # Bumped by stop_prelabel(); signals of older runs are dropped
+        self.stopped_prelabelers = set()  # Stopped threads still winding down (kept alive until finished)
+        # Shared work mode: leased chunks of the folder, renewed while the annotator is active
+        self.work_coordinator = None
+        self.last_activity = time.monotonic()
+        self.idle_timeout = 300  # Seconds without labeling after which the lease is left to expire
+        self.lease_timer = QTimer(self)
+        self.lease_timer.setInterval(30000)
+        self.lease_timer.timeout.connect(self.renew_lease)
+        self.perf_timer = QTimer(self)
+        self.perf_timer.setInterval(500)
+        self.perf_timer.timeout.connect(self.update_perf_overlay)
+        if tracer.enabled:
+            self.perf_timer.start()
+        # Dashboard refresh reads in-memory counters only, so it never stalls labeling
+        self.dashboard_timer = QTimer(self)
+        self.dashboard_timer.setInterval(1000)
+        self.dashboard_timer.timeout.connect(self.update_dashboard)
+        self.dashboard_timer.start()
         self.output_folder = ""
         self.label_text = ""
         self.augmented_mode = False  # Toggle for augmentation mode
+        self.write_augmented_files = False  # Off: augmentation is recorded as recipes and produced on read
+        self.duplicate_mode = "off"  # "off", "skip" or "propagate" near-duplicates of labeled images
+        self.confirm_propagation = True
+
+    @staticmethod
+    def new_session_data():
+        """Returns the counters of a fresh session."""
+        return {
+            "session_id": time.strftime("%Y%m%d_%H%M%S"),
+            "start_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "annotator": os.environ.get("ANNOTATOR_NAME") or getpass.getuser(),
+            "images_annotated": 0,
+            "suitable_images": 0,  # Counter for suitable images in this session
+            "label_counts": {},  # {label: images given that label this session}
+            "active_seconds": 0.0  # Labeling time, gaps between saves capped (see LabelStats)
+        }
 
     def initUI(self):
         """Sets up the GUI layout and widgets."""
@@ -54,6 +138,9 @@ class ImageAnnotator(QWidget):
         self.image_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_label.setStyleSheet("border: 2px solid #7289DA; padding: 5px;")
+        # Single image and grid view share this slot; the grid is added once the image loader exists
+        self.view_stack = QStackedWidget()
+        self.view_stack.addWidget(self.image_label)
 
         # Image name display label
         self.image_name_label = QLabel("No Image Loaded")
@@ -65,7 +152,7 @@ class ImageAnnotator(QWidget):
         self.number_display = QLabel("Enter Number")
         self.number_display.setFont(QFont("Arial", 40, QFont.Bold))
         self.number_display.setAlignment(Qt.AlignCenter)
-        self.number_display.setStyleSheet("border: 2px solid #99AAB5; background-color: #23272A; padding: 10px;")
+        self.number_display.setStyleSheet(NUMBER_STYLE)
         self.number_display.setFixedSize(250, 120)
 
         # Session statistics display
@@ -74,18 +161,32 @@ class ImageAnnotator(QWidget):
         self.session_stats_label.setAlignment(Qt.AlignCenter)
         self.session_stats_label.setStyleSheet("padding: 5px;")
 
+        # Performance overlay (Ctrl+T): last-frame latency and queue depths, hidden unless tracing
+        self.perf_label = QLabel("")
+        self.perf_label.setFont(QFont("Courier", 11))
+        self.perf_label.setStyleSheet("padding: 5px; color: #99AAB5;")
+        self.perf_label.setVisible(tracer.enabled)
+
+        # Label statistics dashboard (Ctrl+D toggles it)
+        self.dashboard_label = QLabel("")
+        self.dashboard_label.setFont(QFont("Courier", 11))
+        self.dashboard_label.setStyleSheet("padding: 5px; color: #99AAB5;")
+        self.dashboard_label.setAlignment(Qt.AlignCenter)
+        self.dashboard_label.setWordWrap(True)
+
         # Buttons – using a grid layout for equal spacing and vertical separators
         button_style = "padding: 10px; font-size: 14px; border-radius: 5px; background-color: #7289DA; color: white;"
         self.prev_btn = QPushButton("← Previous")
         self.next_btn = QPushButton("Next →")
         self.load_folder_btn = QPushButton("📂 Load Folder")
+        self.load_video_btn = QPushButton("🎞 Load Video")
         self.select_output_btn = QPushButton("📁 Select Output Folder")
         self.rename_btn = QPushButton("🔄 Rename Images")
         self.label_btn = QPushButton("✔ Label (Enter)")
         self.save_session_btn = QPushButton("💾 Save Session")
         self.resume_session_btn = QPushButton("⟳ Resume Session")
 
-        for btn in [self.prev_btn, self.next_btn, self.load_folder_btn, self.select_output_btn,
+        for btn in [self.prev_btn, self.next_btn, self.load_folder_btn, self.load_video_btn, self.select_output_btn,
                     self.rename_btn, self.label_btn, self.save_session_btn, self.resume_session_btn]:
             btn.setStyleSheet(button_style)
             btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
@@ -93,6 +194,31 @@ class ImageAnnotator(QWidget):
         self.augment_mode_toggle = QCheckBox("Enable Augmentation")
         self.augment_mode_toggle.setStyleSheet("font-size: 16px;")
         self.augment_mode_toggle.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        self.write_augmented_toggle = QCheckBox("Write augmented files")
+        self.write_augmented_toggle.setStyleSheet("font-size: 16px;")
+        self.write_augmented_toggle.setFocusPolicy(Qt.NoFocus)
+        self.write_augmented_toggle.setToolTip("Off: only seeds are recorded and variants are produced on read "
+                                               "(virtual_dataset.py); On: write _augN files right away")
+        self.shared_mode_toggle = QCheckBox("👥 Shared Work Mode")
+        self.shared_mode_toggle.setStyleSheet("font-size: 16px;")
+        self.shared_mode_toggle.setFocusPolicy(Qt.NoFocus)
+        self.duplicate_mode_box = QComboBox()
+        self.duplicate_mode_box.addItems(["Duplicates: Off", "Duplicates: Skip", "Duplicates: Propagate"])
+        self.duplicate_mode_box.setStyleSheet("font-size: 16px;")
+        self.duplicate_mode_box.setFocusPolicy(Qt.NoFocus)  # Keep digit/arrow keys for labeling
+        self.grid_view_btn = QPushButton("▦ Grid View (Ctrl+G)")
+        self.grid_view_btn.setStyleSheet(button_style)
+        self.grid_view_btn.setFocusPolicy(Qt.NoFocus)
+        self.prelabel_btn = QPushButton("🤖 Pre-label")
+        self.prelabel_btn.setStyleSheet(button_style)
+        self.prelabel_btn.setFocusPolicy(Qt.NoFocus)
+        self.order_box = QComboBox()
+        self.order_box.addItems(["Order: Folder", "Order: Least confident first"])
+        self.order_box.setStyleSheet("font-size: 16px;")
+        self.order_box.setFocusPolicy(Qt.NoFocus)
+        self.roi_mode_toggle = QCheckBox("▭ ROI Mode")
+        self.roi_mode_toggle.setStyleSheet("font-size: 16px;")
+        self.roi_mode_toggle.setFocusPolicy(Qt.NoFocus)
         self.progress = QProgressBar()
 
         # Arrange buttons using grid layout with vertical separators
@@ -123,15 +249,33 @@ class ImageAnnotator(QWidget):
         button_layout.addWidget(self.save_session_btn, 1, 3)
         button_layout.addWidget(self.resume_session_btn, 1, 4)
 
-        # Row 2: Augmentation toggle spanning all columns
-        button_layout.addWidget(self.augment_mode_toggle, 2, 0, 1, 5, alignment=Qt.AlignCenter)
+        # Row 2: Augmentation, shared work and ROI toggles, duplicate handling and grid view toggle
+        button_layout.addWidget(self.augment_mode_toggle, 2, 0, alignment=Qt.AlignCenter)
+        button_layout.addWidget(self.shared_mode_toggle, 2, 1, alignment=Qt.AlignCenter)
+        button_layout.addWidget(self.roi_mode_toggle, 2, 2, alignment=Qt.AlignCenter)
+        button_layout.addWidget(self.duplicate_mode_box, 2, 3, alignment=Qt.AlignCenter)
+        button_layout.addWidget(self.grid_view_btn, 2, 4)
+
+        # Row 3: Model-assisted pre-labeling and video input
+        button_layout.addWidget(self.prelabel_btn, 3, 0, 1, 2)
+        button_layout.addWidget(self.load_video_btn, 3, 2)
+        button_layout.addWidget(self.order_box, 3, 3, 1, 2, alignment=Qt.AlignCenter)
+
+        # Row 4: Eager vs. on-read augmentation
+        button_layout.addWidget(self.write_augmented_toggle, 4, 0, alignment=Qt.AlignCenter)
 
         # Main layout
         main_layout = QVBoxLayout()
-        main_layout.addWidget(self.image_label)
+        main_layout.addWidget(self.view_stack)
         main_layout.addWidget(self.image_name_label)
         main_layout.addWidget(self.number_display, alignment=Qt.AlignCenter)
-        main_layout.addWidget(self.session_stats_label, alignment=Qt.AlignCenter)
+        stats_layout = QHBoxLayout()
+        stats_layout.addStretch()
+        stats_layout.addWidget(self.session_stats_label)
+        stats_layout.addWidget(self.perf_label)
+        stats_layout.addStretch()
+        main_layout.addLayout(stats_layout)
+        main_layout.addWidget(self.dashboard_label)
         main_layout.addLayout(button_layout)
         main_layout.addWidget(self.progress)
         self.setLayout(main_layout)
@@ -140,21 +284,187 @@ class ImageAnnotator(QWidget):
         self.prev_btn.clicked.connect(self.show_prev_image)
         self.next_btn.clicked.connect(self.show_next_image)
         self.load_folder_btn.clicked.connect(self.load_folder)
+        self.load_video_btn.clicked.connect(self.load_video)
         self.select_output_btn.clicked.connect(self.select_output_folder)
         self.rename_btn.clicked.connect(self.rename_images)
         self.label_btn.clicked.connect(self.save_annotation)
         self.save_session_btn.clicked.connect(self.save_session)
         self.resume_session_btn.clicked.connect(self.resume_session)
         self.augment_mode_toggle.stateChanged.connect(self.toggle_augmentation)
+        self.write_augmented_toggle.stateChanged.connect(self.toggle_write_augmented)
+        self.shared_mode_toggle.stateChanged.connect(self.toggle_shared_mode)
+        self.roi_mode_toggle.stateChanged.connect(self.toggle_roi_mode)
+        self.duplicate_mode_box.currentIndexChanged.connect(self.set_duplicate_mode)
+        self.grid_view_btn.clicked.connect(self.toggle_grid_view)
+        self.prelabel_btn.clicked.connect(self.start_prelabel)
+        self.order_box.currentIndexChanged.connect(self.apply_image_order)
+
+        # Debounce resizes: fast rescale while dragging, smooth rescale once resizing stops
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(150)
+        self.resize_timer.timeout.connect(self.show_image)
 
     def resizeEvent(self, event):
         """Override to rescale the displayed image when the window is resized."""
-        self.show_image()
+        self.show_image(smooth=False)
+        self.resize_timer.start()
         super().resizeEvent(event)
 
     def toggle_augmentation(self, state):
         self.augmented_mode = state == Qt.Checked
 
+    def toggle_write_augmented(self, state):
+        self.write_augmented_files = state == Qt.Checked
+
+    def record_augmentation_recipes(self, items, label):
+        """
+        Records [(image_path, source_path)] for on-read augmentation: a seed per image and the
+        pipeline spec, instead of writing the variants (materialize them with virtual_dataset.py).
+        """
+        pipeline = self.augmentor.pipeline
+        pipeline.save(self.output_folder)
+        self.csv_handler.save_augmentation_recipes(
+            [(image_path, os.path.abspath(source_path), label, Augmentor.new_seed(), self.augmentor.augment_count,
+              pipeline.spec_id()) for image_path, source_path in items], self.output_folder)
+
+    def augment_labeled(self, items, label, session_id, crop_image=None):
+        """
+        Queues the augmentation of labeled [(image_path, source_path)], or records their
+        recipes instead when augmented files are not written.
+        """
+        if self.write_augmented_files:
+            print(f"Augmented mode is ON: Queueing augmented images for {len(items)} image(s)")
+            for _, source_path in items:
+                self.augmentation_queue.submit(source_path, label, self.output_folder, session_id, crop_image)
+        else:
+            self.record_augmentation_recipes(items, label)
+
+    def toggle_roi_mode(self, state):
+        self.roi_mode = state == Qt.Checked
+        self.roi_selector.set_enabled(self.roi_mode)
+        self.show_image()
+
+    def on_roi_drawn(self, roi):
+        self.last_roi = roi
+
+    def update_roi_display(self, image_path):
+        """Shows the stored ROI of the image, or proposes the last one used."""
+        if not self.roi_mode:
+            return
+        image = self.prefetcher.peek(image_path)  # None while only the thumbnail preview is shown
+        size = (image.width(), image.height()) if image is not None else None
+        roi = self.roi_store.get(os.path.basename(image_path)) if self.roi_store else None
+        self.roi_selector.set_image(size, roi or self.last_roi)
+
+    def save_roi(self, image_path):
+        """
+        Stores the ROI of image_path in rois.csv and returns its BGR crop (None outside ROI mode).
+        The crop comes from the already decoded display image, so the frame is not read again.
+        """
+        roi = self.roi_selector.roi if self.roi_mode else None
+        if roi is None or self.roi_store is None:
+            return None
+        self.roi_store.set(os.path.basename(image_path), roi)
+        self.last_roi = roi
+
+        def decode():
+            # Labeling before the background decode landed is rare; decode this one image directly then
+            image = self.prefetcher.peek(image_path)
+            if image is None:
+                image = decode_image(image_path)
+            return None if image.isNull() else qimage_to_bgr(image)
+
+        return self.crop_cache.get(image_path, roi, decode)
+
+    def toggle_shared_mode(self, state):
+        if state == Qt.Checked:
+            self.start_shared_mode()
+        else:
+            self.stop_shared_mode()
+
+    def start_shared_mode(self):
+        """
+        Joins the lease table in the output folder so annotators sharing the input folder
+        get disjoint chunks. Waits for the folder scan if it is still running.
+        """
+        if self.work_coordinator is not None or not self.shared_mode_toggle.isChecked():
+            return
+        manifest = self.image_loader.manifest
+        if not self.output_folder or manifest is None:
+            print("Shared work mode starts once an output folder is set and the input folder is loaded.")
+            return
+        # Other machines reach the store over the network share, where WAL does not work
+        self.flush_annotations()
+        self.csv_handler.get_store(self.output_folder).set_shared()
+        key = folder_key(manifest.folder, os.path.dirname(os.path.abspath(self.output_folder)))
+        self.work_coordinator = WorkCoordinator(os.path.join(self.output_folder, LEASE_DB_FILE), key)
+        self.work_coordinator.register(len(manifest.table))
+        self.lease_timer.start()
+        self.acquire_work_chunk()
+
+    def stop_shared_mode(self):
+        if self.work_coordinator is not None:
+            self.flush_annotations()
+            self.work_coordinator.close()
+            self.work_coordinator = None
+        self.lease_timer.stop()
+        self.image_loader.clear_work_range()
+
+    def acquire_work_chunk(self):
+        """Leases the next chunk and jumps to its first unlabeled image."""
+        lease = self.work_coordinator.acquire()
+        if lease is None:
+            self.image_loader.clear_work_range()
+            progress = self.work_coordinator.progress()
+            print(f"No chunks left to lease ({progress['done']} done, {progress['leased']} held by others).")
+            self.image_name_label.setText("All work is leased or done")
+            return
+        chunk, start, end = lease
+        print(f"Leased chunk {chunk}: images {start + 1}-{end}")
+        self.image_loader.set_work_range(start, end)
+        if self.image_loader.work_range_done():
+            self.work_coordinator.complete()
+            self.acquire_work_chunk()
+            return
+        self.last_activity = time.monotonic()
+        self.show_image()
+
+    def renew_lease(self):
+        """Heartbeats the lease while the annotator is active; an idle lease expires for others to take."""
+        if self.work_coordinator is None or time.monotonic() - self.last_activity > self.idle_timeout:
+            return
+        if not self.work_coordinator.heartbeat():
+            print("Lease expired and was taken over; moving to a new chunk.")
+            self.acquire_work_chunk()
+
+    def advance_work(self):
+        """After labeling in shared mode: keeps the lease alive and moves on once the chunk is finished."""
+        self.last_activity = time.monotonic()
+        if self.work_coordinator is None:
+            return
+        if self.work_coordinator.lease is None or not self.work_coordinator.heartbeat():
+            self.acquire_work_chunk()
+        elif self.image_loader.work_range_done():
+            self.flush_annotations()  # Other annotators must see the chunk's rows before it counts as done
+            self.work_coordinator.complete()
+            self.acquire_work_chunk()
+
+    def set_duplicate_mode(self, index):
+        self.duplicate_mode = ("off", "skip", "propagate")[index]
+        self.confirm_propagation = True  # Ask again after every switch to "propagate"
+
+    def confirm_propagate(self, label, count):
+        """Asks before writing label for count near-duplicates; "Yes to All" stops asking until the mode changes."""
+        if not self.confirm_propagation:
+            return True
+        answer = QMessageBox.question(
+            self, "Propagate Label", f"Also label {count} near-duplicate image(s) as {label}?",
+            QMessageBox.Yes | QMessageBox.YesToAll | QMessageBox.No, QMessageBox.Yes)
+        if answer == QMessageBox.YesToAll:
+            self.confirm_propagation = False
+        return answer != QMessageBox.No
+
     def update_session_stats(self):
         """Updates the session statistics display."""
         session_no = self.session_manager.get_session_count() + 1 if self.session_manager else 1
@@ -166,20 +476,157 @@ class ImageAnnotator(QWidget):
             f"Session #{session_no_str} | Labeled this session: {current} | Total suitable: {total_prev + suitable}"
         )
 
+    def reset_label_stats(self):
+        """Restarts the dashboard counters for the current session on top of the history totals."""
+        aggregate = self.session_manager.aggregate if self.session_manager else None
+        self.label_stats = LabelStats(self.session_data, aggregate)
+        self.update_dashboard()
+
+    def toggle_dashboard(self):
+        visible = not self.dashboard_label.isVisible()
+        self.dashboard_label.setVisible(visible)
+        if visible:
+            self.dashboard_timer.start()
+            self.update_dashboard()
+        else:
+            self.dashboard_timer.stop()
+
+    def update_dashboard(self):
+        """Re-renders the dashboard from the running counters (also lets the recent rate decay)."""
+        if not self.dashboard_label.isVisible():
+            return
+        text = self.label_stats.summary(self.image_loader.remaining_count())
+        if text != self.dashboard_label.text():
+            self.dashboard_label.setText(text)
+
     def save_session(self):
         """
-        Saves current session data to session_history.json (append-only)
+        Appends current session data to the session log (session_history.jsonl)
         and closes the application.
         """
-        self.session_data["end_time"] = time.strftime("%Y-%m-%d %H:%M:%S")
-        if self.session_manager:
-            self.session_manager.add_session(self.session_data)
-            print("Session saved.")
-        else:
-            print("Session manager not initialized.")
+        with span("session.save"):
+            self.drain_augmentations()
+            self.flush_annotations()
+            self.session_data["end_time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            if self.session_manager:
+                self.session_manager.add_session(self.session_data)
+                print("Session saved.")
+            else:
+                print("Session manager not initialized.")
         self.update_session_stats()
         self.close()
 
+    def closeEvent(self, event):
+        """Makes sure queued augmentation jobs and buffered annotations are written before the window goes away."""
+        self.image_loader.cancel_scan()
+        self.image_loader.stop_video()
+        self.drain_augmentations()
+        if self.annotation_writer:
+            self.annotation_writer.close()
+            self.annotation_writer = None
+        # Labels live in the store; keep annotations.csv current for the CLI tools even without Save Session
+        self.csv_handler.export_csv(self.output_folder)
+        self.image_loader.save_state()
+        self.stop_shared_mode()
+        self.stop_prelabel()
+        self.export_trace()
+        super().closeEvent(event)
+
+    def toggle_perf_overlay(self):
+        """Shows/hides the performance overlay; tracing runs while it is visible."""
+        visible = not self.perf_label.isVisible()
+        tracer.enabled = visible or bool(trace_setting())
+        self.perf_label.setVisible(visible)
+        if visible:
+            self.perf_timer.start()
+            self.update_perf_overlay()
+        else:
+            self.perf_timer.stop()
+
+    def update_perf_overlay(self):
+        """Refreshes the overlay and records the queue depths as trace counters."""
+        queues = {
+            "decode": len(self.prefetcher.in_flight),
+            "tiles": len(self.thumbnail_model.in_flight),
+            "augment": self.augmentation_queue.backlog(),
+            "writes": self.annotation_writer.pending_count() if self.annotation_writer else 0,
+        }
+        tracer.counter("queues", **queues)
+        frame_ms = tracer.last_ms.get("show_image")
+        frame = f"{frame_ms:.1f} ms" if frame_ms is not None else "--"
+        image_writes = self.augmentation_queue.write_stats()
+        self.perf_label.setText(f"Frame: {frame} | Decode q: {queues['decode']} | Tiles q: {queues['tiles']} | "
+                                f"Aug backlog: {queues['augment']} | Pending writes: {queues['writes']} | "
+                                f"Aug files: {image_writes['written']} (peak q {image_writes['peak_queue_depth']})")
+
+    def export_trace(self):
+        """
+        Writes recorded spans as Chrome trace JSON: to the ANNOTATOR_TRACE path if it names
+        a .json file, otherwise to trace_<session id>.json in the output folder.
+        """
+        if not tracer.events:
+            return
+        setting = trace_setting()
+        if setting.lower().endswith(".json"):
+            path = setting
+        else:
+            path = os.path.join(self.output_folder or ".", f"trace_{self.session_data['session_id']}.json")
+        count = tracer.export_chrome(path)
+        print(f"Trace with {count} event(s) written to {path}")
+
+    def write_annotations(self, rows, output_folder):
+        """Routes annotation rows [(image_path, label, session_id)] through the write-behind buffer."""
+        if self.annotation_writer and output_folder == self.annotation_writer.output_folder:
+            self.annotation_writer.append_many(rows)
+        else:
+            self.csv_handler.save_annotations(rows, output_folder)
+
+    def flush_annotations(self):
+        """Forces buffered annotations out to the CSV/store."""
+        if self.annotation_writer:
+            self.annotation_writer.flush()
+
+    def flush_annotations_if_due(self):
+        if self.annotation_writer:
+            self.annotation_writer.flush_if_due()
+
+    def collect_augmentations(self):
+        """Writes CSV rows for finished augmentation jobs and updates the progress bar."""
+        self.write_augmentation_results(self.augmentation_queue.collect())
+        self.update_augmentation_progress(self.augmentation_queue.completed, self.augmentation_queue.submitted)
+
+    def drain_augmentations(self):
+        """Blocks until all queued augmentation jobs are done and their rows are written."""
+        if not self.augmentation_queue.backlog():
+            self.augmentation_queue.shutdown()
+            return
+        print(f"Waiting for {self.augmentation_queue.backlog()} augmentation job(s) to finish...")
+
+        def on_progress(completed, submitted):
+            self.update_augmentation_progress(completed, submitted)
+            QApplication.processEvents()
+
+        self.write_augmentation_results(self.augmentation_queue.drain(on_progress))
+
+    def write_augmentation_results(self, results):
+        """Writes annotation rows and reproducibility seeds for finished augmentation jobs."""
+        if results:
+            with span("augment.write_results", jobs=len(results)):
+                self._write_augmentation_results(results)
+
+    def _write_augmentation_results(self, results):
+        for image_path, label, output_folder, session_id, seed, paths in results:
+            self.write_annotations([(path, label, session_id) for path in paths], output_folder)
+            pipeline_id = self.augmentor.pipeline.spec_id()
+            self.csv_handler.save_augmentations(
+                [(path, image_path, seed, variant, pipeline_id) for variant, path in enumerate(paths)], output_folder)
+
+    def update_augmentation_progress(self, completed, submitted):
+        self.progress.setMaximum(max(submitted, 1))
+        self.progress.setValue(completed)
+        backlog = submitted - completed
+        self.progress.setFormat(f"Augmentation: {completed}/{submitted} (backlog {backlog})" if submitted else "")
+
     def resume_session(self):
         """
         Resumes labeling from the last unlabeled image based on the CSV file.
@@ -188,35 +635,54 @@ class ImageAnnotator(QWidget):
         if not self.session_manager:
             print("Session manager not initialized.")
             return
-        if self.session_manager.sessions:
+        if self.session_manager.get_session_count():
             prev_total = self.session_manager.get_total_suitable()
             print(f"Resuming session. Previous total suitable images: {prev_total}")
-            self.session_data = {
-                "session_id": time.strftime("%Y%m%d_%H%M%S"),
-                "start_time": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "images_annotated": 0,
-                "suitable_images": 0
-            }
+            self.session_data = self.new_session_data()
+            self.reset_label_stats()
             if self.input_folder:
-                self.image_loader.load_images(self.input_folder, self.output_folder, self)
-                self.show_image()
+                self.reload_images()
             self.update_session_stats()
         else:
             print("No previous session found. Starting a new session.")
-            self.session_data = {
-                "session_id": time.strftime("%Y%m%d_%H%M%S"),
-                "start_time": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "images_annotated": 0,
-                "suitable_images": 0
-            }
+            self.session_data = self.new_session_data()
+            self.reset_label_stats()
             self.update_session_stats()
 
     def load_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select Image Folder")
         if folder:
             self.input_folder = folder
-            self.image_loader.load_images(folder, self.output_folder, self)
-            self.show_image()
+            self.reload_images()
+
+    def load_video(self):
+        """Loads a video file as the input; frames are decoded on demand and only labeled ones are written."""
+        patterns = " ".join(f"*{ext}" for ext in VIDEO_EXTENSIONS)
+        video_path, _ = QFileDialog.getOpenFileName(self, "Select Video", "", f"Videos ({patterns});;All files (*)")
+        if not video_path:
+            return
+        stride, ok = QInputDialog.getInt(self, "Frame Stride", "Label every n-th frame:", self.video_stride, 1, 10000)
+        if ok:
+            self.video_stride = stride
+            self.input_folder = video_path
+            self.reload_images()
+
+    def reload_images(self):
+        """(Re)loads the input folder, resuming at the first unlabeled image."""
+        self.flush_annotations()  # Resume must see every annotation saved so far
+        self.image_loader.save_state()
+        self.stop_shared_mode()  # Rejoined for the new image list once the scan finishes
+        self.stop_prelabel()
+        self.predictions = {}  # Keyed by manifest index, so they don't carry over to a new list
+        if os.path.isdir(self.input_folder):
+            self.recover_rename(self.input_folder)
+        self.prefetcher.clear()
+        self.prefetcher.set_thumbnails(self.input_folder, os.path.join(self.input_folder, DEFAULT_THUMBNAIL_DIR))
+        self.thumbnail_model.set_thumbnails(self.input_folder, os.path.join(self.input_folder, DEFAULT_THUMBNAIL_DIR))
+        self.display_cache.clear()
+        self.image_loader.load_images(self.input_folder, self.output_folder, self, on_update=self.on_images_updated,
+                                      stride=self.video_stride)
+        self.show_image()
 
     def select_output_folder(self):
         """
@@ -228,6 +694,11 @@ class ImageAnnotator(QWidget):
             self.output_folder = folder
             print(f"Output folder set to: {self.output_folder}")
             self.session_manager = SessionManager(os.path.join(self.output_folder, "session_history.json"))
+            self.reset_label_stats()
+            self.roi_store = RoiStore(self.output_folder)
+            if self.annotation_writer:
+                self.annotation_writer.close()
+            self.annotation_writer = AnnotationWriter(self.csv_handler, self.output_folder)
             self.update_session_stats()
 
     def rename_images(self):
@@ -235,6 +706,9 @@ class ImageAnnotator(QWidget):
         if not self.input_folder:
             print("Error: Input folder not set.")
             return
+        if not os.path.isdir(self.input_folder):
+            print("Error: Renaming only applies to image folders.")
+            return
         from rename_dialog import RenameDialog
         dialog = RenameDialog(self.input_folder, self)
         if dialog.exec_() == dialog.Accepted:
@@ -244,27 +718,83 @@ class ImageAnnotator(QWidget):
                 return
             start_number = int(start_number)
             self.perform_rename(self.input_folder, prefix, start_number)
-            self.image_loader.load_images(self.input_folder, self.output_folder, self)
-            self.show_image()
 
     def perform_rename(self, folder, prefix, start_number):
         """
         Renames all images in the specified folder using the given prefix and starting number.
         New names will follow the format: prefix_XXXXXX.ext (6-digit number).
+        The rename runs on a worker thread; annotation rows are rewritten when it finishes.
         """
-        images = sorted([f for f in os.listdir(folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))])
-        number = start_number
-        for old_name in images:
-            ext = os.path.splitext(old_name)[1].lower()
-            new_name = f"{prefix}_{str(number).zfill(6)}{ext}"
-            old_path = os.path.join(folder, old_name)
-            new_path = os.path.join(folder, new_name)
-            try:
-                os.rename(old_path, new_path)
-                print(f"Renamed {old_name} to {new_name}")
-            except Exception as e:
-                print(f"Error renaming {old_name}: {e}")
-            number += 1
+        engine = RenameEngine(folder)
+        plan = engine.plan_sequential(prefix, start_number)
+        try:
+            engine.validate(plan)
+        except RenameCollisionError as e:
+            print(f"Error renaming images: {e}")
+            return
+        self.flush_annotations()
+        self.image_loader.save_state()
+        self.stop_shared_mode()
+        self.stop_prelabel()
+        self.predictions = {}
+        self.image_loader.clear()
+        self.thumbnail_model.refresh()
+        self.show_image()
+        self.rename_btn.setEnabled(False)
+        self.rename_worker = RenameWorker(engine, plan)
+        self.rename_worker.progress.connect(self.update_rename_progress)
+        self.rename_worker.renamed.connect(lambda mapping: self.finish_rename(engine, mapping))
+        self.rename_worker.failed.connect(self.rename_failed)
+        self.rename_worker.start()
+
+    def update_rename_progress(self, done, total):
+        self.progress.setMaximum(max(total, 1))
+        self.progress.setValue(done)
+        self.progress.setFormat(f"Renaming: {done}/{total}")
+
+    def finish_rename(self, engine, mapping):
+        """Rewrites annotation, ROI and recipe rows for renamed images, then reloads the folder."""
+        print(f"Renamed {len(mapping)} image(s)")
+        self.rename_labels(engine, mapping)
+        engine.finish()
+        self.rename_btn.setEnabled(True)
+        self.reload_images()
+
+    def rename_failed(self, message):
+        print(f"Error renaming images: {message}")
+        self.rename_btn.setEnabled(True)
+        self.reload_images()  # Rolls the interrupted rename forward
+
+    def recover_rename(self, folder):
+        """Completes a rename that was interrupted by a crash, including its annotation, ROI and recipe rows."""
+        engine = RenameEngine(folder)
+        try:
+            recovered = engine.recover()
+        except Exception as e:
+            print(f"Error recovering interrupted rename in {folder}: {e}")
+            return
+        if recovered is None:
+            return
+        mapping, _ = recovered
+        self.rename_labels(engine, mapping)
+        engine.finish()
+
+    def rename_labels(self, engine, mapping):
+        """
+        Applies a rename {old_name: new_name} to everything in the output folder keyed by
+        file name. Each rewrite is recorded in the rename journal, so recovery never repeats one.
+        """
+        if not self.output_folder:
+            return
+        if not engine.is_done("annotations"):
+            self.csv_handler.rename_annotations(self.output_folder, mapping)
+            engine.mark_done("annotations")
+        if not engine.is_done("rois"):
+            (self.roi_store or RoiStore(self.output_folder)).rename_many(mapping)
+            engine.mark_done("rois")
+        if not engine.is_done("recipes"):
+            self.csv_handler.rename_augmentation_recipes(self.output_folder, engine.folder, mapping)
+            engine.mark_done("recipes")
 
     def show_prev_image(self):
         self.image_loader.prev_image()
@@ -274,21 +804,159 @@ class ImageAnnotator(QWidget):
         self.image_loader.next_image()
         self.show_image()
 
-    def show_image(self):
+    def show_next_unlabeled_image(self):
+        self.image_loader.next_unlabeled_image()
+        self.show_image()
+
+    def on_images_updated(self):
+        """Called by the image loader whenever its image list or index changes."""
+        self.thumbnail_model.refresh()
+        if self.is_grid_view():
+            self.thumbnail_grid.select_row(self.image_loader.index)
+        self.show_image()
+        if self.image_loader.manifest is not None:
+            self.start_shared_mode()
+
+    def is_grid_view(self):
+        return self.view_stack.currentWidget() is self.thumbnail_grid
+
+    def toggle_grid_view(self):
+        """Switches between the single image view and the thumbnail grid, keeping the position."""
+        if self.is_grid_view():
+            current = self.thumbnail_grid.currentIndex()
+            if current.isValid():
+                self.image_loader.index = current.row()
+            self.view_stack.setCurrentWidget(self.image_label)
+            self.grid_view_btn.setText("▦ Grid View (Ctrl+G)")
+            self.setFocus()
+            self.show_image()
+        else:
+            self.view_stack.setCurrentWidget(self.thumbnail_grid)
+            self.grid_view_btn.setText("🖼 Single View (Ctrl+G)")
+            if self.image_loader.image_list:
+                self.thumbnail_grid.select_row(self.image_loader.index)
+            self.thumbnail_grid.setFocus()
+
+    def open_grid_image(self, index):
+        """Opens a double-clicked tile in the single image view."""
+        self.thumbnail_grid.setCurrentIndex(index)
+        self.toggle_grid_view()
+
+    def update_grid_selection(self, *args):
+        count = len(self.thumbnail_grid.selected_rows())
+        self.image_name_label.setText(f"{count} image(s) selected" if count else "No Images Selected")
+
+    def show_image(self, smooth=True):
+        with span("show_image"):
+            self._show_image(smooth)
+
+    def _show_image(self, smooth):
         image_path = self.image_loader.get_current_image()
         if image_path:
-            pixmap = QPixmap(image_path)
-            if not pixmap.isNull():
-                # Scale the pixmap to the current size of the image_label widget
-                scaled_pixmap = pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            # Scaled renditions come from the display cache, backed by the prefetch cache;
+            # an image that is not decoded yet is shown from its thumbnail until it is
+            scaled_pixmap = self.display_cache.get(image_path, self.image_label.size(), smooth, allow_preview=True)
+            if scaled_pixmap is not None:
                 self.image_label.setPixmap(scaled_pixmap)
+                self.update_roi_display(image_path)
+            elif self.prefetcher.is_pending(image_path):
+                self.image_label.setText("Loading...")  # Re-rendered by on_image_decoded
             else:
                 self.image_label.setText("Failed to load image")
             self.image_name_label.setText(os.path.basename(image_path))
+            self.refresh_number_display()
+            self.prefetcher.prefetch()
         else:
             self.image_label.setText("No Image Loaded")
             self.image_name_label.setText("No Image Loaded")
 
+    def on_image_decoded(self, image_path):
+        """Replaces a thumbnail preview with the full image once its decode finishes."""
+        if image_path == self.image_loader.get_current_image():
+            self.show_image()
+
+    def start_prelabel(self):
+        """
+        Runs a pre-label model over the loaded folder in the background. The model comes from
+        ANNOTATOR_PRELABEL ("dummy", "onnx:<file>", "opencv:<file>") or a file dialog.
+        """
+        manifest = self.image_loader.manifest
+        if not self.output_folder or manifest is None:
+            print("Error: Load a folder and set the output folder before pre-labeling.")
+            return
+        if self.image_loader.is_video():
+            print("Error: Pre-labeling works on image folders, not video input.")
+            return
+        spec = os.environ.get("ANNOTATOR_PRELABEL")
+        if not spec:
+            spec, _ = QFileDialog.getOpenFileName(self, "Select Pre-label Model", "",
+                                                  "Models (*.onnx *.pb *.caffemodel *.tflite *.t7 *.net);;All files (*)")
+            if not spec:
+                return
+        self.stop_prelabel()
+        self.predictions = {}
+        generation = self.prelabel_generation
+        current = lambda: generation == self.prelabel_generation
+        prelabeler = Prelabeler(spec, manifest, os.path.join(self.output_folder, PREDICTIONS_DB_FILE))
+        prelabeler.predictions_ready.connect(lambda predictions: current() and self.on_predictions(predictions))
+        prelabeler.progress.connect(lambda done, total: current() and self.update_prelabel_progress(done, total))
+        prelabeler.failed.connect(lambda message: current() and print(f"Pre-labeling failed: {message}"))
+        prelabeler.finished.connect(lambda: current() and self.apply_image_order())
+        self.prelabeler = prelabeler
+        prelabeler.start()
+
+    def stop_prelabel(self):
+        """
+        Stops pre-labeling without waiting on the GUI thread: the thread winds down on its
+        own and whatever it still reports is dropped by the generation check.
+        """
+        self.prelabel_generation += 1
+        prelabeler = self.prelabeler
+        self.prelabeler = None
+        if prelabeler is not None and prelabeler.isRunning():
+            prelabeler.stop()
+            self.stopped_prelabelers.add(prelabeler)
+            prelabeler.finished.connect(lambda: self.stopped_prelabelers.discard(prelabeler))
+
+    def on_predictions(self, predictions):
+        self.predictions.update(predictions)
+        if self.image_loader.index in predictions:
+            self.refresh_number_display()
+
+    def update_prelabel_progress(self, done, total):
+        self.prelabel_btn.setText(f"🤖 Pre-label ({done}/{total})" if done < total else "🤖 Pre-label ✔")
+
+    def apply_image_order(self, *args):
+        """Orders navigation by ascending prediction confidence (unpredicted images last) when selected."""
+        if self.order_box.currentIndex() == 0 or self.image_loader.manifest is None:
+            self.image_loader.set_order(None)
+            return
+        predictions = self.predictions
+        order = sorted(range(len(self.image_loader.image_list)),
+                       key=lambda i: (predictions[i][1], i) if i in predictions else (2.0, i))
+        self.image_loader.set_order(order)
+        self.show_image()
+
+    def refresh_number_display(self):
+        """Shows the typed label, or the model's suggestion for the current image (Enter accepts it)."""
+        prediction = self.predictions.get(self.image_loader.index) if self.image_loader.manifest else None
+        self.suggested_label = prediction[0] if prediction else None
+        if self.label_text:
+            self.number_display.setStyleSheet(NUMBER_STYLE)
+            self.number_display.setText(self.label_text)
+            self.number_display.setToolTip("")
+            self.showing_suggestion = False
+        elif prediction:
+            self.number_display.setStyleSheet(SUGGESTION_STYLE)
+            self.number_display.setText(prediction[0])
+            self.number_display.setToolTip(f"Model suggestion ({prediction[1]:.0%} confident); Enter accepts")
+            self.showing_suggestion = True
+        elif self.showing_suggestion:
+            self.number_display.setStyleSheet(NUMBER_STYLE)
+            self.number_display.setText("Enter Number")
+            self.number_display.setToolTip("")
+            self.showing_suggestion = False
+
     def save_annotation(self):
         """
         Saves the entered label for the current image.
@@ -296,41 +964,111 @@ class ImageAnnotator(QWidget):
         Suitable images (label not "unsuitable") increment the counter:
           - If augmentation is off, increment by 1.
           - If augmentation is on, increment by 10.
+        In "skip"/"propagate" duplicate mode, unlabeled near-duplicates of the image (nearby
+        and inside the leased chunk) are stepped over, or labeled the same after confirmation
+        (+1 each, without augmentation).
         Updates session statistics accordingly.
         """
-        label = self.label_text.strip()
+        label = self.label_text.strip() or (self.suggested_label if not self.is_grid_view() else "")
         if label == "--":
             label = "unsuitable"
         if not label or not self.output_folder:
             print("Error: No label entered or output folder not set.")
             return
+        if self.is_grid_view():
+            self.save_batch_annotation(label)
+            return
         image_path = self.image_loader.get_current_image()
         if not image_path:
             print("Error: No image loaded.")
             return
         print(f"Saving annotation for {image_path} in {self.output_folder}")
-        self.csv_handler.save_annotation(image_path, label, self.output_folder, self.session_data["session_id"])
-        self.session_data["images_annotated"] += 1
+        duplicates = self.image_loader.unlabeled_duplicates() if self.duplicate_mode != "off" else []
+        propagated = []
+        if self.duplicate_mode == "propagate" and duplicates and self.confirm_propagate(label, len(duplicates)):
+            print(f"Propagating label {label} to {len(duplicates)} near-duplicate image(s)")
+            propagated = duplicates
+        rows = [(image_path, label, self.session_data["session_id"])]
+        rows += [(self.image_loader.image_list[i], label, self.session_data["session_id"]) for i in propagated]
+        self.write_annotations(rows, self.output_folder)
+        self.image_loader.mark_labeled(image_path)
+        if propagated:
+            self.image_loader.label_duplicates(propagated)
+        elif duplicates and self.duplicate_mode == "skip":
+            print(f"Skipping {len(duplicates)} near-duplicate image(s)")
+            self.image_loader.skip_images(duplicates)
+        self.label_stats.record(label, len(rows))
         if label.lower() != "unsuitable":
-            if self.augmented_mode:
-                self.session_data["suitable_images"] += 10
-            else:
-                self.session_data["suitable_images"] += 1
+            # Only the labeled image itself is augmented; propagated duplicates count once each
+            self.session_data["suitable_images"] += (10 if self.augmented_mode else 1) + len(propagated)
         else:
             print("Image marked as unsuitable. No augmentation performed.")
-        if label.lower() != "unsuitable" and self.augmented_mode:
-            print("Augmented mode is ON: Saving augmented images")
-            aug_images = self.augmentor.augment_image(image_path, self.output_folder, True)
-            for img in aug_images:
-                self.csv_handler.save_annotation(img, label, self.output_folder, self.session_data["session_id"])
+        crop_image = self.save_roi(image_path)
+        session_id = self.session_data["session_id"]
+        augment = label.lower() != "unsuitable" and self.augmented_mode
+        on_written = None
+        if augment:
+            on_written = lambda source_path: self.augment_labeled([(image_path, source_path)], label,
+                                                                  session_id, crop_image)
+        # Labeled video frames are written out (by the reader thread) so training and augmentation
+        # have a file to read; augmentation then starts once the frame is on disk
+        source_path = self.image_loader.frame_source(image_path, self.output_folder, on_written)
+        if augment and source_path:
+            self.augment_labeled([(image_path, source_path)], label, session_id, crop_image)
         self.label_text = ""
         self.show_next_image()
+        self.advance_work()
+        self.update_session_stats()
+
+    def save_batch_annotation(self, label):
+        """
+        Applies one label to every image selected in the grid as a single bulk write,
+        then moves the selection to the image after the last labeled one.
+        """
+        rows = self.thumbnail_grid.selected_rows()
+        if not rows:
+            print("Error: No images selected.")
+            return
+        session_id = self.session_data["session_id"]
+        image_paths = [self.image_loader.image_list[row] for row in rows]
+        print(f"Saving label {label} for {len(rows)} image(s) in {self.output_folder}")
+        self.write_annotations([(image_path, label, session_id) for image_path in image_paths], self.output_folder)
+        self.image_loader.mark_labeled_indices(rows)
+        self.thumbnail_model.set_labels(rows, label)
+        augment = label.lower() != "unsuitable" and self.augmented_mode
+        ready = []  # Sources on disk now; video frames still being written are augmented as they land
+        for image_path in image_paths:
+            on_written = None
+            if augment:
+                on_written = lambda source_path, image_path=image_path: self.augment_labeled(
+                    [(image_path, source_path)], label, session_id)
+            source_path = self.image_loader.frame_source(image_path, self.output_folder, on_written)
+            if source_path:
+                ready.append((image_path, source_path))
+        self.label_stats.record(label, len(rows))
+        if label.lower() != "unsuitable":
+            self.session_data["suitable_images"] += len(rows) * (10 if self.augmented_mode else 1)
+        if augment and ready:
+            self.augment_labeled(ready, label, session_id)
+        self.label_text = ""
+        next_row = min(rows[-1] + 1, len(self.image_loader.image_list) - 1)
+        self.image_loader.index = next_row
+        self.thumbnail_grid.select_row(next_row)
+        self.advance_work()
         self.update_session_stats()
 
     def keyPressEvent(self, event):
         key = event.key()
-        if key == Qt.Key_Left:
+        if key == Qt.Key_G and event.modifiers() & Qt.ControlModifier:
+            self.toggle_grid_view()
+        elif key == Qt.Key_D and event.modifiers() & Qt.ControlModifier:
+            self.toggle_dashboard()
+        elif key == Qt.Key_T and event.modifiers() & Qt.ControlModifier:
+            self.toggle_perf_overlay()
+        elif key == Qt.Key_Left:
             self.show_prev_image()
+        elif key == Qt.Key_Right and event.modifiers() & Qt.ControlModifier:
+            self.show_next_unlabeled_image()
         elif key == Qt.Key_Right:
             self.show_next_image()
         elif key == Qt.Key_Return or key == Qt.Key_Enter:
@@ -348,6 +1086,8 @@ class ImageAnnotator(QWidget):
         elif key == Qt.Key_Backspace:
             self.label_text = self.label_text[:-1]
             self.number_display.setText(self.label_text if self.label_text else "Enter Number")
+        if Qt.Key_0 <= key <= Qt.Key_9 or key in (Qt.Key_Minus, Qt.Key_Backspace):
+            self.refresh_number_display()
         event.accept()
 
 if __name__ == "__main__":
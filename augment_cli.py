@@ -0,0 +1,170 @@
+import os
+import re
+import sys
+import time
+import zlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from augmentor import Augmentor
+from augmentation_pipeline import AugmentationPipeline
+from image_writer import ImageWriter, EncoderSettings, FORMATS
+from csv_handler import CSVHandler
+
+AUGMENTED_NAME = re.compile(r"_aug\d+\.[^.]+$")
+CHECKPOINT_FILE = "augment_checkpoint.txt"
+
+
+def image_seed(base_seed, image_name):
+    """Derives a per-image seed that does not depend on scheduling or worker count."""
+    return (base_seed * 1000003 + zlib.crc32(image_name.encode("utf-8"))) & 0xFFFFFFFF
+
+
+def augment_chunk(chunk, input_dir, output_dir, variants, base_seed, pipeline_path=None, encoder=None,
+                  writer_threads=4):
+    """
+    Worker entry point: augments a chunk of (image_name, label) pairs.
+    Returns (annotation rows, augmentation records, finished image names, writer stats).
+    Images that produced no output (unreadable sources) are not finished, so a rerun retries them.
+    """
+    pipeline = AugmentationPipeline.from_json(pipeline_path) if pipeline_path else AugmentationPipeline()
+    writer = ImageWriter(encoder, max_workers=writer_threads)
+    augmentor = Augmentor(pipeline, writer)
+    augmentor.augment_count = variants
+    pipeline_id = pipeline.spec_id()
+    rows = []
+    records = []
+    done = []
+    for image_name, label in chunk:
+        seed = image_seed(base_seed, image_name)
+        paths = augmentor.augment_image(os.path.join(input_dir, image_name), output_dir, True, seed)
+        for variant, path in enumerate(paths):
+            rows.append((path, label))
+            records.append((path, image_name, seed, variant, pipeline_id))
+        if paths:
+            done.append(image_name)
+    writer.close()
+    return rows, records, done, writer.stats()
+
+
+def checkpoint_header(args, pipeline_id, encoder):
+    """First checkpoint line: everything that decides what a finished image's outputs look like."""
+    settings = " ".join(f"{key}={value}" for key, value in sorted(encoder.items()))
+    return f"# seed={args.seed} variants={args.variants} pipeline={pipeline_id} {settings}"
+
+
+def load_checkpoint(checkpoint_path):
+    """
+    Returns (header, set of source image names already augmented by a previous run).
+    The header is None for an empty or missing checkpoint, "" for one written before headers existed.
+    """
+    if not os.path.isfile(checkpoint_path):
+        return None, set()
+    with open(checkpoint_path, "r") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    if not lines:
+        return None, set()
+    header = lines[0] if lines[0].startswith("#") else ""
+    return header, {line for line in lines if not line.startswith("#")}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Regenerate augmented images from annotations.csv without the GUI.")
+    parser.add_argument("--annotations-dir", required=True, help="Folder containing annotations.csv")
+    parser.add_argument("--input-dir", required=True, help="Folder containing the source images")
+    parser.add_argument("--output-dir", required=True, help="Folder for augmented images and their annotations.csv")
+    parser.add_argument("--variants", type=int, default=10, help="Augmented variants per image (default: 10)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Images per scheduled chunk (default: 64)")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed for deterministic output (default: 0)")
+    parser.add_argument("--pipeline", help="JSON file with the augmentation pipeline config (default: built-in)")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore an existing checkpoint and start over")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="jpg", help="Output image format (default: jpg)")
+    parser.add_argument("--quality", type=int, default=95, help="JPEG/WebP quality (default: 95)")
+    parser.add_argument("--png-compression", type=int, default=3, help="PNG compression level 0-9 (default: 3)")
+    parser.add_argument("--lossless", action="store_true", help="Lossless WebP")
+    parser.add_argument("--writer-threads", type=int, default=4, help="Encode/write threads per worker (default: 4)")
+    parser.add_argument("--log-level", default="WARNING", help="Logging level, e.g. INFO or DEBUG for per-file lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    encoder = EncoderSettings(args.format, jpeg_quality=args.quality, png_compression=args.png_compression,
+                              webp_quality=args.quality, lossless=args.lossless).to_dict()
+    annotations = CSVHandler.for_folder(args.annotations_dir).load_existing_annotations(args.annotations_dir)
+    csv_handler = CSVHandler()  # Outputs get a plain annotations.csv in the output folder
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    pipeline = AugmentationPipeline.from_json(args.pipeline) if args.pipeline else AugmentationPipeline()
+    header = checkpoint_header(args, pipeline.spec_id(), encoder)
+    checkpoint_path = os.path.join(args.output_dir, CHECKPOINT_FILE)
+    if args.no_resume and os.path.isfile(checkpoint_path):
+        os.remove(checkpoint_path)
+    previous, finished = load_checkpoint(checkpoint_path)
+    if previous is not None and previous != header:
+        # Resuming would skip the finished images and mix two configurations in one output folder
+        print(f"Error: {checkpoint_path} was written with different settings "
+              f"({previous or 'unknown settings'}, now {header.lstrip('# ')}). "
+              f"Use the same --seed/--variants/--pipeline and encoder options, or --no-resume to start over.")
+        return 2
+
+    # Skip unsuitable rows, rows that are themselves augmentation outputs, and finished work
+    todo = sorted((name, values[0]) for name, values in annotations.items()
+                  if values[0].lower() != "unsuitable"
+                  and not AUGMENTED_NAME.search(name)
+                  and name not in finished)
+    recipes = csv_handler.load_augmentation_recipes(args.annotations_dir)
+    if recipes:
+        print(f"Note: {len(recipes)} image(s) have augmented variants recorded in {csv_handler.recipes_file_name} "
+              f"(produced on read); dataset_export.py exports them and virtual_dataset.py --materialize-to writes them.")
+    if not todo:
+        print("Nothing to augment.")
+        return 0
+    print(f"Augmenting {len(todo)} images x {args.variants} variants with {args.workers} workers "
+          f"({len(finished)} already done).")
+
+    chunks = [todo[i:i + args.chunk_size] for i in range(0, len(todo), args.chunk_size)]
+    session_id = time.strftime("%Y%m%d_%H%M%S")
+    images_done = 0
+    files_written = 0
+    bytes_written = 0
+    peak_depth = 0
+    write_failures = 0
+    images_failed = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor, open(checkpoint_path, "a") as checkpoint:
+        if previous is None:
+            checkpoint.write(header + "\n")
+            checkpoint.flush()
+        futures = {executor.submit(augment_chunk, chunk, args.input_dir, args.output_dir,
+                                   args.variants, args.seed, args.pipeline, encoder, args.writer_threads): len(chunk)
+                   for chunk in chunks}
+        for future in as_completed(futures):
+            rows, records, done, stats = future.result()
+            images_failed += futures[future] - len(done)
+            # CSV rows go out before the checkpoint so a crash can only repeat work, never lose rows
+            csv_handler.save_annotations([(path, label, session_id) for path, label in rows], args.output_dir)
+            csv_handler.save_augmentations(records, args.output_dir)
+            checkpoint.write("".join(f"{name}\n" for name in done))
+            checkpoint.flush()
+            images_done += len(done)
+            files_written += len(rows)
+            bytes_written += stats["bytes_written"]
+            peak_depth = max(peak_depth, stats["peak_queue_depth"])
+            write_failures += stats["failed"]
+
+    elapsed = time.perf_counter() - start
+    mb_written = bytes_written / (1024 * 1024)
+    print(f"Done: {images_done} images, {files_written} files, {mb_written:.1f} MB in {elapsed:.1f}s "
+          f"({images_done / elapsed:.1f} images/sec, {mb_written / elapsed:.1f} MB/sec), "
+          f"peak write queue {peak_depth}, {write_failures} failed write(s)")
+    if images_failed:
+        print(f"{images_failed} image(s) could not be read and were not checkpointed; rerun to retry them.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import os
+import json
+import hashlib
+
+import cv2
+import numpy as np
+
+# Geometric ops are expressed as 3x3 matrices so consecutive ones can be fused into one warp
+GEOMETRIC_OPS = ("rotate", "shift_perspective", "random_crop_resize", "affine_transform")
+PHOTOMETRIC_OPS = ("adjust_hue", "adjust_brightness_contrast", "add_noise", "gaussian_blur")
+
+DEFAULT_STEPS = [
+    {"op": "rotate", "p": 0.5, "angle": [-25, 25]},
+    {"op": "shift_perspective", "p": 0.3, "shift": [-20, 20]},
+    {"op": "random_crop_resize", "p": 0.3, "min_crop": 5, "max_fraction": 1 / 6},
+    {"op": "affine_transform", "p": 0.3, "offset": [-10, 10]},
+    {"op": "adjust_hue", "p": 0.3, "shift": [-10, 10]},
+    {"op": "adjust_brightness_contrast", "p": 0.5, "alpha": [0.7, 1.3], "beta": [-30, 30]},
+    {"op": "add_noise", "p": 0.3, "high": 30},
+    {"op": "gaussian_blur", "p": 0.2, "ksize": [3, 5]},
+]
+
+
+class AugmentationPipeline:
+    def __init__(self, steps=None, min_ops=1):
+        """
+        Declarative augmentation pipeline. Each step is a dict with an "op" name, a
+        probability "p" and op-specific parameter ranges; steps run in list order.
+        At least min_ops steps are applied to every variant.
+        """
+        self.steps = [dict(step) for step in (steps if steps is not None else DEFAULT_STEPS)]
+        self.min_ops = min_ops
+        for step in self.steps:
+            if step.get("op") not in GEOMETRIC_OPS + PHOTOMETRIC_OPS:
+                raise ValueError(f"Unknown augmentation op: {step.get('op')}")
+
+    @classmethod
+    def from_json(cls, path):
+        """Loads a pipeline from a JSON file holding either a list of steps or {"steps": [...], "min_ops": n}."""
+        with open(path, "r") as f:
+            config = json.load(f)
+        if isinstance(config, list):
+            return cls(config)
+        return cls(config["steps"], config.get("min_ops", 1))
+
+    def to_dict(self):
+        return {"steps": self.steps, "min_ops": self.min_ops}
+
+    def spec_id(self):
+        """Short stable identifier of this configuration, recorded alongside each variant's seed."""
+        canonical = json.dumps(self.to_dict(), sort_keys=True)
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+
+    def save(self, folder):
+        """Writes the configuration to <folder>/augmentation_pipeline_<spec_id>.json if not already there."""
+        path = os.path.join(folder, f"augmentation_pipeline_{self.spec_id()}.json")
+        if not os.path.isfile(path):
+            with open(path, "w") as f:
+                json.dump(self.to_dict(), f, indent=4)
+        return path
+
+    @staticmethod
+    def variant_rng(seed, variant):
+        """Random state for one variant, fully determined by the per-image seed and variant index."""
+        return np.random.RandomState([seed & 0xFFFFFFFF, variant])
+
+    def apply(self, img, seed, variant):
+        """Produces augmented variant number `variant` of img, reproducibly from seed."""
+        rng = self.variant_rng(seed, variant)
+        chosen = rng.uniform(size=len(self.steps)) < [step.get("p", 1.0) for step in self.steps]
+        missing = self.min_ops - int(chosen.sum())
+        if missing > 0:
+            unchosen = np.flatnonzero(~chosen)
+            chosen[rng.choice(unchosen, min(missing, len(unchosen)), replace=False)] = True
+
+        h, w = img.shape[:2]
+        matrix = None
+        for step, active in zip(self.steps, chosen):
+            if not active:
+                continue
+            if step["op"] in GEOMETRIC_OPS:
+                step_matrix = getattr(self, f"_{step['op']}")(step, rng, w, h)
+                matrix = step_matrix if matrix is None else step_matrix @ matrix
+            else:
+                if matrix is not None:
+                    img = cv2.warpPerspective(img, matrix, (w, h))
+                    matrix = None
+                img = getattr(self, f"_{step['op']}")(img, step, rng)
+        if matrix is not None:
+            img = cv2.warpPerspective(img, matrix, (w, h))
+        return img
+
+    # Geometric ops: return a 3x3 matrix mapping source to destination pixels
+
+    def _rotate(self, step, rng, w, h):
+        angle = rng.uniform(*step.get("angle", [-25, 25]))
+        return np.vstack([cv2.getRotationMatrix2D((w//2, h//2), angle, 1), [0, 0, 1]])
+
+    def _shift_perspective(self, step, rng, w, h):
+        shift = rng.uniform(*step.get("shift", [-20, 20]))
+        pts1 = np.float32([[0, 0], [w-1, 0], [0, h-1], [w-1, h-1]])
+        pts2 = np.float32([[shift, shift], [w-shift, shift], [shift, h-shift], [w-shift, h-shift]])
+        return cv2.getPerspectiveTransform(pts1, pts2)
+
+    def _random_crop_resize(self, step, rng, w, h):
+        min_crop = step.get("min_crop", 5)
+        max_crop_x = int(w * step.get("max_fraction", 1 / 6))
+        max_crop_y = int(h * step.get("max_fraction", 1 / 6))
+        if max_crop_x <= min_crop or max_crop_y <= min_crop:
+            return np.eye(3)
+        crop_x = rng.randint(min_crop, max_crop_x + 1)
+        crop_y = rng.randint(min_crop, max_crop_y + 1)
+        sx = w / (w - 2 * crop_x)
+        sy = h / (h - 2 * crop_y)
+        return np.array([[sx, 0, -crop_x * sx], [0, sy, -crop_y * sy], [0, 0, 1]])
+
+    def _affine_transform(self, step, rng, w, h):
+        low, high = step.get("offset", [-10, 10])
+        src_pts = np.float32([[0, 0], [w-1, 0], [0, h-1]])
+        dst_pts = src_pts + rng.randint(low, high + 1, (3, 2)).astype(np.float32)
+        return np.vstack([cv2.getAffineTransform(src_pts, dst_pts), [0, 0, 1]])
+
+    # Photometric ops: transform the image directly
+
+    def _adjust_hue(self, img, step, rng):
+        low, high = step.get("shift", [-10, 10])
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        hsv[:, :, 0] = (hsv[:, :, 0].astype(np.int16) + rng.randint(low, high + 1)) % 180
+        return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+    def _adjust_brightness_contrast(self, img, step, rng):
+        alpha = rng.uniform(*step.get("alpha", [0.7, 1.3]))
+        low, high = step.get("beta", [-30, 30])
+        return cv2.convertScaleAbs(img, alpha=alpha, beta=int(rng.randint(low, high + 1)))
+
+    def _add_noise(self, img, step, rng):
+        return cv2.add(img, rng.randint(0, step.get("high", 30), img.shape, dtype=np.uint8))
+
+    def _gaussian_blur(self, img, step, rng):
+        ksize = int(rng.choice(step.get("ksize", [3, 5])))
+        return cv2.GaussianBlur(img, (ksize, ksize), 0)
@@ -0,0 +1,133 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from augmentor import Augmentor
+from image_writer import ImageWriter
+from tracing import tracer, span
+
+_worker_writer = None
+
+
+def init_worker(encoder=None):
+    """Gives each worker process one ImageWriter with the queue's encoder settings."""
+    global _worker_writer
+    _worker_writer = ImageWriter(encoder)
+
+
+def run_augmentation_job(image_path, output_folder, seed, image=None):
+    """
+    Worker entry point: augments one image (or the pre-cropped image array) in a child process.
+    Returns (written paths, (start, end) wall-clock ns, worker pid, writer stats) so the parent
+    can trace the job and report write throughput.
+    """
+    start = time.time_ns()
+    paths = Augmentor(writer=_worker_writer).augment_image(image_path, output_folder, True, seed, image)
+    stats = _worker_writer.stats() if _worker_writer is not None else None
+    return paths, (start, time.time_ns()), os.getpid(), stats
+
+
+class AugmentationQueue:
+    def __init__(self, max_workers=None, encoder=None):
+        """
+        Runs Augmentor.augment_image jobs on a process pool so the GUI thread only enqueues work.
+        Finished jobs are handed back through collect() / drain().
+        encoder holds the EncoderSettings (or their dict) the workers' ImageWriters use.
+        """
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.encoder = encoder
+        self.worker_stats = {}  # {worker pid: latest ImageWriter stats}
+        self.executor = None
+        self.pending = []  # [(future, image_path, label, output_folder, session_id, seed)]
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, image_path, label, output_folder, session_id, image=None):
+        """
+        Enqueues an augmentation job and returns immediately.
+        image is an optional decoded BGR array (an ROI crop) sent instead of re-reading the file.
+        """
+        if self.executor is None:
+            # Spawn rather than fork: the parent process is running a Qt event loop
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=init_worker, initargs=(self.encoder,))
+        if not self.pending:
+            # Start a fresh progress batch once the previous backlog has drained
+            self.submitted = 0
+            self.completed = 0
+        seed = Augmentor.new_seed()
+        with span("augment.submit"):
+            future = self.executor.submit(run_augmentation_job, image_path, output_folder, seed, image)
+        self.pending.append((future, image_path, label, output_folder, session_id, seed))
+        self.submitted += 1
+
+    def write_stats(self):
+        """Image writer totals across the worker processes: files, bytes, throughput and peak queue depth."""
+        workers = list(self.worker_stats.values())
+        return {
+            "written": sum(s["written"] for s in workers),
+            "failed": sum(s["failed"] for s in workers),
+            "bytes_written": sum(s["bytes_written"] for s in workers),
+            "files_per_s": sum(s["files_per_s"] for s in workers),
+            "mb_per_s": sum(s["mb_per_s"] for s in workers),
+            "peak_queue_depth": max((s["peak_queue_depth"] for s in workers), default=0),
+        }
+
+    def backlog(self):
+        """Returns the number of jobs that have not finished yet."""
+        return len(self.pending)
+
+    def collect(self):
+        """
+        Returns [(image_path, label, output_folder, session_id, seed, written_paths)]
+        for all finished jobs without blocking.
+        """
+        results = []
+        still_pending = []
+        for job in self.pending:
+            if job[0].done():
+                result = self._job_result(job)
+                if result:
+                    results.append(result)
+            else:
+                still_pending.append(job)
+        self.pending = still_pending
+        return results
+
+    def drain(self, on_progress=None):
+        """
+        Blocks until every queued job has finished, then shuts the pool down.
+        on_progress(completed, submitted) is called after each batch of completions.
+        Returns the results of all jobs that finished during the drain, as collect() does.
+        """
+        results = []
+        while self.pending:
+            wait([job[0] for job in self.pending], return_when=FIRST_COMPLETED)
+            results.extend(self.collect())
+            if on_progress:
+                on_progress(self.completed, self.submitted)
+        self.shutdown()
+        return results
+
+    def shutdown(self):
+        """Stops the worker processes."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def _job_result(self, job):
+        future, image_path, label, output_folder, session_id, seed = job
+        self.completed += 1
+        try:
+            paths, (start_ns, end_ns), pid, stats = future.result()
+        except Exception as e:
+            self.failed += 1
+            print(f"Error augmenting {image_path}: {e}")
+            return None
+        tracer.record_external("augment.job", start_ns, end_ns, pid, {"image": os.path.basename(image_path)})
+        if stats is not None:
+            self.worker_stats[pid] = stats
+        return image_path, label, output_folder, session_id, seed, paths
@@ -2,51 +2,63 @@ import cv2
 import numpy as np
 import os
 import random
+import logging
+
+from augmentation_pipeline import AugmentationPipeline
+from image_writer import default_writer
+
+logger = logging.getLogger("annotator.augmentor")
 
 class Augmentor:
-    def __init__(self):
+    def __init__(self, pipeline=None, writer=None):
         self.augment_count = 10  # Number of augmented versions per image
+        self.pipeline = pipeline if pipeline is not None else AugmentationPipeline()
+        self.writer = writer  # ImageWriter for the outputs; the process-wide default one if None
+
+    @staticmethod
+    def new_seed():
+        """Returns a fresh 32-bit per-image seed."""
+        return random.getrandbits(32)
 
-    def augment_image(self, image_path, output_folder, augmented_mode):
+    def augment_image(self, image_path, output_folder, augmented_mode, seed=None, image=None):
         """
         Applies augmentation transformations if augmented mode is enabled.
         Saves the original image as _aug0 and augmented images as _aug1, _aug2, etc.
+        Variant i is produced by the pipeline from (seed, i), so recording the seed
+        is enough to reproduce every variant.
+        image, if given, is the already decoded BGR array to use (e.g. a jersey ROI crop);
+        outputs are still named after image_path.
+        Encoding and writing run on the ImageWriter's threads while the next variant is
+        generated; the call returns the written paths once all of them are on disk.
         """
-        img = cv2.imread(image_path)
+        img = image if image is not None else cv2.imread(image_path)
         if img is None:
-            print(f"Error: Could not read image {image_path}")
+            logger.warning("read failed path=%s", image_path)
             return []
-        if not os.path.exists(output_folder):
-            os.makedirs(output_folder)
-            print(f"Created output folder: {output_folder}")
-        augmented_images = []
+        os.makedirs(output_folder, exist_ok=True)
+        writer = self.writer or default_writer()
+        ext = writer.extension
         base_name = os.path.splitext(os.path.basename(image_path))[0]
+        writes = []
         if augmented_mode:
-            original_aug_path = os.path.join(output_folder, f"{base_name}_aug0.jpg")
-            if cv2.imwrite(original_aug_path, img):
-                print(f"Saved original image: {original_aug_path}")
-            else:
-                print(f"Error saving original image: {original_aug_path}")
-            augmented_images.append(original_aug_path)
+            if seed is None:
+                seed = self.new_seed()
+            self.pipeline.save(output_folder)
+            original_aug_path = os.path.join(output_folder, f"{base_name}_aug0{ext}")
+            writes.append((original_aug_path, writer.write(original_aug_path, img)))
             for i in range(1, self.augment_count + 1):
-                aug_img = self.apply_random_transformation(img)
-                aug_path = os.path.join(output_folder, f"{base_name}_aug{i}.jpg")
-                if cv2.imwrite(aug_path, aug_img):
-                    print(f"Saved augmented image: {aug_path}")
-                else:
-                    print(f"Error saving augmented image: {aug_path}")
-                augmented_images.append(aug_path)
+                aug_path = os.path.join(output_folder, f"{base_name}_aug{i}{ext}")
+                writes.append((aug_path, writer.write(aug_path, self.pipeline.apply(img, seed, i))))
         else:
-            original_path = os.path.join(output_folder, f"{base_name}.jpg")
-            if cv2.imwrite(original_path, img):
-                print(f"Saved original image (no augmentation): {original_path}")
-            else:
-                print(f"Error saving original image: {original_path}")
-            augmented_images.append(original_path)
+            original_path = os.path.join(output_folder, f"{base_name}{ext}")
+            writes.append((original_path, writer.write(original_path, img)))
+        augmented_images = [path for path, future in writes if future.result()]
+        logger.info("augmented source=%s variants=%d failed=%d", image_path, len(augmented_images),
+                    len(writes) - len(augmented_images))
         return augmented_images
 
     def apply_random_transformation(self, img):
-        """Applies a random augmentation transformation."""
+        """Applies a single random augmentation transformation (legacy, unseeded)."""
         transformations = [
             self.rotate, self.add_noise, self.shift_perspective, self.adjust_hue,
             self.adjust_brightness_contrast, self.gaussian_blur, self.random_crop_resize, self.affine_transform
@@ -111,3 +123,134 @@ class Augmentor:
                               [random.randint(-10, 10), h-1+random.randint(-10, 10)]])
         M = cv2.getAffineTransform(src_pts, dst_pts)
         return cv2.warpAffine(img, M, (w, h))
+
+    # ------------------------------------------------------------------
+    # Batch API: operates on a stack of same-size crops (N x H x W x 3 uint8)
+    # ------------------------------------------------------------------
+
+    BATCH_TRANSFORMS = ("rotate", "add_noise", "shift_perspective", "adjust_hue", "adjust_brightness_contrast",
+                        "gaussian_blur", "random_crop_resize", "affine_transform")
+
+    def sample_batch_params(self, name, n, rng=None):
+        """
+        Draws per-image parameters for a batch transform in one vectorized call.
+        rng may be a numpy RandomState; defaults to the global numpy random state.
+        """
+        rng = rng if rng is not None else np.random
+        if name == "rotate":
+            return {"angle": rng.uniform(-25, 25, n)}
+        if name == "add_noise":
+            return {"high": 30}
+        if name == "shift_perspective":
+            return {"shift": rng.uniform(-20, 20, n)}
+        if name == "adjust_hue":
+            return {"shift": rng.randint(-10, 11, n)}
+        if name == "adjust_brightness_contrast":
+            return {"alpha": rng.uniform(0.7, 1.3, n), "beta": rng.randint(-30, 31, n)}
+        if name == "gaussian_blur":
+            return {"ksize": rng.choice([3, 5], n)}
+        if name == "random_crop_resize":
+            return {"u": rng.uniform(0, 1, (n, 2))}
+        if name == "affine_transform":
+            return {"offsets": rng.randint(-10, 11, (n, 3, 2))}
+        raise ValueError(f"Unknown batch transform: {name}")
+
+    def transform_batch(self, batch, name, params=None, out=None, inplace=False, rng=None):
+        """
+        Applies the named transform to every image of batch (N x H x W x 3 uint8).
+        Parameters are drawn with sample_batch_params unless given. Results are written
+        into out (allocated if None), or into batch itself when inplace is True; either
+        buffer must be C-contiguous, since the stacked transforms write through reshaped views.
+        """
+        if batch.ndim != 4 or batch.shape[3] != 3 or batch.dtype != np.uint8:
+            raise ValueError(f"Expected an N x H x W x 3 uint8 batch, got {batch.shape} {batch.dtype}")
+        if inplace:
+            if not batch.flags.c_contiguous:
+                raise ValueError("In-place transforms need a C-contiguous batch (use np.ascontiguousarray)")
+            out = batch
+        elif out is None:
+            out = np.empty_like(batch)
+        elif out.shape != batch.shape or out.dtype != batch.dtype or not out.flags.c_contiguous:
+            raise ValueError("Output buffer must be a C-contiguous array with the same shape and dtype as batch")
+        if params is None:
+            params = self.sample_batch_params(name, batch.shape[0], rng)
+        getattr(self, f"_batch_{name}")(batch, out, params, rng if rng is not None else np.random)
+        return out
+
+    @staticmethod
+    def _warp_source(batch, out, i):
+        # Warps cannot read and write the same buffer, so in-place mode copies the (small) source crop
+        return batch[i].copy() if out is batch else batch[i]
+
+    def _batch_rotate(self, batch, out, params, rng):
+        n, h, w = batch.shape[:3]
+        cx, cy = w // 2, h // 2
+        theta = np.deg2rad(params["angle"])
+        a, b = np.cos(theta), np.sin(theta)
+        # Same matrices as cv2.getRotationMatrix2D, built for the whole batch at once
+        matrices = np.empty((n, 2, 3))
+        matrices[:, 0, 0], matrices[:, 0, 1], matrices[:, 0, 2] = a, b, (1 - a) * cx - b * cy
+        matrices[:, 1, 0], matrices[:, 1, 1], matrices[:, 1, 2] = -b, a, b * cx + (1 - a) * cy
+        for i in range(n):
+            cv2.warpAffine(self._warp_source(batch, out, i), matrices[i], (w, h), dst=out[i])
+
+    def _batch_add_noise(self, batch, out, params, rng):
+        n, h, w = batch.shape[:3]
+        noise = rng.randint(0, params["high"], batch.shape, dtype=np.uint8)
+        # One saturating add over the whole stack viewed as a single 2D image
+        cv2.add(batch.reshape(n * h, w * 3), noise.reshape(n * h, w * 3), dst=out.reshape(n * h, w * 3))
+
+    def _batch_shift_perspective(self, batch, out, params, rng):
+        n, h, w = batch.shape[:3]
+        pts1 = np.float32([[0, 0], [w-1, 0], [0, h-1], [w-1, h-1]])
+        for i, shift in enumerate(params["shift"]):
+            pts2 = np.float32([[shift, shift], [w-shift, shift], [shift, h-shift], [w-shift, h-shift]])
+            cv2.warpPerspective(self._warp_source(batch, out, i), cv2.getPerspectiveTransform(pts1, pts2),
+                                (w, h), dst=out[i])
+
+    def _batch_adjust_hue(self, batch, out, params, rng):
+        n, h, w = batch.shape[:3]
+        # A single HSV round-trip for the whole stack, viewed as one tall image
+        hsv = cv2.cvtColor(batch.reshape(n * h, w, 3), cv2.COLOR_BGR2HSV).reshape(n, h, w, 3)
+        hue = hsv[..., 0].astype(np.int16)
+        hue += np.asarray(params["shift"], dtype=np.int16)[:, None, None]
+        np.mod(hue, 180, out=hue)
+        hsv[..., 0] = hue
+        cv2.cvtColor(hsv.reshape(n * h, w, 3), cv2.COLOR_HSV2BGR, dst=out.reshape(n * h, w, 3))
+
+    def _batch_adjust_brightness_contrast(self, batch, out, params, rng):
+        n = batch.shape[0]
+        # Per-image lookup tables reproducing cv2.convertScaleAbs, applied with one gather
+        levels = np.arange(256, dtype=np.float32)
+        luts = np.abs(np.asarray(params["alpha"], dtype=np.float32)[:, None] * levels
+                      + np.asarray(params["beta"], dtype=np.float32)[:, None])
+        luts = np.clip(np.rint(luts), 0, 255).astype(np.uint8)
+        out.reshape(n, -1)[...] = np.take_along_axis(luts, batch.reshape(n, -1), axis=1)
+
+    def _batch_gaussian_blur(self, batch, out, params, rng):
+        for i, ksize in enumerate(params["ksize"]):
+            ksize = int(ksize)
+            cv2.GaussianBlur(batch[i], (ksize, ksize), 0, dst=out[i])
+
+    def _batch_random_crop_resize(self, batch, out, params, rng):
+        n, h, w = batch.shape[:3]
+        max_crop_x, max_crop_y = w // 6, h // 6
+        if w < 30 or h < 30 or max_crop_x <= 5 or max_crop_y <= 5:
+            if out is not batch:
+                out[...] = batch
+            return
+        crop_x = (5 + params["u"][:, 0] * (max_crop_x - 4)).astype(int)
+        crop_y = (5 + params["u"][:, 1] * (max_crop_y - 4)).astype(int)
+        for i in range(n):
+            cropped = batch[i, crop_y[i]:h-crop_y[i], crop_x[i]:w-crop_x[i]]
+            if out is batch:
+                cropped = cropped.copy()  # source and destination share memory
+            cv2.resize(cropped, (w, h), dst=out[i])
+
+    def _batch_affine_transform(self, batch, out, params, rng):
+        n, h, w = batch.shape[:3]
+        src_pts = np.float32([[0, 0], [w-1, 0], [0, h-1]])
+        dst_pts = src_pts[None, :, :] + np.asarray(params["offsets"], dtype=np.float32)
+        for i in range(n):
+            cv2.warpAffine(self._warp_source(batch, out, i), cv2.getAffineTransform(src_pts, dst_pts[i]),
+                           (w, h), dst=out[i])
@@ -0,0 +1,312 @@
+import os
+import sys
+import csv
+import json
+import math
+import time
+import shutil
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Headless by default: the Qt paths run on the offscreen platform plugin, no display or GPU needed
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import cv2
+import numpy as np
+
+from csv_handler import CSVHandler
+from annotation_store import CSV_HEADER
+from augmentor import Augmentor
+
+BENCHMARKS = ("csv", "load", "show", "augment")
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(durations, items_per_op=1):
+    """Turns a list of durations in seconds into latency/throughput statistics."""
+    values = sorted(durations)
+    total = sum(values)
+    return {
+        "n": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "mean_ms": total / len(values) * 1000 if values else 0.0,
+        "throughput_per_s": len(values) * items_per_op / total if total else 0.0,
+    }
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process, or of any worker pool it waited for, so far
+    (ru_maxrss is in KiB on Linux).
+    """
+    return max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) / 1024
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+# ---- synthetic data ---------------------------------------------------------
+
+def make_images(folder, count, size, seed=0):
+    """Writes count synthetic jersey-like JPEGs (noisy background, a big number) into folder."""
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.RandomState(seed)
+    width, height = size
+    paths = []
+    for i in range(count):
+        img = rng.randint(0, 256, (height, width, 3), dtype=np.uint8)
+        img = cv2.GaussianBlur(img, (9, 9), 0)
+        cv2.putText(img, str(rng.randint(1, 100)), (width // 6, height * 2 // 3),
+                    cv2.FONT_HERSHEY_SIMPLEX, height / 80, (255, 255, 255), max(1, height // 40))
+        path = os.path.join(folder, f"IMG_{i:06d}.jpg")
+        cv2.imwrite(path, img)
+        paths.append(path)
+    return paths
+
+
+def make_annotations_csv(output_folder, rows, seed=0):
+    """Writes an annotations.csv with rows synthetic annotations."""
+    os.makedirs(output_folder, exist_ok=True)
+    rnd = random.Random(seed)
+    with open(os.path.join(output_folder, CSVHandler().file_name), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for i in range(rows):
+            writer.writerow([f"IMG_{i:06d}.jpg", str(rnd.randint(1, 99)), "bench", "2024-01-01 00:00:00"])
+
+
+# ---- benchmarks -------------------------------------------------------------
+
+def bench_csv(args, workdir):
+    results = {}
+    for mode, use_store in (("csv", False), ("store", True)):
+        output = os.path.join(workdir, f"csv_{mode}")
+        handler = CSVHandler(use_store=use_store)
+        os.makedirs(output, exist_ok=True)
+        durations = [timed(handler.save_annotation, f"IMG_{i:06d}.jpg", "10", output, "bench")
+                     for i in range(args.ops)]
+        results[f"csv.save_annotation[{mode}]"] = summarize(durations)
+
+        output = os.path.join(workdir, f"csv_load_{mode}")
+        make_annotations_csv(output, args.rows, args.seed)
+        handler = CSVHandler(use_store=use_store)
+        handler.load_existing_annotations(output)  # The store imports the CSV on first use
+        durations = [timed(handler.load_existing_annotations, output) for _ in range(args.repeat)]
+        results[f"csv.load_existing_annotations[{mode}]"] = summarize(durations, args.rows)
+    return results
+
+
+def wait_for_scan(app, image_loader):
+    while image_loader.is_scanning() or image_loader.manifest is None:
+        app.processEvents()
+        time.sleep(0.001)
+    app.processEvents()
+
+
+def bench_load(args, workdir, app, folder):
+    from image_loader import ImageLoader
+    output = os.path.join(workdir, "load_output")
+    os.makedirs(output, exist_ok=True)
+    results = {}
+    for mode in ("cold", "warm"):
+        durations = []
+        for _ in range(args.repeat):
+            if mode == "cold":
+                shutil.rmtree(os.path.join(output, ".manifests"), ignore_errors=True)
+            loader = ImageLoader(CSVHandler(), dedup=False)
+            start = time.perf_counter()
+            loader.load_images(folder, output, None)
+            wait_for_scan(app, loader)
+            durations.append(time.perf_counter() - start)
+        results[f"load_images[{mode}]"] = summarize(durations, args.images)
+    return results
+
+
+def bench_show(args, workdir, app, folder):
+    from annotator import ImageAnnotator
+    window = ImageAnnotator()
+    window.resize(1200, 800)
+    window.show()
+    window.input_folder = folder
+    window.reload_images()
+    wait_for_scan(app, window.image_loader)
+    results = {}
+
+    # Paging forward like an annotator would, with the prefetcher working in between
+    durations = []
+    for _ in range(min(args.ops, args.images - 1)):
+        durations.append(timed(window.show_next_image))
+        deadline = time.perf_counter() + args.dwell / 1000
+        while time.perf_counter() < deadline:
+            app.processEvents()
+    results["show_image[next]"] = summarize(durations)
+
+    # Worst case: nothing decoded or scaled yet
+    durations = []
+    for _ in range(args.repeat):
+        window.prefetcher.clear()
+        window.display_cache.clear()
+        durations.append(timed(window.show_image))
+    results["show_image[cold]"] = summarize(durations)
+    window.close()
+    return results
+
+
+def bench_augment(args, workdir, image_paths):
+    augmentor = Augmentor()
+    images = [cv2.imread(path) for path in image_paths[:args.ops]]
+    results = {}
+    for name in Augmentor.BATCH_TRANSFORMS:
+        transform = getattr(augmentor, name)
+        durations = [timed(transform, img) for img in images]
+        results[f"augment.{name}"] = summarize(durations)
+        batch = np.stack(images)
+        durations = [timed(augmentor.transform_batch, batch, name) for _ in range(args.repeat)]
+        results[f"augment.batch.{name}"] = summarize(durations, len(batch))
+    output = os.path.join(workdir, "augment_output")
+    os.makedirs(output, exist_ok=True)
+    durations = [timed(augmentor.augment_image, path, output, True, args.seed + i)
+                 for i, path in enumerate(image_paths[:args.repeat])]
+    results["augment.augment_image"] = summarize(durations, augmentor.augment_count)
+    return results
+
+
+def run_group(group, args, workdir, folder, image_paths):
+    """Runs one benchmark group. Returns (results, peak RSS in MB of the process that ran it)."""
+    if group == "csv":
+        results = bench_csv(args, workdir)
+    elif group == "augment":
+        results = bench_augment(args, workdir, image_paths)
+    else:
+        from PyQt5.QtWidgets import QApplication
+        app = QApplication.instance() or QApplication(sys.argv[:1])
+        bench = bench_load if group == "load" else bench_show
+        results = bench(args, workdir, app, folder)
+    return results, peak_rss_mb()
+
+
+def run_isolated(group, args, workdir, folder, image_paths):
+    """
+    Runs a group in a freshly spawned process, so its peak RSS is its own and not the
+    high-water mark left behind by whichever group ran before it.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_group, group, args, workdir, folder, image_paths).result()
+
+
+# ---- reporting --------------------------------------------------------------
+
+def print_results(results):
+    print(f"{'benchmark':<48}{'p50 ms':>10}{'p95 ms':>10}{'ops/s':>12}")
+    for name, stats in results.items():
+        print(f"{name:<48}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['throughput_per_s']:>12.1f}")
+
+
+def compare(baseline, current, threshold):
+    """Prints p50 changes against a baseline run. Returns the names that regressed beyond threshold %."""
+    regressions = []
+    print(f"{'benchmark':<48}{'base p50':>10}{'new p50':>10}{'change':>9}")
+    for name, stats in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base["p50_ms"]:
+            continue
+        change = (stats["p50_ms"] - base["p50_ms"]) / base["p50_ms"] * 100
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  <-- regression"
+        print(f"{name:<48}{base['p50_ms']:>10.2f}{stats['p50_ms']:>10.2f}{change:>8.1f}%{flag}")
+    base_rss = baseline.get("peak_rss_mb")
+    if not isinstance(base_rss, dict):
+        # Baselines from before per-group measurement only have one number for the whole run
+        print(f"Peak RSS: baseline has no per-group figures ({base_rss} MB for the whole run)")
+        base_rss = {}
+    print(f"{'peak RSS':<48}{'base MB':>10}{'new MB':>10}{'change':>9}")
+    for group, mb in current["peak_rss_mb"].items():
+        base = base_rss.get(group)
+        if not base:
+            continue
+        print(f"{group:<48}{base:>10.1f}{mb:>10.1f}{(mb - base) / base * 100:>8.1f}%")
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the annotator's load, display, CSV and augmentation paths.")
+    parser.add_argument("--images", type=int, default=500, help="Synthetic images to generate (default: 500)")
+    parser.add_argument("--image-size", default="640x480", help="Synthetic image size WxH (default: 640x480)")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows in the synthetic annotations.csv")
+    parser.add_argument("--ops", type=int, default=200, help="Operations per latency benchmark (default: 200)")
+    parser.add_argument("--repeat", type=int, default=10, help="Repetitions of the heavier benchmarks (default: 10)")
+    parser.add_argument("--dwell", type=float, default=50, help="ms between page turns in show_image[next]")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic data (default: 0)")
+    parser.add_argument("--only", action="append", choices=BENCHMARKS, help="Run only these benchmark groups")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="p50 slowdown in %% reported as a regression (default: 10)")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data folder")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    groups = args.only or BENCHMARKS
+    width, _, height = args.image_size.lower().partition("x")
+    size = (int(width), int(height))
+    workdir = tempfile.mkdtemp(prefix="annotator_bench_")
+    results = {}
+    peak_rss = {}
+    try:
+        folder = os.path.join(workdir, "images")
+        print(f"Generating {args.images} synthetic {size[0]}x{size[1]} images in {workdir}")
+        image_paths = make_images(folder, args.images, size, args.seed)
+        for group in BENCHMARKS:
+            if group in groups:
+                group_results, peak_rss[group] = run_isolated(group, args, workdir, folder, image_paths)
+                results.update(group_results)
+    finally:
+        if args.keep:
+            print(f"Synthetic data kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "peak_rss_mb": peak_rss,
+        "results": results,
+    }
+    print_results(results)
+    print("Peak RSS: " + ", ".join(f"{group} {mb:.1f} MB" for group, mb in peak_rss.items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,15 +2,57 @@ import os
 import csv
 import time
 
+from annotation_store import AnnotationStore
+from tracing import span
+
 class CSVHandler:
-    def __init__(self):
+    def __init__(self, use_store=False):
+        """
+        Reads and writes annotations for an output folder.
+        With use_store=True annotations live in an indexed SQLite store (annotations.db);
+        annotations.csv is imported into it on first use and exported with export_csv().
+        """
         self.file_name = "annotations.csv"
+        self.db_file_name = "annotations.db"
+        self.augmentations_file_name = "augmentations.csv"  # Seeds needed to reproduce each variant
+        self.recipes_file_name = "augmentation_recipes.csv"  # Variants to generate on read (virtual augmentation)
+        self.use_store = use_store
+        self.stores = {}  # {output_folder: AnnotationStore}
+
+    @classmethod
+    def for_folder(cls, output_folder):
+        """
+        Handler for tools that read an output folder: uses the annotator's store when
+        annotations.db exists there, since annotations.csv may lag behind it.
+        """
+        handler = cls()
+        handler.use_store = os.path.isfile(os.path.join(output_folder, handler.db_file_name))
+        return handler
+
+    def get_store(self, output_folder):
+        """
+        Returns the AnnotationStore for output_folder, opening it on first use.
+        Rows appended to annotations.csv by other tools are picked up here; they never
+        undo relabels made in the store that have not been exported yet.
+        """
+        store = self.stores.get(output_folder)
+        if store is None:
+            store = AnnotationStore(os.path.join(output_folder, self.db_file_name))
+            self.stores[output_folder] = store
+        csv_path = os.path.join(output_folder, self.file_name)
+        if store.csv_changed(csv_path):
+            print(f"Importing annotations from {csv_path}")
+            store.import_csv(csv_path)
+        return store
 
     def save_annotation(self, image_path, label, output_folder, session_id):
         """
         Appends a new annotation to the main CSV file.
         Ensures existing annotations are preserved.
         """
+        if self.use_store:
+            self.save_annotations([(image_path, label, session_id)], output_folder)
+            return
         csv_path = os.path.join(output_folder, self.file_name)
         exists = os.path.isfile(csv_path)
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
@@ -20,11 +62,39 @@ class CSVHandler:
                 writer.writerow(["image_name", "label", "session_id", "timestamp"])
             writer.writerow([os.path.basename(image_path), label, session_id, timestamp])
 
+    def save_annotations(self, rows, output_folder, sync=False):
+        """
+        Appends many annotations [(image_path, label, session_id)] in a single write.
+        Rows may carry a fourth timestamp element; otherwise the current time is used.
+        With sync=True the data is fsynced before returning.
+        """
+        if not rows:
+            return
+        with span("csv.save_annotations", rows=len(rows)):
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            records = [(os.path.basename(row[0]), row[1], row[2], row[3] if len(row) > 3 else timestamp)
+                       for row in rows]
+            if self.use_store:
+                self.get_store(output_folder).add_many(records, sync=sync)
+                return
+            csv_path = os.path.join(output_folder, self.file_name)
+            exists = os.path.isfile(csv_path)
+            with open(csv_path, 'a', newline='') as file:
+                writer = csv.writer(file)
+                if not exists:
+                    writer.writerow(["image_name", "label", "session_id", "timestamp"])
+                writer.writerows(records)
+                if sync:
+                    file.flush()
+                    os.fsync(file.fileno())
+
     def load_existing_annotations(self, output_folder):
         """
         Loads existing annotations from the main CSV file.
         Returns a dictionary {image_name: (label, session_id, timestamp)}.
         """
+        if self.use_store and output_folder:
+            return self.get_store(output_folder).load_all()
         csv_path = os.path.join(output_folder, self.file_name)
         annotations = {}
         if os.path.isfile(csv_path):
@@ -35,3 +105,126 @@ class CSVHandler:
                     if len(row) == 4:
                         annotations[row[0]] = (row[1], row[2], row[3])
         return annotations
+
+    def get_annotation(self, output_folder, image_name):
+        """Returns (label, session_id, timestamp) for a single image, or None."""
+        if self.use_store and output_folder:
+            return self.get_store(output_folder).get(image_name)
+        return self.load_existing_annotations(output_folder).get(image_name)
+
+    def rename_annotations(self, output_folder, mapping):
+        """Rewrites annotation rows keyed by old image names {old_name: new_name}."""
+        if not mapping:
+            return
+        if self.use_store and output_folder:
+            self.get_store(output_folder).rename_many(mapping)
+            return
+        csv_path = os.path.join(output_folder, self.file_name)
+        if not os.path.isfile(csv_path):
+            return
+        with open(csv_path, 'r', newline='') as file:
+            rows = list(csv.reader(file))
+        tmp_path = csv_path + ".tmp"
+        with open(tmp_path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerows(rows[:1])
+            writer.writerows([mapping.get(row[0], row[0])] + row[1:] if row else row for row in rows[1:])
+        os.replace(tmp_path, csv_path)
+
+    def annotation_count(self, output_folder):
+        """Returns the number of annotated image names."""
+        if self.use_store and output_folder:
+            return self.get_store(output_folder).count()
+        return len(self.load_existing_annotations(output_folder))
+
+    def export_csv(self, output_folder):
+        """Rewrites annotations.csv from the store so other tools keep reading the four-column format."""
+        if self.use_store and output_folder:
+            self.get_store(output_folder).export_csv(os.path.join(output_folder, self.file_name))
+
+    def save_augmentations(self, rows, output_folder):
+        """
+        Appends augmentation records [(image_path, source_path, seed, variant, pipeline_id)]
+        in a single write.
+        """
+        if not rows:
+            return
+        csv_path = os.path.join(output_folder, self.augmentations_file_name)
+        exists = os.path.isfile(csv_path)
+        with open(csv_path, 'a', newline='') as file:
+            writer = csv.writer(file)
+            if not exists:
+                writer.writerow(["image_name", "source_image", "seed", "variant", "pipeline"])
+            writer.writerows([os.path.basename(image_path), os.path.basename(source_path), seed, variant, pipeline_id]
+                             for image_path, source_path, seed, variant, pipeline_id in rows)
+
+    def load_augmentations(self, output_folder):
+        """
+        Loads augmentation records.
+        Returns a dictionary {image_name: (source_image, seed, variant, pipeline_id)}.
+        """
+        csv_path = os.path.join(output_folder, self.augmentations_file_name)
+        augmentations = {}
+        if os.path.isfile(csv_path):
+            with open(csv_path, 'r') as file:
+                reader = csv.reader(file)
+                next(reader, None)  # Skip header
+                for row in reader:
+                    if len(row) == 5:
+                        augmentations[row[0]] = (row[1], int(row[2]), int(row[3]), row[4])
+        return augmentations
+
+    def save_augmentation_recipes(self, rows, output_folder):
+        """
+        Appends virtual augmentation recipes [(image_path, source_path, label, seed, variants, pipeline_id)]
+        in a single write: variants 0..variants of image_path can be produced from them on demand.
+        """
+        if not rows:
+            return
+        csv_path = os.path.join(output_folder, self.recipes_file_name)
+        exists = os.path.isfile(csv_path)
+        with open(csv_path, 'a', newline='') as file:
+            writer = csv.writer(file)
+            if not exists:
+                writer.writerow(["image_name", "source_path", "label", "seed", "variants", "pipeline"])
+            writer.writerows([os.path.basename(image_path), source_path, label, seed, variants, pipeline_id]
+                             for image_path, source_path, label, seed, variants, pipeline_id in rows)
+
+    def rename_augmentation_recipes(self, output_folder, folder, mapping):
+        """
+        Rewrites recipes whose source is a renamed image {old_name: new_name} in folder:
+        the absolute source path and, for images labeled under their own name, the image name.
+        """
+        csv_path = os.path.join(output_folder, self.recipes_file_name)
+        if not mapping or not os.path.isfile(csv_path):
+            return
+        folder = os.path.abspath(folder)
+        with open(csv_path, 'r', newline='') as file:
+            rows = list(csv.reader(file))
+        for row in rows[1:]:
+            if len(row) != 6 or os.path.dirname(row[1]) != folder:
+                continue
+            new_name = mapping.get(os.path.basename(row[1]))
+            if new_name is not None:
+                row[0] = mapping.get(row[0], row[0])
+                row[1] = os.path.join(folder, new_name)
+        tmp_path = csv_path + ".tmp"
+        with open(tmp_path, 'w', newline='') as file:
+            csv.writer(file).writerows(rows)
+        os.replace(tmp_path, csv_path)
+
+    def load_augmentation_recipes(self, output_folder):
+        """
+        Loads virtual augmentation recipes; the last recipe of an image wins (e.g. after relabeling).
+        Returns a dictionary {image_name: (source_path, label, seed, variants, pipeline_id)}.
+        """
+        csv_path = os.path.join(output_folder, self.recipes_file_name)
+        recipes = {}
+        if os.path.isfile(csv_path):
+            with open(csv_path, 'r', newline='') as file:
+                reader = csv.reader(file)
+                next(reader, None)  # Skip header
+                for row in reader:
+                    if len(row) == 6:
+                        recipes[row[0]] = (row[1], row[2], int(row[3]), int(row[4]), row[5])
+        return recipes
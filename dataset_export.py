@@ -0,0 +1,353 @@
+import os
+import csv
+import sys
+import json
+import time
+import zlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from csv_handler import CSVHandler
+from augment_cli import AUGMENTED_NAME
+from thumbnailer import parse_size, IMAGE_EXTENSIONS
+from roi_store import RoiStore, crop
+from video_source import parse_frame_id, frame_file_name
+from virtual_dataset import VirtualDataset
+
+MANIFEST_FILE = "dataset.json"
+INDEX_FILE = "index.csv"  # split, row, image_name, label; one line per exported image
+SPLITS = ("train", "val")
+
+
+def source_name(image_name):
+    """IMG_1_aug3.jpg -> IMG_1 (match.mp4#120 -> match_000120): every variant of a source image shares it."""
+    if AUGMENTED_NAME.search(image_name):
+        return AUGMENTED_NAME.sub("", image_name)
+    if parse_frame_id(image_name):
+        image_name = frame_file_name(image_name)  # Augmented frames are named after the written frame file
+    return os.path.splitext(image_name)[0]
+
+
+def assign_split(image_name, val_fraction, seed=0):
+    """
+    Deterministic train/val assignment by source image, so augmented variants never
+    end up on both sides of the split and re-exports keep earlier assignments.
+    """
+    bucket = zlib.crc32(f"{seed}:{source_name(image_name)}".encode("utf-8")) % 10000
+    return "val" if bucket < val_fraction * 10000 else "train"
+
+
+def index_image_dirs(image_dirs):
+    """Maps image name -> path over the given folders (earlier folders win)."""
+    paths = {}
+    for folder in reversed(image_dirs):
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    paths[entry.name] = entry.path
+    return paths
+
+
+def decode_batch(batch, size):
+    """
+    Worker entry point: decodes, crops to the image's jersey ROI (if it has one) and resizes
+    a batch of (image_name, path, roi) to size (W, H).
+    Returns (decoded image names, uint8 array of shape (n, H, W, 3) in RGB order).
+    """
+    width, height = size
+    names = []
+    out = np.empty((len(batch), height, width, 3), dtype=np.uint8)
+    for image_name, path, roi in batch:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is None:
+            print(f"Error: Could not read image {path}")
+            continue
+        img = crop(img, roi)
+        if img.shape[1] != width or img.shape[0] != height:
+            shrinking = img.shape[1] > width or img.shape[0] > height
+            img = cv2.resize(img, size, interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR)
+        cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=out[len(names)])
+        names.append(image_name)
+    return names, out[:len(names)]
+
+
+class ShardWriter:
+    def __init__(self, export_dir, split, size, shard_size, shards):
+        """
+        Appends fixed-size uint8 images to <split>_NNNNN.npy shards. Each shard is
+        preallocated at shard_size rows and filled in place through a memmap, so
+        appending never rewrites earlier data; rows past the recorded count are unused.
+        """
+        self.export_dir = export_dir
+        self.split = split
+        self.size = size
+        self.shard_size = shard_size
+        self.shards = shards  # [[file name, rows used]], shared with the manifest
+        self.current = None  # (file name, memmap) of the shard being filled
+
+    def count(self):
+        return sum(rows for _, rows in self.shards)
+
+    def append(self, images):
+        """Writes images (n, H, W, 3); returns the global row of the first one."""
+        first_row = self.count()
+        written = 0
+        while written < len(images):
+            if not self.shards or self.shards[-1][1] >= self.shard_size:
+                self.shards.append([f"{self.split}_{len(self.shards):05d}.npy", 0])
+            entry = self.shards[-1]
+            shard = self._open(entry[0])
+            take = min(self.shard_size - entry[1], len(images) - written)
+            shard[entry[1]:entry[1] + take] = images[written:written + take]
+            entry[1] += take
+            written += take
+        return first_row
+
+    def flush(self):
+        if self.current is not None:
+            self.current[1].flush()
+
+    def close(self):
+        self.flush()
+        self.current = None
+
+    def _open(self, file_name):
+        if self.current is not None and self.current[0] == file_name:
+            return self.current[1]
+        self.close()
+        path = os.path.join(self.export_dir, file_name)
+        width, height = self.size
+        if os.path.exists(path):
+            shard = np.lib.format.open_memmap(path, mode="r+")
+        else:
+            # Sparse on most filesystems: untouched rows take no disk space
+            shard = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8,
+                                              shape=(self.shard_size, height, width, 3))
+        self.current = (file_name, shard)
+        return shard
+
+
+def load_manifest(export_dir):
+    path = os.path.join(export_dir, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_index(export_dir):
+    """Returns {image_name: [split, row, label]} of everything exported so far."""
+    index = {}
+    path = os.path.join(export_dir, INDEX_FILE)
+    if os.path.isfile(path):
+        with open(path, "r", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for split, row, image_name, label in reader:
+                index[image_name] = [split, int(row), label]
+    return index
+
+
+def write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_index(export_dir, index, manifest):
+    """
+    Writes index.csv, the per-split label arrays (<split>_labels.npy, int32 class ids,
+    -1 for images no longer labeled) and the manifest. The manifest goes last: it
+    records how many shard rows are valid, so a crash before it just re-exports.
+    """
+    classes = manifest["classes"]
+    class_ids = {label: i for i, label in enumerate(classes)}
+
+    def write_index(f):
+        writer = csv.writer(f)
+        writer.writerow(["split", "row", "image_name", "label"])
+        writer.writerows([split, row, name, label] for name, (split, row, label) in
+                         sorted(index.items(), key=lambda item: (item[1][0], item[1][1])))
+
+    write_atomic(os.path.join(export_dir, INDEX_FILE), write_index)
+    for split in SPLITS:
+        labels = np.full(sum(rows for _, rows in manifest["splits"][split]), -1, dtype=np.int32)
+        for entry in index.values():
+            if entry[0] == split and entry[2] in class_ids:
+                labels[entry[1]] = class_ids[entry[2]]
+        np.save(os.path.join(export_dir, f"{split}_labels.npy"), labels)
+    write_atomic(os.path.join(export_dir, MANIFEST_FILE), lambda f: json.dump(manifest, f, indent=2))
+
+
+def open_split(export_dir, split="train"):
+    """
+    Opens an export for training without reading the pixels: returns (list of memmapped
+    shards, each trimmed to its valid rows, int32 label array, class names).
+    Global row r lives in shard r // shard_size at r % shard_size.
+    """
+    manifest = load_manifest(export_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No {MANIFEST_FILE} in {export_dir}")
+    shards = [np.load(os.path.join(export_dir, name), mmap_mode="r")[:rows]
+              for name, rows in manifest["splits"][split]]
+    labels = np.load(os.path.join(export_dir, f"{split}_labels.npy"))
+    return shards, labels, manifest["classes"]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Export labeled images as memory-mappable uint8 .npy shards with a label index.")
+    parser.add_argument("--annotations-dir", required=True, help="Folder containing annotations.csv")
+    parser.add_argument("--image-dir", action="append",
+                        help="Folder to look images up in; repeatable (default: the annotations folder)")
+    parser.add_argument("--export-dir", required=True, help="Folder for the shards, labels and index")
+    parser.add_argument("--size", help="Resize every image to WxH (default: size of the first image; "
+                                       "fixed once the export exists)")
+    parser.add_argument("--shard-size", type=int, default=4096, help="Images per shard (default: 4096)")
+    parser.add_argument("--val-fraction", type=float, default=0.1, help="Share of source images in val (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the train/val assignment (default: 0)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decode processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Images per decode batch (default: 256)")
+    parser.add_argument("--include-unsuitable", action="store_true", help="Also export images labeled unsuitable")
+    parser.add_argument("--no-recipes", action="store_true",
+                        help="Skip augmented variants recorded in augmentation_recipes.csv (produced on read)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    annotations = CSVHandler.for_folder(args.annotations_dir).load_existing_annotations(args.annotations_dir)
+    image_paths = index_image_dirs(args.image_dir or [args.annotations_dir])
+    rois = RoiStore(args.annotations_dir).rois
+    frames_dir = os.path.join(args.annotations_dir, "frames")  # Labeled video frames ("video.mp4#frame" rows)
+    os.makedirs(args.export_dir, exist_ok=True)
+
+    manifest = load_manifest(args.export_dir)
+    if manifest is None:
+        manifest = {"version": 1, "size": None, "shard_size": args.shard_size, "channels": "RGB",
+                    "val_fraction": args.val_fraction, "seed": args.seed, "classes": [],
+                    "splits": {split: [] for split in SPLITS}}
+    size = parse_size(args.size) if args.size else None
+    if manifest["size"] and size and tuple(manifest["size"]) != size:
+        print(f"Error: {args.export_dir} holds {manifest['size'][0]}x{manifest['size'][1]} images; "
+              f"export to a new folder to change the size.")
+        return 1
+    index = load_index(args.export_dir)
+
+    # Label changes of exported images only touch the index; new images get decoded
+    todo = []
+    missing = 0
+    for image_name, values in sorted(annotations.items()):
+        label = values[0]
+        suitable = args.include_unsuitable or label.lower() != "unsuitable"
+        if image_name in index:
+            index[image_name][2] = label if suitable else ""
+        elif suitable:
+            path = image_paths.get(image_name)
+            if path is None and parse_frame_id(image_name):
+                path = os.path.join(frames_dir, frame_file_name(image_name))
+                path = path if os.path.isfile(path) else None
+            if path is None:
+                missing += 1
+            else:
+                todo.append((image_name, path, label))
+    if missing:
+        print(f"Warning: {missing} annotated image(s) not found in {', '.join(args.image_dir or [args.annotations_dir])}")
+
+    # Variants of augmented mode without written files: produced from their recipes, named as the files would be
+    dataset = None
+    virtual = []  # [(image_name, sample index, label)]
+    recipes_path = os.path.join(args.annotations_dir, CSVHandler().recipes_file_name)
+    if os.path.isfile(recipes_path):
+        if args.no_recipes:
+            print(f"Note: skipping the augmented variants recorded in {recipes_path} (--no-recipes)")
+        else:
+            dataset = VirtualDataset(args.annotations_dir, rgb=True, skip_unsuitable=False)
+            for i, (record, variant) in enumerate(dataset.samples):
+                image_name = dataset.variant_name(i) + ".jpg"
+                if variant == 0 or image_name in annotations:
+                    continue  # The source (and any variant written as a file) is exported from its own row
+                label = dataset.records[record][2]
+                suitable = args.include_unsuitable or label.lower() != "unsuitable"
+                if image_name in index:
+                    index[image_name][2] = label if suitable else ""
+                elif suitable:
+                    virtual.append((image_name, i, label))
+
+    if (todo or virtual) and not manifest["size"]:
+        if size is None and todo:
+            first = cv2.imread(todo[0][1])
+            if first is None:
+                print(f"Error: Could not read image {todo[0][1]}")
+                return 1
+            first = crop(first, rois.get(todo[0][0]))
+            size = (first.shape[1], first.shape[0])
+        elif size is None:
+            first = dataset.produce(*dataset.samples[virtual[0][1]])
+            size = (first.shape[1], first.shape[0])
+        manifest["size"] = list(size)
+    size = tuple(manifest["size"]) if manifest["size"] else size
+    labels = {image_name: label for image_name, _, label in todo}
+    labels.update((image_name, label) for image_name, _, label in virtual)
+    for label in sorted({entry[2] for entry in index.values() if entry[2]} | set(labels.values())):
+        if label not in manifest["classes"]:
+            manifest["classes"].append(label)  # Appended, so earlier class ids stay valid
+
+    writers = {split: ShardWriter(args.export_dir, split, size, manifest["shard_size"], manifest["splits"][split])
+               for split in SPLITS}
+    new_count = len(todo) + len(virtual)
+    print(f"Exporting {new_count} new images ({len(virtual)} produced from recipes) at {size[0]}x{size[1]} "
+          f"({len(index)} already exported)" if new_count else "No new images to export.")
+    start = time.perf_counter()
+
+    def store(names, images):
+        splits = [assign_split(name, manifest["val_fraction"], manifest["seed"]) for name in names]
+        for split in SPLITS:
+            rows = [i for i, name_split in enumerate(splits) if name_split == split]
+            if not rows:
+                continue
+            first_row = writers[split].append(images[rows])
+            for offset, i in enumerate(rows):
+                index[names[i]] = [split, first_row + offset, labels[names[i]]]
+        return len(names)
+
+    batches = [[(image_name, path, rois.get(image_name)) for image_name, path, _ in todo[i:i + args.chunk_size]]
+               for i in range(0, len(todo), args.chunk_size)]
+    exported = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        for names, images in executor.map(decode_batch, batches, [size] * len(batches)):
+            exported += store(names, images)
+    if virtual:
+        # Samples of one source are adjacent, so the dataset's source cache decodes each source once
+        dataset.size = size
+        for i in range(0, len(virtual), args.chunk_size):
+            names = []
+            images = []
+            for image_name, sample, _ in virtual[i:i + args.chunk_size]:
+                try:
+                    images.append(dataset.produce(*dataset.samples[sample]))
+                except FileNotFoundError as e:
+                    print(f"Error: {e}")
+                    continue
+                names.append(image_name)
+            if names:
+                exported += store(names, np.stack(images))
+    for writer in writers.values():
+        writer.close()
+    save_index(args.export_dir, index, manifest)
+
+    elapsed = time.perf_counter() - start
+    counts = ", ".join(f"{split}: {sum(rows for _, rows in manifest['splits'][split])}" for split in SPLITS)
+    print(f"Done: {exported} images in {elapsed:.1f}s ({exported / elapsed if elapsed else 0:.1f} images/sec). "
+          f"Totals - {counts}, {len(manifest['classes'])} classes.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
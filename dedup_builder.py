@@ -0,0 +1,21 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class DedupBuilder(QThread):
+    """
+    Updates a DedupIndex for a freshly loaded FolderManifest on a background thread.
+    The hashing itself is spread over a process pool by DedupIndex.update.
+    """
+    index_ready = pyqtSignal(object)  # The DedupIndex, once it matches the manifest
+
+    def __init__(self, dedup_index, manifest, parent=None):
+        super().__init__(parent)
+        self.dedup_index = dedup_index
+        self.manifest = manifest
+
+    def run(self):
+        hashed = self.dedup_index.update(self.manifest, should_stop=self.isInterruptionRequested)
+        if hashed is None or self.isInterruptionRequested():
+            return
+        print(f"Duplicate index ready: {len(self.dedup_index.tree)} images ({hashed} newly hashed)")
+        self.index_ready.emit(self.dedup_index)
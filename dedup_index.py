@@ -0,0 +1,190 @@
+import os
+import json
+import hashlib
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 8  # 8x8 difference bits -> 64-bit hash
+DEFAULT_THRESHOLD = 4  # Max Hamming distance between near-duplicate frames
+
+
+def load_hash_input(image_path, hash_size=HASH_SIZE):
+    """Decodes an image as a (hash_size, hash_size + 1) grayscale array, or None if it can't be read."""
+    # Decode at 1/4 scale straight from the JPEG: the hash only needs a few pixels
+    img = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if img is None:
+        return None
+    return cv2.resize(img, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+
+
+def dhash_batch(grays):
+    """
+    Computes 64-bit difference hashes for a stack of (N, 8, 9) grayscale arrays at once.
+    Bit k is set when a pixel is brighter than its right-hand neighbour.
+    """
+    bits = grays[:, :, 1:] > grays[:, :, :-1]
+    packed = np.packbits(bits.reshape(len(grays), -1), axis=1)
+    return packed.view(">u8").ravel().astype(np.uint64)
+
+
+def hash_files(image_paths, hash_size=HASH_SIZE):
+    """Worker entry point: returns a list with the dHash of each image, or None where decoding failed."""
+    grays = [load_hash_input(path, hash_size) for path in image_paths]
+    ok = [i for i, gray in enumerate(grays) if gray is not None]
+    hashes = [None] * len(image_paths)
+    if ok:
+        for i, value in zip(ok, dhash_batch(np.stack([grays[i] for i in ok])).tolist()):
+            hashes[i] = value
+    return hashes
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    def __init__(self):
+        """
+        Burkhard-Keller tree over 64-bit hashes with Hamming distance.
+        A radius query only visits children whose edge distance is within the radius
+        of the query's distance to the node, so lookups stay far below a linear scan.
+        Identical hashes share one node.
+        """
+        self.root = None  # Node: [hash, [items], {distance: child node}]
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, threshold):
+        """Returns [(distance, item)] for every item whose hash is within threshold of value."""
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= threshold:
+                found.extend((d, item) for item in node[1])
+            for edge, child in node[2].items():
+                if d - threshold <= edge <= d + threshold:
+                    stack.append(child)
+        return found
+
+    def __len__(self):
+        return self.size
+
+
+class DedupIndex:
+    def __init__(self, folder, output_folder, threshold=DEFAULT_THRESHOLD):
+        """
+        Perceptual-hash index of an input folder, aligned with its FolderManifest table.
+        Hashes are persisted in the output folder keyed by relative path, mtime and size,
+        so reloading a folder only hashes new or modified images.
+        """
+        self.folder = os.path.abspath(folder)
+        self.threshold = threshold
+        self.index_path = None
+        if output_folder:
+            folder_key = hashlib.sha1(self.folder.encode("utf-8")).hexdigest()[:12]
+            index_dir = os.path.join(output_folder, ".manifests")
+            os.makedirs(index_dir, exist_ok=True)
+            self.index_path = os.path.join(index_dir, f"dedup_index_{folder_key}.json")
+        self.hashes = array('Q')  # Hash of manifest entry i
+        self.valid = bytearray()  # 1 if entry i could be hashed
+        self.tree = BKTree()  # Items are manifest indices
+
+    def update(self, manifest, max_workers=None, chunk_size=256, should_stop=None):
+        """
+        Brings the index in line with manifest, hashing stale entries on a process pool.
+        Returns the number of images hashed, or None if should_stop() aborted the update.
+        """
+        table = manifest.table
+        cached = self._load()
+        hashes = array('Q', bytes(8 * len(table)))
+        valid = bytearray(len(table))
+        stale = []
+        for i in range(len(table)):
+            entry = cached.get(table.relative_path(i))
+            if entry is not None and entry[1] == manifest.mtimes[i] and entry[2] == manifest.sizes[i]:
+                if entry[0] is not None:
+                    hashes[i] = entry[0]
+                    valid[i] = 1
+            else:
+                stale.append(i)
+        del cached
+        if stale:
+            chunks = [stale[j:j + chunk_size] for j in range(0, len(stale), chunk_size)]
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                results = executor.map(hash_files, ([table[i] for i in chunk] for chunk in chunks))
+                for chunk, chunk_hashes in zip(chunks, results):
+                    if should_stop and should_stop():
+                        executor.shutdown(cancel_futures=True)
+                        return None
+                    for i, value in zip(chunk, chunk_hashes):
+                        if value is not None:
+                            hashes[i] = value
+                            valid[i] = 1
+        self.hashes = hashes
+        self.valid = valid
+        self.tree = BKTree()
+        for i in range(len(table)):
+            if valid[i]:
+                self.tree.add(hashes[i], i)
+        self._save(manifest)
+        return len(stale)
+
+    def duplicates(self, i, threshold=None):
+        """Returns the manifest indices of entry i's near-duplicates (excluding i), nearest first."""
+        if i >= len(self.valid) or not self.valid[i]:
+            return []
+        threshold = self.threshold if threshold is None else threshold
+        found = sorted(self.tree.search(self.hashes[i], threshold))
+        return [j for _, j in found if j != i]
+
+    def _load(self):
+        """Returns {relative path: (hash or None, mtime_ns, size)} from the persisted index."""
+        if not self.index_path or not os.path.isfile(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("folder") != self.folder or data.get("hash_size") != HASH_SIZE:
+            return {}
+        return {name: (None if h < 0 else h, mtime, size)
+                for name, h, mtime, size in zip(data["names"], data["hashes"], data["mtimes"], data["sizes"])}
+
+    def _save(self, manifest):
+        if not self.index_path:
+            return
+        table = manifest.table
+        data = {"folder": self.folder, "hash_size": HASH_SIZE,
+                "names": [table.relative_path(i) for i in range(len(table))],
+                "hashes": [self.hashes[i] if self.valid[i] else -1 for i in range(len(table))],
+                "mtimes": manifest.mtimes.tolist(), "sizes": manifest.sizes.tolist()}
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPixmap
+
+from tracing import span
+
+
+class DisplayCache:
+    def __init__(self, prefetcher, max_renditions=12):
+        """
+        Keeps a small LRU set of scaled pixmaps keyed by (image path, target size).
+        Full-resolution decoded images come from the ImagePrefetcher, so a resize
+        never goes back to disk.
+        """
+        self.prefetcher = prefetcher
+        self.max_renditions = max_renditions
+        self.renditions = OrderedDict()  # {(image_path, width, height): QPixmap}
+
+    def get(self, image_path, size, smooth=True, allow_preview=False):
+        """
+        Returns a QPixmap of image_path scaled to fit size, or None if it cannot be decoded.
+        Fast (nearest-neighbour) renditions are meant for in-progress resizes and are not cached.
+        With allow_preview, an image that is not decoded yet is shown from its thumbnail
+        (uncached) while the full decode runs in the background.
+        """
+        key = (image_path, size.width(), size.height())
+        if smooth:
+            pixmap = self.renditions.get(key)
+            if pixmap is not None:
+                self.renditions.move_to_end(key)
+                return pixmap
+        if allow_preview and self.prefetcher.peek(image_path) is None:
+            preview = self.prefetcher.preview(image_path)
+            if preview is not None:
+                self.prefetcher.request(image_path)
+                return QPixmap.fromImage(preview.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        image = self.prefetcher.get(image_path)
+        if image.isNull():
+            return None
+        mode = Qt.SmoothTransformation if smooth else Qt.FastTransformation
+        # Scale the QImage before converting so only the small rendition becomes a pixmap
+        with span("image.scale"):
+            pixmap = QPixmap.fromImage(image.scaled(size, Qt.KeepAspectRatio, mode))
+        if smooth:
+            self.renditions[key] = pixmap
+            while len(self.renditions) > self.max_renditions:
+                self.renditions.popitem(last=False)
+        return pixmap
+
+    def clear(self):
+        """Drops all cached renditions."""
+        self.renditions.clear()
@@ -0,0 +1,178 @@
+import os
+import json
+import base64
+import hashlib
+from array import array
+
+from path_table import PathTable
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+class FolderManifest:
+    def __init__(self, folder, output_folder, recursive=True):
+        """
+        Persistent index of an input folder, stored in the output folder:
+        sorted image paths (including sub-folders, e.g. one per match, when
+        recursive) with their mtime/size, plus a labeled bitmap and a
+        first-unlabeled pointer that are updated as annotations are saved.
+        Without an output folder the manifest works in memory only.
+        """
+        self.folder = os.path.abspath(folder)
+        self.recursive = recursive
+        # Never descend into the output folder when it lives inside the input folder
+        self.excluded_dir = os.path.abspath(output_folder) if output_folder else None
+        self.manifest_path = None
+        self.state_path = None
+        if output_folder:
+            folder_key = hashlib.sha1(self.folder.encode("utf-8")).hexdigest()[:12]
+            # A sub-folder keeps manifest writes from bumping the mtime of an output folder
+            # that doubles as the input folder
+            manifest_dir = os.path.join(output_folder, ".manifests")
+            os.makedirs(manifest_dir, exist_ok=True)
+            self.manifest_path = os.path.join(manifest_dir, f"folder_manifest_{folder_key}.json")
+            self.state_path = os.path.join(manifest_dir, f"folder_manifest_{folder_key}.state.json")
+        self.dir_mtimes = {}  # {relative dir: mtime_ns} for every scanned directory
+        self.table = PathTable(self.folder)
+        self.mtimes = array('q')
+        self.sizes = array('q')
+        self.labeled = bytearray()
+        self.labeled_count = 0  # Kept up to date by mark_labeled(), so progress never counts the bitmap
+        self.first_unlabeled = 0
+        self.annotation_count = -1  # Store size the labeled bitmap was last synced with
+
+    def load(self):
+        """
+        Loads the manifest from disk. Returns False if there is none or any scanned
+        directory changed since it was written (its mtime differs), i.e. a rescan is needed.
+        """
+        if not self.manifest_path or not os.path.isfile(self.manifest_path):
+            return False
+        try:
+            with open(self.manifest_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("folder") != self.folder or data.get("recursive") != self.recursive:
+            return False
+        for rel_dir, mtime_ns in data["dir_mtimes"].items():
+            try:
+                if os.stat(os.path.join(self.folder, rel_dir)).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        self.dir_mtimes = data["dir_mtimes"]
+        self.table = PathTable.from_relative_paths(self.folder, data["names"])
+        self.mtimes = array('q', data["mtimes"])
+        self.sizes = array('q', data["sizes"])
+        self._load_state()
+        return True
+
+    def scan(self, on_found=None, should_stop=None):
+        """
+        Walks the folder with os.scandir, then sorts and saves the table.
+        on_found(full_path) is called for the first image found so it can be shown right away;
+        should_stop() is polled to abort a scan that is no longer needed.
+        """
+        table = PathTable(self.folder)
+        mtimes = array('q')
+        sizes = array('q')
+        dir_mtimes = {}
+        pending_dirs = [""]
+        while pending_dirs:
+            rel_dir = pending_dirs.pop()
+            path = os.path.join(self.folder, rel_dir) if rel_dir else self.folder
+            dir_mtimes[rel_dir] = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                for entry in it:
+                    if should_stop and should_stop():
+                        return False
+                    if entry.is_dir():
+                        if (self.recursive and not entry.name.startswith(".")
+                                and os.path.abspath(entry.path) != self.excluded_dir):
+                            pending_dirs.append(f"{rel_dir}/{entry.name}" if rel_dir else entry.name)
+                    elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        stat = entry.stat()
+                        table.append(rel_dir, entry.name)
+                        mtimes.append(stat.st_mtime_ns)
+                        sizes.append(stat.st_size)
+                        if on_found and len(table) == 1:
+                            on_found(entry.path)
+        order = table.sorted_order()
+        self.table = table.reordered(order)
+        self.mtimes = array('q', (mtimes[i] for i in order))
+        self.sizes = array('q', (sizes[i] for i in order))
+        self.dir_mtimes = dir_mtimes
+        self.labeled = bytearray(len(self.table))
+        self.labeled_count = 0
+        self.first_unlabeled = 0
+        self.annotation_count = -1  # Force the labeled bitmap to be rebuilt
+        self.save()
+        return True
+
+    def relabel(self, annotated_names, annotation_count):
+        """Rebuilds the labeled bitmap from a set of annotated image names."""
+        table = self.table
+        self.labeled = bytearray(1 if table.name(i) in annotated_names else 0 for i in range(len(table)))
+        self.labeled_count = self.labeled.count(1)
+        self.annotation_count = annotation_count
+        self.first_unlabeled = self.next_unlabeled(0)
+        self.save_state()
+
+    def mark_labeled(self, i):
+        """Marks entry i as labeled and advances the first-unlabeled pointer past it."""
+        if not self.labeled[i]:
+            self.labeled_count += 1
+        self.labeled[i] = 1
+        if i == self.first_unlabeled:
+            self.first_unlabeled = self.next_unlabeled(i)
+
+    def next_unlabeled(self, start):
+        """Returns the index of the first unlabeled image at or after start (len(table) if none)."""
+        i = self.labeled.find(0, start)
+        return len(self.table) if i < 0 else i
+
+    def save(self):
+        """Writes the path table atomically (only needed after a rescan)."""
+        if not self.manifest_path:
+            return
+        data = {"folder": self.folder, "recursive": self.recursive, "dir_mtimes": self.dir_mtimes,
+                "names": [self.table.relative_path(i) for i in range(len(self.table))],
+                "mtimes": self.mtimes.tolist(), "sizes": self.sizes.tolist()}
+        self._write_json(self.manifest_path, data)
+
+    def save_state(self, annotation_count=None):
+        """Writes the labeled bitmap and pointer, recording the store size they match."""
+        if annotation_count is not None:
+            self.annotation_count = annotation_count
+        if not self.state_path:
+            return
+        data = {"annotation_count": self.annotation_count, "first_unlabeled": self.first_unlabeled,
+                "labeled": base64.b64encode(bytes(self.labeled)).decode("ascii")}
+        self._write_json(self.state_path, data)
+
+    def _load_state(self):
+        self.annotation_count = -1
+        self.labeled = bytearray(len(self.table))
+        self.labeled_count = 0
+        self.first_unlabeled = 0
+        if not os.path.isfile(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r") as f:
+                data = json.load(f)
+            labeled = bytearray(base64.b64decode(data["labeled"]))
+        except (OSError, ValueError, KeyError):
+            return
+        if len(labeled) == len(self.table):
+            self.labeled = labeled
+            self.labeled_count = labeled.count(1)
+            self.first_unlabeled = data.get("first_unlabeled", 0)
+            self.annotation_count = data.get("annotation_count", -1)
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
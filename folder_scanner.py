@@ -0,0 +1,26 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class FolderScanner(QThread):
+    """
+    Loads or rebuilds a FolderManifest on a background thread.
+    first_found is emitted as soon as one image path is known, so the GUI can show
+    it while the rest of the folder is still being listed and sorted.
+    """
+    first_found = pyqtSignal(str)
+    scan_finished = pyqtSignal(object)  # The FolderManifest, once its table is complete and sorted
+
+    def __init__(self, manifest, parent=None):
+        super().__init__(parent)
+        self.manifest = manifest
+
+    def run(self):
+        if self.manifest.load():
+            if len(self.manifest.table):
+                self.first_found.emit(self.manifest.table[self.manifest.first_unlabeled
+                                                          if self.manifest.first_unlabeled < len(self.manifest.table)
+                                                          else 0])
+        elif not self.manifest.scan(self.first_found.emit, self.isInterruptionRequested):
+            return
+        if not self.isInterruptionRequested():
+            self.scan_finished.emit(self.manifest)
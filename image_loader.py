@@ -1,35 +1,315 @@
 import os
+from array import array
+from functools import partial
 from csv_handler import CSVHandler
+from folder_manifest import FolderManifest
+from folder_scanner import FolderScanner
+from dedup_index import DedupIndex
+from dedup_builder import DedupBuilder
+from video_source import VideoManifest, VideoFrameReader, is_video_file, parse_frame_id, frame_file_name
 from PyQt5.QtWidgets import QMessageBox
 
+DUPLICATE_WINDOW = 50  # Near-duplicates are looked for this many entries either side of the current image
+
+
 class ImageLoader:
-    def __init__(self):
+    def __init__(self, csv_handler=None, recursive=False, dedup=True):
+        """
+        recursive also lists sub-folders. Annotations are keyed by file name, so it is only
+        safe when names are unique across them; a warning lists the clashes after the scan.
+        """
         self.image_list = []
         self.index = 0
-        self.annotations = {}
+        self.annotations = {}  # Images labeled while the folder scan is still running
+        self.csv_handler = csv_handler if csv_handler is not None else CSVHandler()
+        self.recursive = recursive
+        self.manifest = None  # FolderManifest of the loaded folder, once its scan has finished
+        self.output_folder = ""
+        self.scanner = None
+        self.dedup = dedup
+        self.dedup_builder = None
+        self.dedup_index = None  # DedupIndex of the loaded folder, once hashing has finished
+        self.skipped = set()  # Indices that next_image() steps over (duplicates of labeled images)
+        self.work_range = None  # (start, end) of the leased chunk navigation is limited to, in shared work mode
+        self.order = None  # Custom navigation order (manifest indices), e.g. least confident prediction first
+        self.order_pos = None  # Position of each index in self.order
+        self.video_reader = None  # VideoFrameReader when the source is a video file instead of a folder
+        self.pending_frames = {}  # {frame path: [on_written callbacks]} for frames the reader is writing
 
-    def load_images(self, folder, output_folder, parent_widget):
+    def load_images(self, folder, output_folder, parent_widget, on_update=None, stride=1):
         """
         Loads images from a directory and resumes from the first unlabeled image.
         If previous annotations exist, notifies the user.
+        Listing happens on a background thread: the first image found is shown right away
+        and the full sorted list replaces it when the scan finishes. The folder is only
+        rescanned when a directory mtime changed since the last load.
+        folder may also be a video file: every stride-th frame becomes an entry
+        ("<video>#<frame>"), decoded on demand by a VideoFrameReader.
+        on_update() is called whenever the image list or index changes.
+        """
+        self.cancel_scan()
+        self.stop_video()
+        self.output_folder = output_folder
+        self.manifest = None
+        self.image_list = []
+        self.index = 0
+        self.annotations = {}
+        self.dedup_index = None
+        self.skipped = set()
+        self.work_range = None
+        self.order = None
+        self.order_pos = None
+        self.parent_widget = parent_widget
+        self.on_update = on_update
+        if is_video_file(folder):
+            manifest = VideoManifest(folder, output_folder, stride)
+            reader = VideoFrameReader(manifest.folder, manifest.stride)
+            reader.frame_written.connect(
+                lambda frame, path, ok, reader=reader: self._on_frame_written(reader, path, ok))
+            self.video_reader = reader
+            reader.start()
+        else:
+            manifest = FolderManifest(folder, output_folder, self.recursive)
+        scanner = FolderScanner(manifest)
+        # Bind the scanner so late signals from a cancelled scan can be recognised and dropped
+        scanner.first_found.connect(partial(self._on_first_found, scanner))
+        scanner.scan_finished.connect(partial(self._on_scan_finished, scanner))
+        self.scanner = scanner
+        scanner.start()
+
+    def cancel_scan(self):
+        """Stops a folder scan (and duplicate hashing) that is still running."""
+        for thread in (self.scanner, self.dedup_builder):
+            if thread is not None and thread.isRunning():
+                thread.requestInterruption()
+                thread.wait()
+        self.scanner = None
+        self.dedup_builder = None
+
+    def clear(self):
+        """Forgets the loaded folder, e.g. while its files are being renamed."""
+        self.cancel_scan()
+        self.stop_video()
+        self.manifest = None
+        self.image_list = []
+        self.index = 0
+        self.annotations = {}
+        self.dedup_index = None
+        self.skipped = set()
+        self.work_range = None
+        self.order = None
+        self.order_pos = None
+
+    def stop_video(self):
+        """Stops the frame reader of a loaded video source."""
+        if self.video_reader is not None:
+            self.video_reader.stop()
+            self.video_reader = None
+        if self.pending_frames:
+            print(f"Warning: {len(self.pending_frames)} labeled frame(s) were not written before the video closed")
+            self.pending_frames = {}
+
+    def is_video(self):
+        return self.video_reader is not None
+
+    def frame_source(self, image_path, output_folder, on_written=None):
+        """
+        Returns a file holding the pixels of image_path. Video frames are only written out
+        (to <output>/frames/<video>_<frame>.jpg) once they are labeled; image files are returned as is.
+        A frame not written yet is handed to the reader thread and None is returned; once it
+        is on disk on_written(frame_path) is called on the GUI thread, so nothing waits for a decode.
         """
-        self.image_list = sorted([os.path.join(folder, img)
-                                  for img in os.listdir(folder)
-                                  if img.lower().endswith(('.png', '.jpg', '.jpeg'))])
-        csv_handler = CSVHandler()
-        self.annotations = csv_handler.load_existing_annotations(output_folder)
+        parsed = parse_frame_id(image_path)
+        if parsed is None or self.video_reader is None:
+            return image_path
+        frames_folder = os.path.join(output_folder, "frames")
+        os.makedirs(frames_folder, exist_ok=True)
+        frame_path = os.path.join(frames_folder, frame_file_name(image_path))
+        if frame_path not in self.pending_frames and os.path.isfile(frame_path):
+            return frame_path
+        callbacks = self.pending_frames.get(frame_path)
+        if callbacks is None:
+            callbacks = self.pending_frames[frame_path] = []
+            self.video_reader.write_frame(parsed[1], frame_path)
+        if on_written is not None:
+            callbacks.append(on_written)
+        return None
+
+    def _on_frame_written(self, reader, frame_path, ok):
+        if reader is not self.video_reader:
+            return
+        callbacks = self.pending_frames.pop(frame_path, [])
+        if not ok:
+            print(f"Error: Could not write frame {frame_path}")
+            return
+        for on_written in callbacks:
+            on_written(frame_path)
+
+    def is_scanning(self):
+        return self.scanner is not None and self.scanner.isRunning()
+
+    def _on_first_found(self, scanner, image_path):
+        if scanner is self.scanner and not self.image_list:
+            self.image_list = [image_path]
+            self.index = 0
+            if self.on_update:
+                self.on_update()
+
+    def _on_scan_finished(self, scanner, manifest):
+        if scanner is not self.scanner:
+            return
+        annotation_count = self.csv_handler.annotation_count(self.output_folder)
+        if manifest.annotation_count != annotation_count or self.annotations:
+            # Annotations changed outside this loader; resync the labeled bitmap once
+            annotated = set(self.csv_handler.load_existing_annotations(self.output_folder))
+            manifest.relabel(annotated | set(self.annotations), annotation_count)
+        self.manifest = manifest
+        self.image_list = manifest.table
+        self.annotations = {}
         self.index = self.find_resume_index()
+        if self.on_update:
+            self.on_update()
+        if self.recursive and self.video_reader is None:
+            self._warn_name_clashes(manifest.table)
+        if self.dedup and len(manifest.table) and self.video_reader is None:
+            builder = DedupBuilder(DedupIndex(manifest.folder, self.output_folder), manifest)
+            builder.index_ready.connect(partial(self._on_dedup_ready, builder))
+            self.dedup_builder = builder
+            builder.start()
         if self.index > 0:
-            QMessageBox.information(parent_widget, "Previous Session Found",
+            QMessageBox.information(self.parent_widget, "Previous Session Found",
                                     f"Resuming from image {self.index + 1} of {len(self.image_list)}.")
 
+    def _warn_name_clashes(self, table):
+        """Images with the same file name in different sub-folders would share one annotation."""
+        seen = set()
+        clashes = set()
+        for i in range(len(table)):
+            name = table.name(i)
+            if name in seen:
+                clashes.add(name)
+            seen.add(name)
+        if clashes:
+            examples = ", ".join(sorted(clashes)[:5])
+            QMessageBox.warning(self.parent_widget, "Duplicate File Names",
+                                f"{len(clashes)} file name(s) occur in more than one sub-folder (e.g. {examples}). "
+                                f"Annotations are stored by file name, so those images share a label; "
+                                f"rename them or load each sub-folder separately.")
+
+    def _on_dedup_ready(self, builder, dedup_index):
+        if builder is self.dedup_builder:
+            self.dedup_index = dedup_index
+
+    def unlabeled_duplicates(self, window=DUPLICATE_WINDOW):
+        """
+        Returns the indices of unlabeled near-duplicates of the current image within window
+        entries of it and inside the leased work range, if any (empty until the duplicate
+        index has been built). Similar frames of one shot sit next to each other; matches
+        further away are more likely look-alike crops or plain backgrounds.
+        """
+        if self.dedup_index is None or self.manifest is None:
+            return []
+        start, end = self._bounds()
+        start, end = max(start, self.index - window), min(end, self.index + window + 1)
+        return [i for i in self.dedup_index.duplicates(self.index)
+                if start <= i < end and not self.manifest.labeled[i]]
+
+    def is_labeled(self, i):
+        """True if entry i is known to be labeled."""
+        if self.manifest is not None:
+            return bool(self.manifest.labeled[i])
+        return os.path.basename(self.image_list[i]) in self.annotations
+
+    def mark_labeled_indices(self, indices):
+        """Marks entries as labeled after their rows were written (e.g. a batch label from the grid)."""
+        for i in indices:
+            if self.manifest is not None:
+                self.manifest.mark_labeled(i)
+            else:
+                self.annotations[os.path.basename(self.image_list[i])] = None
+
+    def remaining_count(self):
+        """Unlabeled images in the loaded folder, or None until its scan has finished."""
+        if self.manifest is None:
+            return None
+        return len(self.manifest.table) - self.manifest.labeled_count
+
+    def skip_images(self, indices):
+        """Makes next_image() step over the given entries."""
+        self.skipped.update(indices)
+
+    def label_duplicates(self, indices):
+        """Marks duplicate entries as labeled (after their rows were written) and skips them."""
+        self.mark_labeled_indices(indices)
+        self.skip_images(indices)
+
+    def set_work_range(self, start, end):
+        """
+        Limits navigation to entries [start, end) (a leased chunk) and moves to its first
+        unlabeled image. Labels saved by other annotators in the meantime are picked up first.
+        """
+        self.work_range = (start, end)
+        table = self.manifest.table
+        for i in range(start, end):
+            if not self.manifest.labeled[i] and self.csv_handler.get_annotation(self.output_folder, table.name(i)):
+                self.manifest.mark_labeled(i)
+        i = self.manifest.next_unlabeled(start)
+        self.index = i if i < end else start
+
+    def set_order(self, order):
+        """
+        Navigates the image list in the given order of indices (None restores folder order)
+        and moves to the first unlabeled image in it. Ignored while a work range is leased.
+        """
+        if order is None:
+            self.order = None
+            self.order_pos = None
+            return
+        self.order = array('I', order)
+        self.order_pos = array('I', bytes(4 * len(self.image_list)))
+        for pos, i in enumerate(self.order):
+            self.order_pos[i] = pos
+        first = next((i for i in self.order if not self.is_labeled(i)), None)
+        if first is not None:
+            self.index = first
+
+    def _ordered(self):
+        return self.order is not None and self.work_range is None
+
+    def clear_work_range(self):
+        self.work_range = None
+
+    def work_range_done(self):
+        """True if every image of the current work range is labeled."""
+        if self.work_range is None or self.manifest is None:
+            return False
+        start, end = self.work_range
+        return self.manifest.next_unlabeled(start) >= end
+
+    def _bounds(self):
+        return self.work_range or (0, len(self.image_list))
+
     def find_resume_index(self):
         """Finds the first unannotated image index."""
+        if self.manifest is not None:
+            return self.manifest.first_unlabeled
         for i, image_path in enumerate(self.image_list):
             if os.path.basename(image_path) not in self.annotations:
                 return i
         return len(self.image_list)
 
+    def mark_labeled(self, image_path):
+        """Records that image_path (the current image) was just annotated."""
+        if self.manifest is not None and self.get_current_image() == image_path:
+            self.manifest.mark_labeled(self.index)
+        elif self.manifest is None:
+            self.annotations[os.path.basename(image_path)] = None
+
+    def save_state(self):
+        """Persists the labeled bitmap so the next load can resume without rescanning annotations."""
+        if self.manifest is not None:
+            self.manifest.save_state(self.csv_handler.annotation_count(self.output_folder))
+
     def get_current_image(self):
         """Returns the current image path."""
         if self.image_list and self.index < len(self.image_list):
@@ -37,11 +317,43 @@ class ImageLoader:
         return None
 
     def next_image(self):
-        """Advances to the next image."""
-        if self.index < len(self.image_list) - 1:
-            self.index += 1
+        """Advances to the next image, stepping over skipped duplicates."""
+        if self._ordered():
+            pos = self.order_pos[self.index] + 1
+            while pos < len(self.order) and self.order[pos] in self.skipped:
+                pos += 1
+            if pos < len(self.order):
+                self.index = self.order[pos]
+            return
+        i = self.index + 1
+        while i in self.skipped:
+            i += 1
+        if i < self._bounds()[1]:
+            self.index = i
+
+    def next_unlabeled_image(self):
+        """Jumps to the next unlabeled image after the current one, if any."""
+        if self._ordered():
+            order = self.order
+            i = next((order[pos] for pos in range(self.order_pos[self.index] + 1, len(order))
+                      if not self.is_labeled(order[pos])), None)
+            if i is not None:
+                self.index = i
+            return
+        if self.manifest is not None:
+            i = self.manifest.next_unlabeled(self.index + 1)
+        else:
+            i = next((j for j in range(self.index + 1, len(self.image_list))
+                      if os.path.basename(self.image_list[j]) not in self.annotations), len(self.image_list))
+        if i < self._bounds()[1]:
+            self.index = i
 
     def prev_image(self):
         """Goes back to the previous image."""
-        if self.index > 0:
+        if self._ordered():
+            pos = self.order_pos[self.index]
+            if pos > 0:
+                self.index = self.order[pos - 1]
+            return
+        if self.index > self._bounds()[0]:
             self.index -= 1
@@ -0,0 +1,244 @@
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from thumbnailer import find_thumbnail
+from video_source import parse_frame_id
+from tracing import span
+
+
+def decode_image(image_path):
+    """
+    Decodes an image file into a display-ready QImage.
+    QImage (unlike QPixmap) is safe to create off the GUI thread.
+    """
+    with span("image.decode"):
+        image = QImage(image_path)
+        if image.isNull():
+            return image
+        if image.hasAlphaChannel():
+            return image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        return image.convertToFormat(QImage.Format_RGB32)
+
+
+def image_bytes(image):
+    """Returns the memory footprint of a QImage in bytes."""
+    if hasattr(image, "sizeInBytes"):
+        return image.sizeInBytes()
+    return image.byteCount()
+
+
+class _DecodeSignals(QObject):
+    decoded = pyqtSignal(str, QImage)
+
+
+class _DecodeTask(QRunnable):
+    """Decodes one image on a worker thread and reports back through a signal."""
+    def __init__(self, image_path, signals, is_wanted):
+        super().__init__()
+        self.image_path = image_path
+        self.signals = signals
+        self.is_wanted = is_wanted
+
+    def run(self):
+        # The user may have paged far away while this task sat in the queue
+        if not self.is_wanted(self.image_path):
+            self.signals.decoded.emit(self.image_path, QImage())
+            return
+        self.signals.decoded.emit(self.image_path, decode_image(self.image_path))
+
+
+class ImagePrefetcher:
+    def __init__(self, image_loader, ahead=3, behind=1, budget_mb=256, max_workers=2, on_ready=None):
+        """
+        Decodes the images around the ImageLoader's current index on worker threads
+        and keeps them in a bounded LRU cache of ready-to-display QImages.
+        on_ready(image_path) is called when an image requested with request() has been decoded
+        (or has failed to, see is_pending()).
+        """
+        self.image_loader = image_loader
+        self.on_ready = on_ready
+        self.input_folder = None
+        self.thumbnail_folder = None  # Written by thumbnailer.py, e.g. <input>/.thumbnails
+        self.requested = set()
+        self.ahead = ahead
+        self.behind = behind
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.cache = OrderedDict()  # {image_path: QImage}, least recently used first
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.in_flight = set()
+        self.failed = set()  # Requested images whose decode failed, so they are not retried on every get()
+        self.wanted = frozenset()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_workers)
+        self.signals = _DecodeSignals()
+        self.signals.decoded.connect(self._on_decoded)
+        self.video_reader = None  # VideoFrameReader whose frame_ready signal is connected
+
+    def get(self, image_path):
+        """
+        Returns the decoded QImage for image_path, or a null QImage if it is not decoded yet.
+        A miss never decodes on the calling (GUI) thread: the image is requested from the
+        worker pool (joining a decode already in flight) and on_ready fires once it lands.
+        Video frames come from the loader's VideoFrameReader, which keeps its own ring buffer
+        and works the same way (a seek can take seconds).
+        """
+        frame = self._video_frame(image_path)
+        if frame is not None:
+            reader = self._reader()
+            image = reader.peek(frame)
+            if image is None:
+                self.misses += 1
+                reader.request(frame)
+                return QImage()
+            self.hits += 1
+            return image
+        image = self.cache.get(image_path)
+        if image is not None:
+            self.cache.move_to_end(image_path)
+            self.hits += 1
+            return image
+        self.misses += 1
+        if image_path not in self.failed:
+            self.request(image_path)
+        return QImage()
+
+    def is_pending(self, image_path):
+        """True while get() returned a null image for image_path because it is still being decoded."""
+        frame = self._video_frame(image_path)
+        if frame is None:
+            return image_path in self.in_flight and image_path not in self.cache
+        reader = self._reader()
+        return reader.peek(frame) is None and not reader.failed(frame)
+
+    def _reader(self):
+        reader = self.image_loader.video_reader
+        if reader is not self.video_reader:
+            reader.frame_ready.connect(self._on_frame_ready)
+            self.video_reader = reader
+        return reader
+
+    def _on_frame_ready(self, frame):
+        current = self.image_loader.get_current_image()
+        if self.on_ready and current and self._video_frame(current) == frame:
+            self.on_ready(current)
+
+    def peek(self, image_path):
+        """Returns the cached QImage for image_path without decoding it, or None."""
+        frame = self._video_frame(image_path)
+        if frame is not None:
+            return self.image_loader.video_reader.peek(frame)
+        return self.cache.get(image_path)
+
+    def set_thumbnails(self, input_folder, thumbnail_folder):
+        """Uses the thumbnails of input_folder generated into thumbnail_folder as previews."""
+        self.input_folder = input_folder
+        self.thumbnail_folder = thumbnail_folder
+
+    def preview(self, image_path):
+        """
+        Returns the largest up-to-date thumbnail of image_path as a QImage, or None.
+        Thumbnails are tiny, so decoding one on the GUI thread costs next to nothing.
+        """
+        if not self.thumbnail_folder or not self.input_folder or self._video_frame(image_path) is not None:
+            return None
+        relative_path = os.path.relpath(image_path, self.input_folder).replace(os.sep, "/")
+        thumbnail = find_thumbnail(self.thumbnail_folder, relative_path, image_path)
+        if thumbnail is None:
+            return None
+        image = decode_image(thumbnail)
+        return None if image.isNull() else image
+
+    def request(self, image_path):
+        """Schedules a background decode of image_path; on_ready(image_path) fires once it is cached."""
+        self.requested.add(image_path)
+        self.wanted = self.wanted | {image_path}
+        if image_path not in self.in_flight:
+            self.in_flight.add(image_path)
+            self.pool.start(_DecodeTask(image_path, self.signals, self._is_wanted))
+
+    def prefetch(self):
+        """Schedules background decodes for the next/previous images around the current index."""
+        image_list = self.image_loader.image_list
+        index = self.image_loader.index
+        if self.image_loader.video_reader is not None:
+            # The frame reader decodes ahead of the requested frame by itself
+            frame = self._video_frame(self.image_loader.get_current_image() or "")
+            if frame is not None:
+                self.image_loader.video_reader.request(frame)
+            return
+        paths = []
+        for offset in list(range(1, self.ahead + 1)) + [-o for o in range(1, self.behind + 1)]:
+            i = index + offset
+            if 0 <= i < len(image_list):
+                paths.append(image_list[i])
+        current = self.image_loader.get_current_image()
+        self.wanted = frozenset(paths + ([current] if current else [])) | self.requested
+        for path in paths:
+            if path in self.cache or path in self.in_flight:
+                continue
+            self.in_flight.add(path)
+            self.pool.start(_DecodeTask(path, self.signals, self._is_wanted))
+
+    def clear(self):
+        """Drops all cached images, e.g. when a new folder is loaded."""
+        self.pool.clear()
+        self.in_flight.clear()
+        self.requested.clear()
+        self.failed.clear()
+        self.cache.clear()
+        self.memory_bytes = 0
+        self.wanted = frozenset()
+
+    def stats(self):
+        """Returns cache counters as a dictionary."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached_images": len(self.cache),
+            "memory_mb": self.memory_bytes / (1024 * 1024),
+            "budget_mb": self.budget_bytes / (1024 * 1024),
+            "in_flight": len(self.in_flight),
+        }
+
+    def _video_frame(self, image_path):
+        """Frame number if image_path is a frame of the loaded video, else None."""
+        if self.image_loader.video_reader is None:
+            return None
+        parsed = parse_frame_id(image_path)
+        return parsed[1] if parsed else None
+
+    def _is_wanted(self, image_path):
+        return image_path in self.wanted
+
+    def _on_decoded(self, image_path, image):
+        self.in_flight.discard(image_path)
+        requested = image_path in self.requested
+        self.requested.discard(image_path)
+        if image.isNull():
+            # Requested images are always wanted, so a null result for one is a real decode failure
+            if requested:
+                self.failed.add(image_path)
+                if self.on_ready:
+                    self.on_ready(image_path)
+            return
+        if image_path in self.cache or not self._is_wanted(image_path):
+            return
+        self._insert(image_path, image)
+        if requested and self.on_ready:
+            self.on_ready(image_path)
+
+    def _insert(self, image_path, image):
+        self.cache[image_path] = image
+        self.memory_bytes += image_bytes(image)
+        # Evict least recently used images until we are back under budget,
+        # but never the image that was just inserted
+        while self.memory_bytes > self.budget_bytes and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.memory_bytes -= image_bytes(evicted)
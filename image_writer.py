@@ -0,0 +1,168 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+logger = logging.getLogger("annotator.image_writer")
+
+FORMATS = {"jpg": ".jpg", "png": ".png", "webp": ".webp"}
+
+
+class EncoderSettings:
+    def __init__(self, image_format="jpg", jpeg_quality=95, png_compression=3, webp_quality=90, lossless=False):
+        """
+        Output format and cv2.imencode parameters. lossless only applies to WebP
+        (OpenCV encodes WebP losslessly for quality > 100); PNG is always lossless.
+        """
+        if image_format not in FORMATS:
+            raise ValueError(f"Unknown image format: {image_format} (expected one of {', '.join(FORMATS)})")
+        self.image_format = image_format
+        self.jpeg_quality = jpeg_quality
+        self.png_compression = png_compression
+        self.webp_quality = webp_quality
+        self.lossless = lossless
+
+    @classmethod
+    def from_dict(cls, settings):
+        return settings if isinstance(settings, cls) else cls(**(settings or {}))
+
+    def to_dict(self):
+        return {"image_format": self.image_format, "jpeg_quality": self.jpeg_quality,
+                "png_compression": self.png_compression, "webp_quality": self.webp_quality,
+                "lossless": self.lossless}
+
+    @property
+    def extension(self):
+        return FORMATS[self.image_format]
+
+    def params(self):
+        if self.image_format == "jpg":
+            return [cv2.IMWRITE_JPEG_QUALITY, int(self.jpeg_quality)]
+        if self.image_format == "png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, int(self.png_compression)]
+        return [cv2.IMWRITE_WEBP_QUALITY, 101 if self.lossless else int(self.webp_quality)]
+
+
+class ImageWriter:
+    def __init__(self, encoder=None, max_workers=4, max_queue=64):
+        """
+        Encodes and writes images on a thread pool (cv2.imencode releases the GIL).
+        write() returns a future right away and only blocks while max_queue writes
+        are already pending, which bounds the memory held by queued images. Files are
+        written to a temporary name and renamed into place, so readers never see a
+        partial image; each output directory is created once.
+        """
+        self.encoder = EncoderSettings.from_dict(encoder)
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-writer")
+        self.slots = threading.BoundedSemaphore(max_queue)
+        self.lock = threading.Lock()
+        self.created_dirs = set()
+        self.pending = set()
+        self.written = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.peak_depth = 0
+        self.encode_seconds = 0.0
+        self.started = time.perf_counter()
+
+    @property
+    def extension(self):
+        return self.encoder.extension
+
+    def write(self, path, img):
+        """Queues img (a BGR array) to be written to path. Returns a future resolving to True on success."""
+        self.slots.acquire()
+        folder = os.path.dirname(path)
+        if folder and folder not in self.created_dirs:
+            os.makedirs(folder, exist_ok=True)
+            self.created_dirs.add(folder)
+        future = self.executor.submit(self._write, path, img)
+        with self.lock:
+            self.pending.add(future)
+            self.peak_depth = max(self.peak_depth, len(self.pending))
+        future.add_done_callback(self._done)
+        return future
+
+    def flush(self):
+        """Blocks until every queued write has finished. Returns stats()."""
+        with self.lock:
+            pending = list(self.pending)
+        for future in pending:
+            future.result()
+        return self.stats()
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown(wait=True)
+
+    def queue_depth(self):
+        with self.lock:
+            return len(self.pending)
+
+    def stats(self):
+        """Throughput and queue counters since the writer was created."""
+        elapsed = time.perf_counter() - self.started
+        with self.lock:
+            depth = len(self.pending)
+            written, failed, bytes_written = self.written, self.failed, self.bytes_written
+        return {
+            "written": written,
+            "failed": failed,
+            "bytes_written": bytes_written,
+            "queue_depth": depth,
+            "peak_queue_depth": self.peak_depth,
+            "encode_seconds": self.encode_seconds,
+            "files_per_s": written / elapsed if elapsed else 0.0,
+            "mb_per_s": bytes_written / (1024 * 1024) / elapsed if elapsed else 0.0,
+        }
+
+    def _write(self, path, img):
+        start = time.perf_counter()
+        ext = os.path.splitext(path)[1] or self.extension
+        ok, data = cv2.imencode(ext, img, self.encoder.params())
+        encoded = time.perf_counter()
+        if not ok:
+            logger.warning("encode failed path=%s", path)
+            with self.lock:
+                self.failed += 1
+            return False
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data.tobytes())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("write failed path=%s error=%s", path, e)
+            with self.lock:
+                self.failed += 1
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        with self.lock:
+            self.written += 1
+            self.bytes_written += len(data)
+            self.encode_seconds += encoded - start
+        logger.debug("wrote path=%s bytes=%d encode_ms=%.1f", path, len(data), (encoded - start) * 1000)
+        return True
+
+    def _done(self, future):
+        with self.lock:
+            self.pending.discard(future)
+        self.slots.release()
+
+
+_default_writer = None
+_default_pid = None
+
+
+def default_writer():
+    """Process-wide writer with the default encoder settings (recreated in forked children)."""
+    global _default_writer, _default_pid
+    if _default_writer is None or _default_pid != os.getpid():
+        _default_writer = ImageWriter()
+        _default_pid = os.getpid()
+    return _default_writer
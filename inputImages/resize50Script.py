@@ -1,40 +1,28 @@
-import os
-from PIL import Image
-
-def downscale_all_images(directory, output_folder="resizedImages", size=(50, 50)):
-    # Get absolute paths
-    directory = os.path.abspath(directory)
-    output_path = os.path.join(directory, output_folder)
-
-    # Create 'resizedImages' folder if it doesn't exist
-    os.makedirs(output_path, exist_ok=True)
-
-    # Get list of all .jpg and .jpeg files (case-insensitive)
-    images = [f for f in os.listdir(directory) if f.lower().endswith((".jpg", ".jpeg"))]
-
-    if not images:
-        print(f"No JPG images found in {directory}")
-        return
-
-    print(f"Found {len(images)} JPG images. Processing...\n")
-
-    # Process each image
-    for img_name in images:
-        img_path = os.path.join(directory, img_name)
-        
-        # Open the image
-        img = Image.open(img_path)
-        
-        # Resize the image (LANCZOS for high quality)
-        img_resized = img.resize(size, Image.LANCZOS)
-        
-        # Save to the 'resizedImages' folder with the same filename
-        resized_img_path = os.path.join(output_path, img_name)
-        img_resized.save(resized_img_path)
-        
-        print(f"✅ Resized and saved: {resized_img_path}")
-
-# Run the function on the current directory
-current_directory = os.getcwd()
-print(f"🔍 Searching for JPG images in: {current_directory}")
-downscale_all_images(current_directory)
+import os
+import sys
+
+# The thumbnail module lives in the repository root, one level above this script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from thumbnailer import build_thumbnails, JPEG_EXTENSIONS
+
+
+def downscale_all_images(directory, output_folder="resizedImages", size=(50, 50)):
+    # Get absolute paths
+    directory = os.path.abspath(directory)
+    output_path = os.path.join(directory, output_folder)
+
+    # Resize every .jpg/.jpeg on all cores; images whose output still matches the source's mtime and size are skipped
+    summary = build_thumbnails(directory, output_path, [size], flat=True, extensions=JPEG_EXTENSIONS)
+    if not summary["images"]:
+        print(f"No JPG images found in {directory}")
+        return
+
+    print(f"✅ Found {summary['images']} JPG images: resized {summary['written']}, "
+          f"{summary['skipped']} already up to date ({summary['seconds']:.1f}s) → {output_path}")
+
+
+if __name__ == "__main__":
+    # Run the function on the current directory
+    current_directory = os.getcwd()
+    print(f"🔍 Searching for JPG images in: {current_directory}")
+    downscale_all_images(current_directory)
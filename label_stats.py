@@ -0,0 +1,132 @@
+import time
+from collections import deque
+
+UNSUITABLE = "unsuitable"
+
+
+def label_sort_key(label):
+    """Jersey numbers in numeric order, anything else (e.g. unsuitable) after them."""
+    return (0, int(label), "") if label.isdigit() else (1, 0, label)
+
+
+class LabelStats:
+    def __init__(self, session_data, aggregate=None, window_seconds=300, idle_gap=60):
+        """
+        Running label statistics for the dashboard: class balance, unsuitable ratio,
+        labels per minute and the ETA for the loaded folder. Totals start from the
+        session history aggregate and record() adds each save as it happens, so
+        nothing is recomputed from annotations.csv. Active time is the sum of the
+        gaps between saves, each capped at idle_gap seconds, so breaks do not drag
+        the rate down; it is kept in session_data["active_seconds"] and persisted
+        with the session.
+        """
+        self.session_data = session_data
+        aggregate = aggregate or {}
+        self.history_labels = dict(aggregate.get("per_label", {}))
+        self.history_annotators = {name: dict(entry) for name, entry in aggregate.get("per_annotator", {}).items()}
+        self.window_seconds = window_seconds
+        self.idle_gap = idle_gap
+        self.last_save = time.monotonic()  # The first label's gap is measured from the session start
+        self.recent = deque()  # (monotonic time, labels, active seconds) of saves within the window
+        self.recent_labels = 0
+        self.recent_seconds = 0.0
+
+    def record(self, label, count=1, now=None):
+        """Adds count images saved with label (a single save, or a batch/duplicate propagation)."""
+        now = time.monotonic() if now is None else now
+        gap = min(max(now - self.last_save, 0.0), self.idle_gap)
+        self.last_save = now
+        data = self.session_data
+        data["images_annotated"] += count
+        data["label_counts"][label] = data["label_counts"].get(label, 0) + count
+        data["active_seconds"] += gap
+        self.recent.append((now, count, gap))
+        self.recent_labels += count
+        self.recent_seconds += gap
+
+    def _expire(self, now):
+        while self.recent and now - self.recent[0][0] > self.window_seconds:
+            _, count, gap = self.recent.popleft()
+            self.recent_labels -= count
+            self.recent_seconds -= gap
+
+    @staticmethod
+    def per_minute(labels, seconds):
+        return labels * 60.0 / seconds if seconds > 0 else 0.0
+
+    def session_rate(self):
+        return self.per_minute(self.session_data["images_annotated"], self.session_data["active_seconds"])
+
+    def recent_rate(self, now=None):
+        """Labels per minute over the last window_seconds (the session rate until the window has data)."""
+        self._expire(time.monotonic() if now is None else now)
+        if self.recent_seconds > 0:
+            return self.per_minute(self.recent_labels, self.recent_seconds)
+        return self.session_rate()
+
+    def label_counts(self):
+        """{label: images} over the history plus this session."""
+        counts = dict(self.history_labels)
+        for label, count in self.session_data["label_counts"].items():
+            counts[label] = counts.get(label, 0) + count
+        return counts
+
+    def unsuitable_ratio(self, counts=None):
+        counts = self.label_counts() if counts is None else counts
+        total = sum(counts.values())
+        return counts.get(UNSUITABLE, 0) / total if total else 0.0
+
+    def session_unsuitable_ratio(self):
+        return self.unsuitable_ratio(self.session_data["label_counts"])
+
+    def annotator_rates(self):
+        """{annotator: (labels per minute, images labeled)}, this session included."""
+        totals = {}
+        for name, entry in self.history_annotators.items():
+            # Sessions saved before active time was tracked count as images but not as timed images
+            totals[name] = [entry.get("timed_images", 0), entry.get("active_seconds", 0.0),
+                            entry.get("images_annotated", 0)]
+        current = totals.setdefault(self.session_data.get("annotator") or "unknown", [0, 0.0, 0])
+        current[0] += self.session_data["images_annotated"]
+        current[1] += self.session_data["active_seconds"]
+        current[2] += self.session_data["images_annotated"]
+        return {name: (self.per_minute(timed, seconds), images) for name, (timed, seconds, images) in totals.items()}
+
+    def eta_seconds(self, remaining, now=None):
+        """Seconds of labeling left for remaining images at the recent rate (None without a rate)."""
+        rate = self.recent_rate(now)
+        if remaining is None or rate <= 0:
+            return None
+        return remaining * 60.0 / rate
+
+    def summary(self, remaining=None, top=10, now=None):
+        """Dashboard text: totals and rates, class balance, then per-annotator rates."""
+        counts = self.label_counts()
+        numbers = {label: count for label, count in counts.items() if label != UNSUITABLE}
+        total_numbers = sum(numbers.values())
+        eta = self.eta_seconds(remaining, now)
+        eta_text = "--" if eta is None else format_duration(eta)
+        remaining_text = "--" if remaining is None else str(remaining)
+        lines = [
+            f"Labeled: {sum(counts.values())} ({self.session_data['images_annotated']} this session) | "
+            f"Unsuitable: {self.unsuitable_ratio(counts):.1%} (session {self.session_unsuitable_ratio():.1%}) | "
+            f"Rate: {self.recent_rate(now):.1f}/min (session {self.session_rate():.1f}/min) | "
+            f"Remaining: {remaining_text} | ETA: {eta_text}"
+        ]
+        if numbers:
+            ranked = sorted(numbers.items(), key=lambda item: (-item[1], label_sort_key(item[0])))
+            most = ", ".join(f"{label}: {count} ({count / total_numbers:.0%})" for label, count in ranked[:top])
+            fewest = ", ".join(f"{label}: {count}" for label, count in ranked[::-1][:3])
+            lines.append(f"Balance ({len(numbers)} numbers, min/max {ranked[-1][1] / ranked[0][1]:.2f}): "
+                         f"{most} | Fewest: {fewest}")
+        rates = sorted(self.annotator_rates().items(), key=lambda item: -item[1][1])
+        lines.append("Annotators: " + " | ".join(f"{name} {rate:.1f}/min ({images})"
+                                                 for name, (rate, images) in rates[:5]))
+        return "\n".join(lines)
+
+
+def format_duration(seconds):
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} min"
+    return f"{minutes // 60} h {minutes % 60:02d} min"
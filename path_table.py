@@ -0,0 +1,71 @@
+import os
+from array import array
+
+
+class PathTable:
+    def __init__(self, root):
+        """
+        Compact, append-only table of image paths under root.
+        Names are packed into one UTF-8 buffer with an offset array, and each entry
+        stores only an index into a short list of relative directories, so a million
+        paths cost a few bytes each instead of a full Python string.
+        Indexing returns the full path string, so the table can stand in for a list.
+        """
+        self.root = root
+        self.dirs = [""]  # Relative directories; "" is root itself
+        self._dir_ids = {"": 0}
+        self.dir_of = array('I')
+        self.offsets = array('Q', [0])
+        self.blob = bytearray()
+
+    @classmethod
+    def from_relative_paths(cls, root, relative_paths):
+        table = cls(root)
+        for relative_path in relative_paths:
+            rel_dir, _, name = relative_path.rpartition("/")
+            table.append(rel_dir, name)
+        return table
+
+    def append(self, rel_dir, name):
+        dir_id = self._dir_ids.get(rel_dir)
+        if dir_id is None:
+            dir_id = len(self.dirs)
+            self.dirs.append(rel_dir)
+            self._dir_ids[rel_dir] = dir_id
+        self.dir_of.append(dir_id)
+        self.blob += name.encode("utf-8")
+        self.offsets.append(len(self.blob))
+
+    def name(self, i):
+        """File name of entry i."""
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def relative_path(self, i):
+        """Path of entry i relative to root, always using "/" separators."""
+        rel_dir = self.dirs[self.dir_of[i]]
+        return f"{rel_dir}/{self.name(i)}" if rel_dir else self.name(i)
+
+    def sorted_order(self):
+        """Returns the entry indices ordered by relative path."""
+        return sorted(range(len(self)), key=self.relative_path)
+
+    def reordered(self, order):
+        """Returns a new table holding the entries in the given order."""
+        table = PathTable(self.root)
+        for i in order:
+            table.append(self.dirs[self.dir_of[i]], self.name(i))
+        return table
+
+    def __len__(self):
+        return len(self.dir_of)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("PathTable index out of range")
+        return os.path.join(self.root, *self.relative_path(i).split("/"))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
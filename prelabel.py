@@ -0,0 +1,179 @@
+import os
+import zlib
+import sqlite3
+
+import cv2
+import numpy as np
+
+PREDICTIONS_DB_FILE = "predictions.db"
+
+
+class PrelabelBackend:
+    """
+    Interface of a pre-label model: predict_batch takes a list of BGR images (numpy arrays)
+    and returns one (label, confidence) pair per image. model_id identifies the model
+    in the prediction cache, so switching models never reuses stale predictions.
+    """
+    model_id = "base"
+
+    def predict_batch(self, images):
+        raise NotImplementedError
+
+
+class DummyBackend(PrelabelBackend):
+    """Deterministic pseudo-predictions derived from the pixels; no model or extra packages needed."""
+    model_id = "dummy"
+
+    def predict_batch(self, images):
+        results = []
+        for img in images:
+            digest = zlib.crc32(np.ascontiguousarray(img[::8, ::8]).tobytes())
+            results.append((str(digest % 99 + 1), (digest >> 8) % 1000 / 1000))
+        return results
+
+
+def _softmax(logits):
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def load_class_labels(model_path):
+    """Reads <model>.labels.txt (one label per class index) if present; defaults to the class indices."""
+    labels_path = os.path.splitext(model_path)[0] + ".labels.txt"
+    if not os.path.isfile(labels_path):
+        return None
+    with open(labels_path, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class _ClassifierBackend(PrelabelBackend):
+    """Shared pre/post-processing for image classifiers with NCHW float input and (N, classes) output."""
+    def __init__(self, model_path, input_size=(64, 64)):
+        self.model_path = model_path
+        self.input_size = input_size
+        self.labels = load_class_labels(model_path)
+        self.model_id = model_id_for(model_path)
+
+    def to_labels(self, logits):
+        probs = logits if np.allclose(logits.sum(axis=1), 1.0, atol=1e-3) else _softmax(logits)
+        best = probs.argmax(axis=1)
+        return [(self.labels[i] if self.labels and i < len(self.labels) else str(i), float(probs[n, i]))
+                for n, i in enumerate(best)]
+
+
+class OnnxBackend(_ClassifierBackend):
+    def __init__(self, model_path, input_size=None):
+        try:
+            import onnxruntime
+        except ModuleNotFoundError:
+            raise RuntimeError("onnxruntime is not installed. Please install it using 'pip install onnxruntime'")
+        self.session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = model_input.shape  # [N, C, H, W]; dynamic dims come back as strings/None
+        if input_size is None and isinstance(shape[2], int) and isinstance(shape[3], int):
+            input_size = (shape[3], shape[2])
+        super().__init__(model_path, input_size or (64, 64))
+
+    def predict_batch(self, images):
+        blob = cv2.dnn.blobFromImages(images, 1 / 255.0, self.input_size, swapRB=True)
+        return self.to_labels(self.session.run(None, {self.input_name: blob})[0])
+
+
+class OpenCVDnnBackend(_ClassifierBackend):
+    def __init__(self, model_path, input_size=None):
+        self.net = cv2.dnn.readNet(model_path)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        super().__init__(model_path, input_size or (64, 64))
+
+    def predict_batch(self, images):
+        self.net.setInput(cv2.dnn.blobFromImages(images, 1 / 255.0, self.input_size, swapRB=True))
+        return self.to_labels(self.net.forward())
+
+
+def model_id_for(spec):
+    """Cache key of a backend spec: the model file's name, size and mtime (or "dummy")."""
+    if spec == "dummy":
+        return DummyBackend.model_id
+    path = spec.partition(":")[2] if spec.startswith(("onnx:", "opencv:")) else spec
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def make_backend(spec):
+    """
+    Builds a backend from a spec string: "dummy", "onnx:<model.onnx>", "opencv:<model file>",
+    or just a model path (ONNX Runtime for .onnx if installed, otherwise OpenCV DNN).
+    """
+    kind, _, path = spec.partition(":")
+    if spec == "dummy":
+        return DummyBackend()
+    if kind == "onnx":
+        return OnnxBackend(path)
+    if kind == "opencv":
+        return OpenCVDnnBackend(path)
+    if spec.lower().endswith(".onnx"):
+        try:
+            return OnnxBackend(spec)
+        except RuntimeError:
+            pass
+    return OpenCVDnnBackend(spec)
+
+
+_worker_backend = None
+
+
+def init_worker(spec):
+    global _worker_backend
+    cv2.setNumThreads(1)  # One inference per process; the pool provides the parallelism
+    _worker_backend = make_backend(spec)
+
+
+def predict_files(batch):
+    """
+    Worker entry point: decodes a batch of (key, image_path) and runs the process's backend once
+    over the whole batch. Returns [(key, label, confidence)], skipping unreadable images.
+    """
+    keys = []
+    images = []
+    for key, image_path in batch:
+        img = cv2.imread(image_path)
+        if img is not None:
+            keys.append(key)
+            images.append(img)
+    if not images:
+        return []
+    return [(key, label, confidence) for key, (label, confidence) in zip(keys, _worker_backend.predict_batch(images))]
+
+
+class PredictionCache:
+    def __init__(self, db_path):
+        """
+        Per-image predictions stored in SQLite (predictions.db in the output folder), keyed by
+        model id and relative image path, with the mtime/size they were computed for.
+        """
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS predictions (
+                                     model TEXT NOT NULL,
+                                     image_name TEXT NOT NULL,
+                                     mtime INTEGER,
+                                     size INTEGER,
+                                     label TEXT,
+                                     confidence REAL,
+                                     PRIMARY KEY (model, image_name))""")
+
+    def load(self, model_id):
+        """Returns {image_name: (label, confidence, mtime, size)} for a model."""
+        return {row[0]: tuple(row[1:]) for row in self.conn.execute(
+            "SELECT image_name, label, confidence, mtime, size FROM predictions WHERE model = ?", (model_id,))}
+
+    def add_many(self, model_id, rows):
+        """Stores [(image_name, mtime, size, label, confidence)] in one transaction."""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(model_id,) + tuple(row) for row in rows])
+
+    def close(self):
+        self.conn.close()
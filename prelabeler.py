@@ -0,0 +1,87 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from prelabel import PredictionCache, model_id_for, predict_files, init_worker
+
+
+class Prelabeler(QThread):
+    """
+    Runs a pre-label backend over a FolderManifest on a background thread.
+    Cached predictions are reported first; the remaining images are decoded and
+    predicted in batches on a process pool (one model instance per worker) and
+    written to the prediction cache as they arrive. stop() returns at once: queued
+    batches are cancelled and the thread leaves without waiting for the batches in flight.
+    """
+    predictions_ready = pyqtSignal(object)  # {manifest index: (label, confidence)}
+    progress = pyqtSignal(int, int)  # (predicted, total)
+    failed = pyqtSignal(str)
+
+    def __init__(self, spec, manifest, db_path, batch_size=32, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.spec = spec
+        self.manifest = manifest
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.executor = None
+
+    def stop(self):
+        """Asks the thread to finish and cancels the batches the workers have not started; never waits."""
+        self.requestInterruption()
+        executor = self.executor
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.failed.emit(str(e))
+
+    def _run(self):
+        model_id = model_id_for(self.spec)
+        cache = PredictionCache(self.db_path)  # SQLite connections belong to the thread that opened them
+        table = self.manifest.table
+        cached = cache.load(model_id)
+        ready = {}
+        stale = []
+        for i in range(len(table)):
+            entry = cached.get(table.relative_path(i))
+            if entry is not None and entry[2] == self.manifest.mtimes[i] and entry[3] == self.manifest.sizes[i]:
+                ready[i] = (entry[0], entry[1])
+            else:
+                stale.append(i)
+        del cached
+        if ready:
+            self.predictions_ready.emit(ready)
+        total = len(table)
+        done = len(ready)
+        self.progress.emit(done, total)
+        batches = [[(i, table[i]) for i in stale[j:j + self.batch_size]]
+                   for j in range(0, len(stale), self.batch_size)]
+        if batches and not self.isInterruptionRequested():
+            executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_worker,
+                                           initargs=(self.spec,), mp_context=multiprocessing.get_context("spawn"))
+            self.executor = executor
+            try:
+                futures = [executor.submit(predict_files, batch) for batch in batches]
+                for batch, future in zip(batches, futures):
+                    # Poll, so an interruption is noticed while a batch (or the model load) is in flight
+                    while not self.isInterruptionRequested() and not wait([future], timeout=0.1).done:
+                        pass
+                    if self.isInterruptionRequested():
+                        break
+                    results = future.result()
+                    cache.add_many(model_id, [(table.relative_path(i), self.manifest.mtimes[i],
+                                               self.manifest.sizes[i], label, confidence)
+                                              for i, label, confidence in results])
+                    self.predictions_ready.emit({i: (label, confidence) for i, label, confidence in results})
+                    done += len(batch)
+                    self.progress.emit(done, total)
+            finally:
+                self.executor = None
+                # Interrupted: the workers finish their current batch and exit on their own
+                executor.shutdown(wait=not self.isInterruptionRequested(), cancel_futures=True)
+        cache.close()
@@ -1,4 +1,5 @@
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QHBoxLayout, QPushButton
+from PyQt5.QtCore import QThread, pyqtSignal
 
 class RenameDialog(QDialog):
     def __init__(self, input_folder, parent=None):
@@ -35,3 +36,22 @@ class RenameDialog(QDialog):
     def getValues(self):
         """Returns the prefix and starting number entered by the user."""
         return self.prefix_edit.text(), self.number_edit.text()
+
+
+class RenameWorker(QThread):
+    """Runs a RenameEngine plan off the GUI thread and reports progress."""
+    progress = pyqtSignal(int, int)
+    renamed = pyqtSignal(object)  # {old_name: new_name}
+    failed = pyqtSignal(str)
+
+    def __init__(self, engine, plan, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.plan = plan
+        self.engine.on_progress = self.progress.emit
+
+    def run(self):
+        try:
+            self.renamed.emit(self.engine.execute(self.plan))
+        except Exception as e:
+            self.failed.emit(str(e))
@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+CONVERTIBLE_EXTENSIONS = ('png', 'jpeg', 'jpg', 'bmp', 'gif', 'tiff', 'webp')
+
+
+class RenameCollisionError(Exception):
+    """Raised when a rename plan would overwrite files or map two files to one name."""
+
+
+def convert_to_jpeg(src_path, dst_path, quality=95):
+    """Worker entry point: decodes any PIL-readable image and writes it as JPEG, atomically."""
+    from PIL import Image
+    part_path = dst_path + ".part"
+    with Image.open(src_path) as img:
+        img = img.convert("RGB")  # Ensure compatibility
+        img.save(part_path, format="JPEG", quality=quality)
+    os.replace(part_path, dst_path)
+    return src_path
+
+
+class RenameEngine:
+    JOURNAL_FILE = ".rename_journal.json"
+
+    def __init__(self, folder, max_workers=None, on_progress=None):
+        """
+        Plans and executes bulk renames/conversions inside one folder.
+        Every operation first moves (or converts) its source to a temporary name and only
+        then to its final name, driven by a journal, so an interrupted run can always be
+        rolled forward with recover() instead of leaving a half-renamed folder.
+        on_progress(done, total) is called as files are processed.
+        """
+        self.folder = folder
+        self.max_workers = max_workers
+        self.on_progress = on_progress
+        self.journal_path = os.path.join(folder, self.JOURNAL_FILE)
+
+    # ---- planning -----------------------------------------------------------
+
+    def plan_sequential(self, prefix, start_number, digits=6, extensions=IMAGE_EXTENSIONS):
+        """
+        Renames every image to prefix_<number><ext> in sorted order (the annotator's Rename Images).
+        Returns a list of operations {"old", "new", "convert"}.
+        """
+        images = sorted(entry.name for entry in os.scandir(self.folder)
+                        if entry.is_file() and entry.name.lower().endswith(extensions))
+        plan = []
+        for number, old_name in enumerate(images, start_number):
+            ext = os.path.splitext(old_name)[1].lower()
+            plan.append({"old": old_name, "new": f"{prefix}_{str(number).zfill(digits)}{ext}", "convert": False})
+        return plan
+
+    def plan_standardize(self, prefix="IMG_test", digits=8, extensions=CONVERTIBLE_EXTENSIONS, keep_sources=True):
+        """
+        Leaves files already named prefix_<digits>.jpg alone and converts every other image
+        to JPEG under the next free numbers (standardRenamingScript's behaviour).
+        """
+        pattern = re.compile(rf"{re.escape(prefix)}_(\d{{{digits}}})\.jpg$", re.IGNORECASE)
+        existing = []
+        unformatted = []
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or not entry.name.lower().endswith(extensions):
+                continue
+            match = pattern.match(entry.name)
+            if match:
+                existing.append(int(match.group(1)))
+            else:
+                unformatted.append(entry.name)
+        max_index = max(existing) if existing else 0
+        plan = []
+        for number, old_name in enumerate(sorted(unformatted), max_index + 1):
+            plan.append({"old": old_name, "new": f"{prefix}_{number:0{digits}d}.jpg",
+                         "convert": True, "keep_source": keep_sources})
+        return plan
+
+    def validate(self, plan):
+        """Raises RenameCollisionError if the plan maps two files to one name or overwrites an unrelated file."""
+        sources = {op["old"] for op in plan if not op.get("keep_source")}
+        targets = set()
+        problems = []
+        for op in plan:
+            if op["new"] in targets:
+                problems.append(f"{op['old']} -> {op['new']}: target used twice")
+            targets.add(op["new"])
+            if op["new"] != op["old"] and op["new"] not in sources \
+                    and os.path.exists(os.path.join(self.folder, op["new"])):
+                problems.append(f"{op['old']} -> {op['new']}: target already exists")
+        if problems:
+            raise RenameCollisionError("; ".join(problems[:10]) + (" ..." if len(problems) > 10 else ""))
+
+    # ---- execution ----------------------------------------------------------
+
+    def execute(self, plan):
+        """
+        Validates and runs the plan. Returns {old_name: new_name} for files that no longer
+        exist under their old name, so annotation rows can be rewritten. The journal stays
+        in place until finish() is called, after the caller has updated its annotations.
+        """
+        self.validate(plan)
+        plan = [op for op in plan if op["old"] != op["new"]]
+        token = uuid.uuid4().hex[:8]
+        for i, op in enumerate(plan):
+            op["tmp"] = f".{token}_{i}.renaming"
+        journal = {"ops": plan, "phase": 1, "files_done": False, "annotations_done": False}
+        self._write_journal(journal)
+        self._run(journal)
+        return self._mapping(plan)
+
+    def recover(self):
+        """
+        Rolls an interrupted run forward. Returns (mapping, annotations_done) for the
+        interrupted plan, or None if there was nothing to recover.
+        """
+        journal = self.read_journal()
+        if journal is None:
+            return None
+        if not journal.get("files_done"):
+            print(f"Recovering interrupted rename of {len(journal['ops'])} file(s) in {self.folder}")
+            self._run(journal)
+        return self._mapping(journal["ops"]), journal.get("annotations_done", False)
+
+    def mark_annotations_done(self):
+        self.mark_done("annotations")
+
+    def mark_done(self, step):
+        """Records that a sidecar keyed by file name (annotations, rois, ...) has been rewritten for the plan."""
+        journal = self.read_journal()
+        if journal is not None:
+            journal[f"{step}_done"] = True
+            self._write_journal(journal)
+
+    def is_done(self, step):
+        journal = self.read_journal()
+        return journal is None or journal.get(f"{step}_done", False)
+
+    def finish(self):
+        """Removes the journal once files and annotations are both up to date."""
+        if os.path.isfile(self.journal_path):
+            os.remove(self.journal_path)
+
+    def read_journal(self):
+        if not os.path.isfile(self.journal_path):
+            return None
+        with open(self.journal_path, "r") as f:
+            return json.load(f)
+
+    def _run(self, journal):
+        plan = journal["ops"]
+        if journal["phase"] == 1:
+            self._move_to_temporary(plan)
+            journal["phase"] = 2
+            self._write_journal(journal)
+        # Phase 2: temporary names to final names. Sources are all parked under temporary
+        # names by now, so a final name can never clobber a file that still has to move.
+        for op in plan:
+            tmp_path = os.path.join(self.folder, op["tmp"])
+            if os.path.exists(tmp_path):
+                os.rename(tmp_path, os.path.join(self.folder, op["new"]))
+        self._remove_thumbnails(plan)
+        journal["files_done"] = True
+        self._write_journal(journal)
+
+    def _move_to_temporary(self, plan):
+        """Phase 1: renames (or converts) every source to its temporary name. Safe to repeat."""
+        total = len(plan)
+        done = 0
+        conversions = []
+        for op in plan:
+            old_path = os.path.join(self.folder, op["old"])
+            if os.path.exists(os.path.join(self.folder, op["tmp"])):
+                self._remove_converted_source(op)
+                done += 1
+                continue
+            if op.get("convert"):
+                conversions.append(op)
+                continue
+            os.rename(old_path, os.path.join(self.folder, op["tmp"]))
+            done += 1
+            self._progress(done, total)
+        if conversions:
+            with ProcessPoolExecutor(max_workers=self.max_workers,
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                futures = {executor.submit(convert_to_jpeg, os.path.join(self.folder, op["old"]),
+                                           os.path.join(self.folder, op["tmp"])): op for op in conversions}
+                for future in as_completed(futures):
+                    future.result()
+                    self._remove_converted_source(futures[future])
+                    done += 1
+                    self._progress(done, total)
+
+    def _remove_thumbnails(self, plan):
+        """Thumbnails are keyed by file name, so those of every old and new name now show the wrong image."""
+        from thumbnailer import DEFAULT_THUMBNAIL_DIR, remove_thumbnails
+        names = {op["old"] for op in plan} | {op["new"] for op in plan}
+        remove_thumbnails(os.path.join(self.folder, DEFAULT_THUMBNAIL_DIR), names)
+
+    def _remove_converted_source(self, op):
+        if op.get("convert") and not op.get("keep_source"):
+            old_path = os.path.join(self.folder, op["old"])
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+    def _mapping(self, plan):
+        return {op["old"]: op["new"] for op in plan if not op.get("keep_source")}
+
+    def _progress(self, done, total):
+        if self.on_progress:
+            self.on_progress(done, total)
+
+    def _write_journal(self, journal):
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(journal, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
@@ -0,0 +1,87 @@
+from PyQt5.QtCore import Qt, QObject, QEvent, QRect
+from PyQt5.QtWidgets import QRubberBand
+
+from roi_store import clamp_roi
+
+
+class RoiSelector(QObject):
+    """
+    Rubber-band ROI drawing on the annotator's image label.
+    The ROI is kept in source-image pixels, so it does not depend on the window size;
+    set_image() is called whenever the label's pixmap changes to re-place the band.
+    """
+    def __init__(self, label, on_changed=None):
+        super().__init__(label)
+        self.label = label
+        self.on_changed = on_changed
+        self.band = QRubberBand(QRubberBand.Rectangle, label)
+        self.image_size = None  # (width, height) of the source image on display
+        self.roi = None  # (x, y, w, h) in source pixels
+        self.origin = None
+        self.enabled = False
+        label.installEventFilter(self)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.band.setVisible(enabled and self.roi is not None)
+
+    def set_image(self, image_size, roi):
+        """Shows roi (or nothing) for an image of image_size (None while it is still decoding)."""
+        self.image_size = image_size
+        self.roi = clamp_roi(roi, *image_size) if roi and image_size else None
+        self._place_band()
+
+    def _pixmap_rect(self):
+        """Where the scaled pixmap sits inside the label (it is centered in the contents rect)."""
+        pixmap = self.label.pixmap()
+        if pixmap is None or pixmap.isNull():
+            return None
+        contents = self.label.contentsRect()
+        return QRect(contents.x() + (contents.width() - pixmap.width()) // 2,
+                     contents.y() + (contents.height() - pixmap.height()) // 2,
+                     pixmap.width(), pixmap.height())
+
+    def _place_band(self):
+        rect = self._pixmap_rect()
+        if not self.enabled or self.roi is None or rect is None or self.image_size is None:
+            self.band.hide()
+            return
+        scale = rect.width() / self.image_size[0]
+        x, y, w, h = self.roi
+        self.band.setGeometry(QRect(rect.x() + round(x * scale), rect.y() + round(y * scale),
+                                    max(1, round(w * scale)), max(1, round(h * scale))))
+        self.band.show()
+
+    def _to_image(self, band_rect):
+        rect = self._pixmap_rect()
+        if rect is None or self.image_size is None:
+            return None
+        scale = self.image_size[0] / rect.width()
+        roi = (round((band_rect.x() - rect.x()) * scale), round((band_rect.y() - rect.y()) * scale),
+               round(band_rect.width() * scale), round(band_rect.height() * scale))
+        return clamp_roi(roi, *self.image_size)
+
+    def eventFilter(self, obj, event):
+        if obj is not self.label or not self.enabled or self.image_size is None:
+            return False
+        kind = event.type()
+        if kind == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            self.origin = event.pos()
+            self.band.setGeometry(QRect(self.origin, self.origin))
+            self.band.show()
+            return True
+        if kind == QEvent.MouseMove and self.origin is not None:
+            self.band.setGeometry(QRect(self.origin, event.pos()).normalized())
+            return True
+        if kind == QEvent.MouseButtonRelease and self.origin is not None:
+            roi = self._to_image(QRect(self.origin, event.pos()).normalized())
+            self.origin = None
+            if roi is not None:
+                self.roi = roi
+                if self.on_changed:
+                    self.on_changed(roi)
+            self._place_band()
+            return True
+        if kind == QEvent.Resize:
+            self._place_band()
+        return False
@@ -0,0 +1,138 @@
+import os
+import csv
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+ROI_FILE = "rois.csv"
+ROI_HEADER = ["image_name", "x", "y", "width", "height", "timestamp"]
+
+
+def clamp_roi(roi, width, height):
+    """Clips (x, y, w, h) to a width x height image; returns None if nothing is left."""
+    x, y, w, h = roi
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(width, x + w), min(height, y + h)
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def crop(img, roi):
+    """Returns a contiguous copy of the ROI of a decoded (H, W, C) image, or the image if roi is None."""
+    if roi is None:
+        return img
+    roi = clamp_roi(roi, img.shape[1], img.shape[0])
+    if roi is None:
+        return img
+    x, y, w, h = roi
+    return np.ascontiguousarray(img[y:y + h, x:x + w])
+
+
+def qimage_to_bgr(image):
+    """Views an RGB32/ARGB32 QImage as a BGR uint8 array (a copy, so the QImage may go away)."""
+    width, height = image.width(), image.height()
+    bits = image.constBits()
+    bits.setsize(image.bytesPerLine() * height)
+    pixels = np.frombuffer(bits, dtype=np.uint8).reshape(height, image.bytesPerLine() // 4, 4)
+    return pixels[:, :width, :3].copy()  # Little-endian 0xAARRGGBB is stored as B, G, R, A
+
+
+class RoiStore:
+    def __init__(self, output_folder):
+        """
+        Jersey regions of labeled images, kept in rois.csv next to annotations.csv
+        (image_name, x, y, width, height in source pixels; the last row for an image wins).
+        A sidecar rather than extra annotation columns, so every reader of the
+        four-column annotations.csv keeps working.
+        """
+        self.csv_path = os.path.join(output_folder, ROI_FILE)
+        self.rois = {}  # {image_name: (x, y, w, h)}
+        self.load()
+
+    def load(self):
+        self.rois = {}
+        if not os.path.isfile(self.csv_path):
+            return self.rois
+        with open(self.csv_path, "r", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if len(row) >= 5:
+                    try:
+                        self.rois[row[0]] = tuple(int(v) for v in row[1:5])
+                    except ValueError:
+                        continue
+        return self.rois
+
+    def get(self, image_name):
+        return self.rois.get(image_name)
+
+    def set_many(self, items):
+        """Appends [(image_name, (x, y, w, h))] in a single write."""
+        if not items:
+            return
+        exists = os.path.isfile(self.csv_path)
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        with open(self.csv_path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if not exists:
+                writer.writerow(ROI_HEADER)
+            writer.writerows([image_name, *roi, timestamp] for image_name, roi in items)
+        self.rois.update(items)
+
+    def set(self, image_name, roi):
+        self.set_many([(image_name, tuple(roi))])
+
+    def rename_many(self, mapping):
+        """Rewrites rois.csv for renamed images {old_name: new_name}, atomically; rows are mapped in one pass."""
+        if not mapping or not os.path.isfile(self.csv_path):
+            return
+        with open(self.csv_path, "r", newline="") as f:
+            rows = list(csv.reader(f))
+        tmp_path = self.csv_path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerows(rows[:1])
+            writer.writerows([mapping.get(row[0], row[0])] + row[1:] if row else row for row in rows[1:])
+        os.replace(tmp_path, self.csv_path)
+        self.load()
+
+
+class CropCache:
+    def __init__(self, budget_mb=64):
+        """
+        LRU of decoded ROI crops keyed by (image path, roi). Crops are a small fraction of a
+        frame, so many fit in the budget; repeated augmentation or export of the same
+        region never decodes the full frame again.
+        """
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.crops = OrderedDict()  # {(image_path, roi): ndarray}
+        self.memory_bytes = 0
+
+    def get(self, image_path, roi, decode=None):
+        """
+        Returns the BGR crop of image_path (the whole image for roi None). decode() supplies
+        the full decoded image on a miss (default: cv2.imread); returns None if it cannot be decoded.
+        """
+        key = (image_path, tuple(roi) if roi else None)
+        cropped = self.crops.get(key)
+        if cropped is not None:
+            self.crops.move_to_end(key)
+            return cropped
+        img = decode() if decode else cv2.imread(image_path)
+        if img is None:
+            return None
+        cropped = crop(img, roi)
+        self.crops[key] = cropped
+        self.memory_bytes += cropped.nbytes
+        while self.memory_bytes > self.budget_bytes and len(self.crops) > 1:
+            _, evicted = self.crops.popitem(last=False)
+            self.memory_bytes -= evicted.nbytes
+        return cropped
+
+    def clear(self):
+        self.crops.clear()
+        self.memory_bytes = 0
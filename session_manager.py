@@ -1,40 +1,181 @@
 import os
 import json
 
+
+def empty_aggregate():
+    return {"session_count": 0, "images_annotated": 0, "suitable_images": 0,
+            "per_annotator": {}, "per_day": {}, "per_label": {}}
+
+
+def add_to_aggregate(aggregate, session):
+    """Folds one session record into a running aggregate."""
+    annotated = session.get("images_annotated", 0)
+    suitable = session.get("suitable_images", 0)
+    timed = "active_seconds" in session  # Older sessions have no active time; they don't count towards rates
+    aggregate["session_count"] += 1
+    aggregate["images_annotated"] += annotated
+    aggregate["suitable_images"] += suitable
+    groups = ((aggregate["per_annotator"], session.get("annotator") or "unknown"),
+              (aggregate["per_day"], (session.get("start_time") or "unknown")[:10]))
+    for totals, key in groups:
+        entry = totals.setdefault(key, {"sessions": 0, "images_annotated": 0, "suitable_images": 0})
+        entry["sessions"] += 1
+        entry["images_annotated"] += annotated
+        entry["suitable_images"] += suitable
+        if timed:
+            entry["timed_images"] = entry.get("timed_images", 0) + annotated
+            entry["active_seconds"] = entry.get("active_seconds", 0.0) + session["active_seconds"]
+    for label, count in session.get("label_counts", {}).items():
+        aggregate["per_label"][label] = aggregate["per_label"].get(label, 0) + count
+
+
 class SessionManager:
     def __init__(self, history_file):
         """
         Initializes the session manager using the given history file.
-        Loads existing sessions if available.
+        Sessions are appended to a JSON-lines log next to it (session_history.jsonl);
+        running totals are cached with the log offset they cover, so loading only
+        reads sessions added since the last load. An old session_history.json is
+        migrated on first use.
         """
         self.history_file = history_file
-        self.sessions = []
+        base = os.path.splitext(history_file)[0]
+        self.log_file = base + ".jsonl"
+        self.cache_file = base + ".aggregate.json"
+        self.aggregate = empty_aggregate()
+        self.offset = 0  # Bytes of the log folded into self.aggregate
+        self.log_id = None  # Inode of the log the offset refers to; compaction replaces the file
         self.load_history()
 
     def load_history(self):
-        """Loads existing session history from the JSON file."""
-        if os.path.exists(self.history_file):
-            with open(self.history_file, "r") as f:
-                try:
-                    self.sessions = json.load(f)
-                except Exception:
-                    self.sessions = []
-        else:
-            self.sessions = []
+        """Loads the cached totals, then folds in any sessions logged after them."""
+        if not os.path.exists(self.log_file) and os.path.exists(self.history_file):
+            self._migrate_json_history()
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, "r") as f:
+                    cache = json.load(f)
+                self.aggregate = cache["aggregate"]
+                self.offset = cache["offset"]
+                self.log_id = cache["log_id"]
+            except (OSError, ValueError, KeyError):
+                self.aggregate, self.offset, self.log_id = empty_aggregate(), 0, None
+        self.refresh()
+
+    def refresh(self):
+        """Reads sessions appended to the log (by this or another annotator) since the last read."""
+        if not os.path.exists(self.log_file):
+            return
+        stat = os.stat(self.log_file)
+        if stat.st_ino != self.log_id or stat.st_size < self.offset:
+            # The log was compacted or replaced: start over from its first record
+            self.aggregate, self.offset, self.log_id = empty_aggregate(), 0, stat.st_ino
+        if stat.st_size == self.offset:
+            return
+        with open(self.log_file, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        # A line without its newline is still being written; leave it for the next refresh
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("type") == "snapshot":
+                self.aggregate = record["aggregate"]
+            else:
+                add_to_aggregate(self.aggregate, record)
+        self.offset += len(complete)
+        self._save_cache()
 
     def add_session(self, session_data):
-        """Appends the provided session data to the history and writes it to the file."""
-        self.sessions.append(session_data)
-        with open(self.history_file, "w") as f:
-            json.dump(self.sessions, f, indent=4)
+        """Appends the provided session data to the log as one line."""
+        line = json.dumps(session_data) + "\n"
+        # Single appended write per session, so concurrent annotators never interleave records
+        with open(self.log_file, "a") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.refresh()
+
+    def iter_sessions(self):
+        """Yields the session records still held in the log (compacted ones only survive as totals)."""
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("type") != "snapshot":
+                    yield record
+
+    def compact(self, keep_last=1000):
+        """
+        Folds all but the last keep_last sessions into a single snapshot record and
+        atomically replaces the log with snapshot + recent sessions.
+        Run it while no other annotator is saving a session to the same log.
+        """
+        self.refresh()
+        aggregate = empty_aggregate()
+        recent = []
+        with open(self.log_file, "r") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("type") == "snapshot":
+                    aggregate = record["aggregate"]
+                    continue
+                recent.append(record)
+                if len(recent) > keep_last:
+                    add_to_aggregate(aggregate, recent.pop(0))
+        tmp_path = self.log_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps({"type": "snapshot", "aggregate": aggregate}) + "\n")
+            f.writelines(json.dumps(record) + "\n" for record in recent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_file)
+        self.refresh()
 
     def get_total_suitable(self):
         """Returns the total number of suitable images annotated across all sessions."""
-        total = 0
-        for session in self.sessions:
-            total += session.get("suitable_images", 0)
-        return total
+        return self.aggregate["suitable_images"]
 
     def get_session_count(self):
         """Returns the number of sessions in history."""
-        return len(self.sessions)
+        return self.aggregate["session_count"]
+
+    def get_totals_by_annotator(self):
+        return self.aggregate["per_annotator"]
+
+    def get_totals_by_day(self):
+        return self.aggregate["per_day"]
+
+    def get_label_counts(self):
+        return self.aggregate["per_label"]
+
+    def _migrate_json_history(self):
+        """Converts the old session_history.json (one JSON array) into the JSON-lines log."""
+        try:
+            with open(self.history_file, "r") as f:
+                sessions = json.load(f)
+        except Exception:
+            sessions = []
+        tmp_path = self.log_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(json.dumps(session) + "\n" for session in sessions)
+        os.replace(tmp_path, self.log_file)
+        print(f"Migrated {len(sessions)} session(s) from {self.history_file} to {self.log_file}")
+
+    def _save_cache(self):
+        tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"log_id": self.log_id, "offset": self.offset, "aggregate": self.aggregate}, f)
+        os.replace(tmp_path, self.cache_file)
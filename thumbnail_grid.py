@@ -0,0 +1,193 @@
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import (Qt, QSize, QObject, QRunnable, QThreadPool, QAbstractListModel,
+                          QModelIndex, pyqtSignal)
+from PyQt5.QtGui import QImage, QImageReader, QPixmap, QColor
+from PyQt5.QtWidgets import QListView, QAbstractItemView
+
+from thumbnailer import find_thumbnail
+from video_source import parse_frame_id
+
+LABEL_KEYS = (Qt.Key_Return, Qt.Key_Enter, Qt.Key_Minus, Qt.Key_Backspace)
+
+
+def decode_thumbnail(image_path, size, thumbnail_path=None):
+    """
+    Decodes a QImage that fits size, preferring a pre-generated thumbnail.
+    Otherwise the reader is asked for a scaled decode, which JPEG does at reduced DCT scale.
+    """
+    reader = QImageReader(thumbnail_path or image_path)
+    reader.setAutoTransform(True)
+    source_size = reader.size()
+    if source_size.isValid():
+        reader.setScaledSize(source_size.scaled(size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull() and thumbnail_path:
+        return decode_thumbnail(image_path, size)
+    return image
+
+
+class _ThumbnailSignals(QObject):
+    decoded = pyqtSignal(int, str, QImage)
+
+
+class _ThumbnailTask(QRunnable):
+    """Decodes one tile on a worker thread."""
+    def __init__(self, row, image_path, size, find_thumbnail_path, signals):
+        super().__init__()
+        self.row = row
+        self.image_path = image_path
+        self.size = size
+        self.find_thumbnail_path = find_thumbnail_path
+        self.signals = signals
+
+    def run(self):
+        # The thumbnail lookup stats files, so it happens here rather than on the GUI thread
+        thumbnail_path = self.find_thumbnail_path(self.image_path)
+        self.signals.decoded.emit(self.row, self.image_path,
+                                  decode_thumbnail(self.image_path, self.size, thumbnail_path))
+
+
+class ThumbnailModel(QAbstractListModel):
+    def __init__(self, image_loader, tile_size=160, max_tiles=600, max_workers=4, parent=None):
+        """
+        List model over the ImageLoader's image list for the grid view.
+        Tiles are only decoded when the view asks for them, i.e. when they become visible,
+        on worker threads; decoded tiles are kept in a bounded LRU of pixmaps.
+        """
+        super().__init__(parent)
+        self.image_loader = image_loader
+        self.tile_size = QSize(tile_size, tile_size)
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()  # {image_path: QPixmap}, least recently used first
+        self.in_flight = set()
+        self.labels = {}  # {image_path: label} for images labeled while the grid was open
+        self.input_folder = None
+        self.thumbnail_folder = None
+        self.placeholder = QPixmap(self.tile_size)
+        self.placeholder.fill(QColor("#23272A"))
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_workers)
+        self.signals = _ThumbnailSignals()
+        self.signals.decoded.connect(self._on_decoded)
+
+    def set_thumbnails(self, input_folder, thumbnail_folder):
+        self.input_folder = input_folder
+        self.thumbnail_folder = thumbnail_folder
+
+    def refresh(self):
+        """Picks up a new image list, e.g. after a folder (re)load."""
+        self.beginResetModel()
+        self.cancel_pending()
+        self.tiles.clear()
+        self.labels = {}
+        self.endResetModel()
+
+    def cancel_pending(self):
+        """Drops queued decodes, e.g. for tiles that were scrolled past; visible tiles re-request."""
+        self.pool.clear()
+        self.in_flight.clear()
+
+    def set_labels(self, rows, label):
+        for row in rows:
+            self.labels[self.image_loader.image_list[row]] = label
+        for row in rows:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.BackgroundRole])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.image_loader.image_list)
+
+    def data(self, index, role=Qt.DisplayRole):
+        row = index.row()
+        if not index.isValid() or row >= len(self.image_loader.image_list):
+            return None
+        image_path = self.image_loader.image_list[row]
+        if role == Qt.DisplayRole:
+            label = self.labels.get(image_path)
+            name = os.path.basename(image_path)
+            return f"{name}\n[{label}]" if label else name
+        if role == Qt.DecorationRole:
+            return self._tile(row, image_path)
+        if role == Qt.BackgroundRole:
+            if image_path in self.labels or self.image_loader.is_labeled(row):
+                return QColor("#2F5233")
+            return None
+        if role == Qt.ToolTipRole:
+            return image_path
+        return None
+
+    def _tile(self, row, image_path):
+        pixmap = self.tiles.get(image_path)
+        if pixmap is not None:
+            self.tiles.move_to_end(image_path)
+            return pixmap
+        parsed = parse_frame_id(image_path) if self.image_loader.video_reader is not None else None
+        if parsed is not None:
+            # Video frames are not files: tiles show frames the reader has buffered, the rest stay blank
+            image = self.image_loader.video_reader.peek(parsed[1])
+            if image is None:
+                return self.placeholder
+            pixmap = QPixmap.fromImage(image.scaled(self.tile_size, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            self.tiles[image_path] = pixmap
+            while len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+            return pixmap
+        if image_path not in self.in_flight:
+            self.in_flight.add(image_path)
+            self.pool.start(_ThumbnailTask(row, image_path, self.tile_size, self._thumbnail_path, self.signals))
+        return self.placeholder
+
+    def _thumbnail_path(self, image_path):
+        if not self.thumbnail_folder or not self.input_folder:
+            return None
+        relative_path = os.path.relpath(image_path, self.input_folder).replace(os.sep, "/")
+        return find_thumbnail(self.thumbnail_folder, relative_path, image_path,
+                              min_side=self.tile_size.width() // 2)
+
+    def _on_decoded(self, row, image_path, image):
+        self.in_flight.discard(image_path)
+        image_list = self.image_loader.image_list
+        if image.isNull() or row >= len(image_list) or image_list[row] != image_path:
+            return
+        self.tiles[image_path] = QPixmap.fromImage(image)
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class ThumbnailGrid(QListView):
+    """
+    Icon-mode list view of a ThumbnailModel with multi-select.
+    Label keys (digits, "-", Backspace, Enter) are passed on to the parent window
+    instead of being used for keyboard search.
+    """
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setViewMode(QListView.IconMode)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)  # Lets the view lay out a million rows without asking for each one
+        self.setIconSize(model.tile_size)
+        self.setGridSize(QSize(model.tile_size.width() + 20, model.tile_size.height() + 50))
+        self.setWordWrap(True)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setStyleSheet("border: 2px solid #7289DA;")
+        self.verticalScrollBar().valueChanged.connect(model.cancel_pending)
+
+    def keyPressEvent(self, event):
+        if Qt.Key_0 <= event.key() <= Qt.Key_9 or event.key() in LABEL_KEYS:
+            event.ignore()
+            return
+        super().keyPressEvent(event)
+
+    def selected_rows(self):
+        return sorted(index.row() for index in self.selectionModel().selectedIndexes())
+
+    def select_row(self, row):
+        index = self.model().index(row)
+        self.setCurrentIndex(index)
+        self.scrollTo(index, QAbstractItemView.PositionAtCenter)
@@ -0,0 +1,215 @@
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+HASH_INDEX_FILE = "thumbnails.json"
+DEFAULT_THUMBNAIL_DIR = ".thumbnails"  # Hidden, so folder scans never pick thumbnails up as images
+
+
+def parse_size(text):
+    """Parses "50x50" into (50, 50)."""
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height or width)
+
+
+def thumbnail_path(output_folder, relative_path, size, flat=False):
+    """Where the thumbnail of relative_path at size lives: <output>/<W>x<H>/<relative_path> (or flat)."""
+    parts = relative_path.split("/")
+    if flat:
+        return os.path.join(output_folder, *parts)
+    return os.path.join(output_folder, f"{size[0]}x{size[1]}", *parts)
+
+
+def signature_path(target_path):
+    """Hidden sidecar next to a thumbnail recording the source it was made from."""
+    folder, name = os.path.split(target_path)
+    return os.path.join(folder, f".{name}.src")
+
+
+def source_signature(source_path):
+    stat = os.stat(source_path)
+    return f"{stat.st_mtime_ns} {stat.st_size}"
+
+
+def is_up_to_date(source_path, target_path):
+    """
+    True if target was made from source as it is now (same mtime and size). Comparing
+    against the recorded source rather than "target newer than source" catches a file
+    replaced by an older copy (cp -p, unzip) and a different file renamed into place.
+    """
+    try:
+        with open(signature_path(target_path), "r") as f:
+            recorded = f.read().strip()
+        return recorded == source_signature(source_path) and os.path.isfile(target_path)
+    except OSError:
+        return False
+
+
+def remove_thumbnails(thumbnail_folder, relative_paths):
+    """Deletes every size's thumbnail (and signature) of relative_paths, e.g. after their sources were renamed."""
+    if not os.path.isdir(thumbnail_folder):
+        return
+    size_dirs = [entry.path for entry in os.scandir(thumbnail_folder) if entry.is_dir() and "x" in entry.name]
+    for size_dir in size_dirs:
+        for relative_path in relative_paths:
+            path = os.path.join(size_dir, *relative_path.split("/"))
+            for stale in (path, signature_path(path)):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+
+def make_thumbnails(source_path, relative_path, output_folder, sizes, flat=False, known_hash=None):
+    """
+    Worker entry point: decodes source_path once and writes every requested size.
+    JPEGs are decoded in draft mode at the smallest DCT scale that still covers the
+    largest requested size. Outputs that are already up to date are skipped, by
+    the source's recorded mtime and size or, when known_hash is given, by the SHA-1
+    of the source file.
+    Returns (relative_path, source_hash or None, thumbnails written).
+    """
+    targets = [(size, thumbnail_path(output_folder, relative_path, size, flat)) for size in sizes]
+    data = None
+    source_hash = None
+    if known_hash is not None:
+        with open(source_path, "rb") as f:
+            data = f.read()
+        source_hash = hashlib.sha1(data).hexdigest()
+        todo = targets if source_hash != known_hash else [t for t in targets if not os.path.isfile(t[1])]
+        if source_hash == known_hash:
+            # Same content with a new mtime (e.g. touched or copied): re-stamp so find_thumbnail accepts it
+            for _, path in targets:
+                if os.path.isfile(path) and not is_up_to_date(source_path, path):
+                    with open(signature_path(path), "w") as f:
+                        f.write(source_signature(source_path))
+    else:
+        todo = [t for t in targets if not is_up_to_date(source_path, t[1])]
+    if not todo:
+        return relative_path, source_hash, 0
+    signature = source_signature(source_path)
+    largest = max((size for size, _ in todo), key=lambda s: s[0] * s[1])
+    with Image.open(io.BytesIO(data) if data is not None else source_path) as img:
+        img.draft("RGB", largest)  # No-op for non-JPEG formats
+        img.load()
+        for size, path in todo:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Resize the image (LANCZOS for high quality); write-then-rename so readers never see partial files
+            part_path = path + ".part"
+            img.resize(size, Image.LANCZOS).save(part_path, format=img.format or "JPEG")
+            os.replace(part_path, path)
+            with open(signature_path(path), "w") as f:
+                f.write(signature)
+    return relative_path, source_hash, len(todo)
+
+
+def list_images(directory, extensions, recursive=False, skip_dirs=()):
+    """Yields relative paths ("/"-separated) of the images under directory."""
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        with os.scandir(os.path.join(directory, rel_dir) if rel_dir else directory) as it:
+            for entry in it:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir():
+                    if recursive and not entry.name.startswith(".") and os.path.abspath(entry.path) not in skip_dirs:
+                        pending.append(rel_path)
+                elif entry.name.lower().endswith(extensions):
+                    yield rel_path
+
+
+def build_thumbnails(directory, output_folder, sizes, workers=None, check="mtime", flat=False,
+                     extensions=IMAGE_EXTENSIONS, recursive=False, chunksize=32):
+    """
+    Generates thumbnails for every image in directory on a process pool.
+    Returns a summary dictionary (images, thumbnails written, skipped, seconds).
+    """
+    directory = os.path.abspath(directory)
+    output_folder = os.path.abspath(output_folder)
+    os.makedirs(output_folder, exist_ok=True)
+    images = list(list_images(directory, extensions, recursive, skip_dirs={output_folder}))
+    hash_index_path = os.path.join(output_folder, HASH_INDEX_FILE)
+    hashes = {}
+    if check == "hash" and os.path.isfile(hash_index_path):
+        with open(hash_index_path, "r") as f:
+            hashes = json.load(f)
+    start = time.perf_counter()
+    written = 0
+    skipped = 0
+    n = len(images)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(make_thumbnails,
+                               [os.path.join(directory, *rel.split("/")) for rel in images], images,
+                               [output_folder] * n, [sizes] * n, [flat] * n,
+                               [hashes.get(rel, "") if check == "hash" else None for rel in images],
+                               chunksize=chunksize)
+        for rel, source_hash, count in results:
+            if source_hash is not None:
+                hashes[rel] = source_hash
+            written += count
+            skipped += count == 0
+    if check == "hash":
+        with open(hash_index_path + ".tmp", "w") as f:
+            json.dump(hashes, f)
+        os.replace(hash_index_path + ".tmp", hash_index_path)
+    return {"images": len(images), "written": written, "skipped": skipped,
+            "seconds": time.perf_counter() - start}
+
+
+def find_thumbnail(output_folder, relative_path, source_path, min_side=0):
+    """
+    Returns the path of the largest up-to-date thumbnail of relative_path whose
+    shorter side is at least min_side, or None.
+    """
+    if not os.path.isdir(output_folder):
+        return None
+    candidates = []
+    for entry in os.scandir(output_folder):
+        if entry.is_dir() and "x" in entry.name:
+            try:
+                size = parse_size(entry.name)
+            except ValueError:
+                continue
+            if min(size) >= min_side:
+                candidates.append(size)
+    for size in sorted(candidates, key=lambda s: s[0] * s[1], reverse=True):
+        path = thumbnail_path(output_folder, relative_path, size)
+        if is_up_to_date(source_path, path):
+            return path
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate thumbnails for a folder of images on all cores.")
+    parser.add_argument("directory", help="Folder with source images")
+    parser.add_argument("--output", default=None,
+                        help=f"Output folder (default: <directory>/{DEFAULT_THUMBNAIL_DIR})")
+    parser.add_argument("--size", action="append", type=parse_size,
+                        help="Thumbnail size such as 50x50; repeat for several sizes from one decode")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--check", choices=("mtime", "hash"), default="mtime",
+                        help="How to detect thumbnails that are already up to date")
+    parser.add_argument("--flat", action="store_true", help="Write a single size directly into the output folder")
+    parser.add_argument("--recursive", action="store_true", help="Include sub-folders")
+    parser.add_argument("--jpeg-only", action="store_true", help="Only process .jpg/.jpeg files")
+    args = parser.parse_args(argv)
+    sizes = args.size or [(50, 50)]
+    if args.flat and len(sizes) > 1:
+        parser.error("--flat only works with a single --size")
+    output = args.output or os.path.join(args.directory, DEFAULT_THUMBNAIL_DIR)
+    summary = build_thumbnails(args.directory, output, sizes, args.workers, args.check, args.flat,
+                               JPEG_EXTENSIONS if args.jpeg_only else IMAGE_EXTENSIONS, args.recursive)
+    print(f"{summary['images']} images, {summary['written']} thumbnails written, "
+          f"{summary['skipped']} up to date, {summary['seconds']:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
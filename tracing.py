@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+TRACE_ENV = "ANNOTATOR_TRACE"  # "1" to trace, or a .json path to export the trace to on exit
+
+
+class _NullSpan:
+    """Shared do-nothing span returned while tracing is off."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start_ns")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start_ns, time.perf_counter_ns(), self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled=False, max_events=200000):
+        """
+        Collects timed spans as Chrome trace "complete" events in a bounded buffer.
+        While disabled, span() returns a shared no-op context manager, so instrumented
+        code pays one attribute check per span.
+        """
+        self.enabled = enabled
+        self.events = deque(maxlen=max_events)  # Appends are atomic, so worker threads can record too
+        self.last_ms = {}  # {span name: duration of its latest occurrence in ms}
+        self.origin_ns = time.perf_counter_ns()
+        self.pid = os.getpid()
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def record(self, name, start_ns, end_ns, args=None):
+        duration_us = (end_ns - start_ns) / 1000
+        self.last_ms[name] = duration_us / 1000
+        event = {"name": name, "ph": "X", "ts": (start_ns - self.origin_ns) / 1000, "dur": duration_us,
+                 "pid": self.pid, "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def record_external(self, name, start_time_ns, end_time_ns, pid, args=None):
+        """
+        Records a span measured in another process with time.time_ns() (e.g. an augmentation
+        worker); it is shown on its own track under that process id.
+        """
+        if not self.enabled:
+            return
+        offset_ns = time.perf_counter_ns() - time.time_ns()
+        event = {"name": name, "ph": "X", "ts": (start_time_ns + offset_ns - self.origin_ns) / 1000,
+                 "dur": (end_time_ns - start_time_ns) / 1000, "pid": pid, "tid": pid}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def counter(self, name, **values):
+        """Records counter values (e.g. queue depths), shown as a graph in the trace viewer."""
+        if self.enabled:
+            self.events.append({"name": name, "ph": "C", "ts": (time.perf_counter_ns() - self.origin_ns) / 1000,
+                                "pid": self.pid, "args": values})
+
+    def export_chrome(self, path):
+        """Writes the recorded events as Chrome trace JSON (chrome://tracing, Perfetto)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"traceEvents": list(self.events), "displayTimeUnit": "ms"}, f)
+        os.replace(tmp_path, path)
+        return len(self.events)
+
+    def clear(self):
+        self.events.clear()
+        self.last_ms.clear()
+
+
+def trace_setting():
+    """Returns the ANNOTATOR_TRACE value, or "" when tracing is not requested."""
+    value = os.environ.get(TRACE_ENV, "")
+    return "" if value in ("", "0") else value
+
+
+# Process-wide tracer used by the instrumented modules
+tracer = Tracer(enabled=bool(trace_setting()))
+
+
+def span(name, **args):
+    """Times a block: `with span("image.decode"): ...`."""
+    return tracer.span(name, **args)
@@ -0,0 +1,283 @@
+import os
+import json
+import threading
+from array import array
+from collections import OrderedDict, deque
+
+import cv2
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from folder_manifest import FolderManifest
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.mts')
+SEEK_DISTANCE = 150  # Frames a grab() loop is cheaper than a keyframe seek for, at typical GOP sizes
+
+
+def is_video_file(path):
+    return os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def frame_id(video_path, frame):
+    """Pseudo path of a video frame, "<video>#<frame>"; its basename is the annotation row's image name."""
+    return f"{video_path}#{frame}"
+
+
+def parse_frame_id(image_path):
+    """Returns (video path, frame number) for a frame id, or None for an ordinary image path."""
+    video_path, sep, frame = image_path.rpartition("#")
+    if sep and frame.isdigit() and video_path.lower().endswith(VIDEO_EXTENSIONS):
+        return video_path, int(frame)
+    return None
+
+
+def frame_file_name(image_path):
+    """File name a labeled frame is written under: <video stem>_<frame>.jpg."""
+    video_path, frame = parse_frame_id(image_path)
+    return f"{os.path.splitext(os.path.basename(video_path))[0]}_{frame:06d}.jpg"
+
+
+class VideoFrameTable:
+    def __init__(self, video_path, frame_count, stride=1):
+        """
+        Stands in for a PathTable over every stride-th frame of a video: entry i is
+        frame i * stride, addressed by its frame id, so no per-frame strings are stored.
+        """
+        self.video_path = video_path
+        self.stride = stride
+        self.count = (frame_count + stride - 1) // stride if frame_count > 0 else 0
+        self.base_name = os.path.basename(video_path)
+
+    def frame(self, i):
+        return i * self.stride
+
+    def index_of(self, frame):
+        return frame // self.stride
+
+    def name(self, i):
+        return f"{self.base_name}#{i * self.stride}"
+
+    def relative_path(self, i):
+        return self.name(i)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("VideoFrameTable index out of range")
+        return frame_id(self.video_path, i * self.stride)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+
+class VideoManifest(FolderManifest):
+    def __init__(self, video_path, output_folder, stride=1):
+        """
+        FolderManifest for a video file: the "scan" just reads the frame count, and the
+        labeled bitmap / resume pointer work exactly as for a folder of images.
+        """
+        self.stride = max(1, int(stride))
+        super().__init__(video_path, output_folder, recursive=False)
+        if self.manifest_path:
+            # One manifest per stride, so changing the sampling never mixes up bitmaps
+            self.manifest_path = self.manifest_path.replace(".json", f"_s{self.stride}.json")
+            self.state_path = self.state_path.replace(".state.json", f"_s{self.stride}.state.json")
+        self.table = VideoFrameTable(self.folder, 0, self.stride)
+
+    def load(self):
+        if not self.manifest_path or not os.path.isfile(self.manifest_path):
+            return False
+        try:
+            with open(self.manifest_path, "r") as f:
+                data = json.load(f)
+            stat = os.stat(self.folder)
+        except (OSError, ValueError):
+            return False
+        if (data.get("video") != self.folder or data.get("stride") != self.stride
+                or data.get("mtime") != stat.st_mtime_ns or data.get("size") != stat.st_size):
+            return False
+        self._set_frame_count(data["frame_count"], stat)
+        self._load_state()
+        return True
+
+    def scan(self, on_found=None, should_stop=None):
+        capture = cv2.VideoCapture(self.folder)
+        if not capture.isOpened():
+            print(f"Error: Could not open video {self.folder}")
+            frame_count = 0
+        else:
+            # Container metadata; good enough for indexing, frames past the real end just fail to decode
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+        self._set_frame_count(frame_count, os.stat(self.folder))
+        if on_found and len(self.table):
+            on_found(self.table[0])
+        self.labeled = bytearray(len(self.table))
+        self.labeled_count = 0
+        self.first_unlabeled = 0
+        self.annotation_count = -1
+        self.save()
+        return True
+
+    def save(self):
+        if not self.manifest_path:
+            return
+        stat = os.stat(self.folder)
+        data = {"video": self.folder, "stride": self.stride, "frame_count": self.frame_count,
+                "mtime": stat.st_mtime_ns, "size": stat.st_size}
+        self._write_json(self.manifest_path, data)
+
+    def _set_frame_count(self, frame_count, stat):
+        self.frame_count = frame_count
+        self.table = VideoFrameTable(self.folder, frame_count, self.stride)
+        # Every frame shares the video's mtime/size, which is what cache keys compare against
+        self.mtimes = array('q', [stat.st_mtime_ns]) * len(self.table)
+        self.sizes = array('q', [stat.st_size]) * len(self.table)
+
+
+def frame_to_qimage(bgr):
+    """Converts a decoded BGR frame into a display-ready RGB32 QImage that owns its pixels."""
+    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    height, width = rgb.shape[:2]
+    return QImage(rgb.data, width, height, 3 * width, QImage.Format_RGB888).convertToFormat(QImage.Format_RGB32)
+
+
+class VideoFrameReader(QThread):
+    """
+    Decodes frames of one video on a background thread into a ring buffer of QImages.
+    The reader follows the annotator's position: it decodes the wanted frame and the
+    next `ahead` sampled frames, grabbing (not decoding) the frames in between, and
+    only seeks when the jump is too far to grab forward. frame_ready(frame) fires (on the
+    GUI thread, queued) whenever a frame lands in the buffer. Frames asked for with
+    write_frame() are saved on this thread too and reported by frame_written(frame, path, ok).
+    """
+    frame_ready = pyqtSignal(int)
+    frame_written = pyqtSignal(int, str, bool)
+
+    def __init__(self, video_path, stride=1, ahead=16, buffer_size=64, parent=None):
+        super().__init__(parent)
+        self.video_path = video_path
+        self.stride = max(1, int(stride))
+        self.ahead = ahead
+        self.buffer_size = max(buffer_size, ahead + 2)
+        self.frames = OrderedDict()  # {frame number: QImage}, least recently used first
+        self.condition = threading.Condition()
+        self.wanted = 0
+        self.end = None  # First frame that failed to decode, once the end is reached
+        self.position = 0  # Frame the next read() returns; None once a failed read left it unknown
+        self.writes = deque()  # (frame, path, quality) waiting to be saved, served before decoding ahead
+        self.stopping = False
+
+    def request(self, frame):
+        """Moves the decode window to start at frame."""
+        with self.condition:
+            self.wanted = frame
+            self.condition.notify_all()
+
+    def peek(self, frame):
+        """Returns the buffered QImage of frame without waiting, or None."""
+        with self.condition:
+            image = self.frames.get(frame)
+            if image is not None:
+                self.frames.move_to_end(frame)
+            return image
+
+    def failed(self, frame):
+        """True if frame lies past the last frame that could be decoded."""
+        with self.condition:
+            return self.end is not None and frame >= self.end
+
+    def write_frame(self, frame, path, quality=95):
+        """
+        Queues frame to be written to path as JPEG and returns immediately; frame_written
+        reports the outcome. Frames outside the buffer are decoded just for the write.
+        """
+        if self.isFinished():
+            self.frame_written.emit(frame, path, False)  # The video could not be opened
+            return
+        with self.condition:
+            self.writes.append((frame, path, quality))
+            self.condition.notify_all()
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.wait()
+
+    def _next_target(self):
+        """First sampled frame of the window that is not buffered yet, or None."""
+        for k in range(self.ahead + 1):
+            frame = self.wanted + k * self.stride
+            if self.end is not None and frame >= self.end:
+                return None
+            if frame not in self.frames:
+                return frame
+        return None
+
+    def run(self):
+        capture = cv2.VideoCapture(self.video_path)
+        if not capture.isOpened():
+            print(f"Error: Could not open video {self.video_path}")
+            with self.condition:
+                self.end = 0
+                self.condition.notify_all()
+            return
+        while True:
+            with self.condition:
+                target = self._next_target()
+                while target is None and not self.writes and not self.stopping:
+                    self.condition.wait()
+                    target = self._next_target()
+                if self.stopping:
+                    break
+                write = self.writes.popleft() if self.writes else None
+                image = self.frames.get(write[0]) if write else None
+            if write:
+                self._write(capture, image, *write)
+                continue
+            ok, bgr = self._read(capture, target)
+            with self.condition:
+                if ok:
+                    self.frames[target] = frame_to_qimage(bgr)
+                    while len(self.frames) > self.buffer_size:
+                        self.frames.popitem(last=False)
+                self.condition.notify_all()
+            if ok:
+                self.frame_ready.emit(target)
+        capture.release()
+
+    def _read(self, capture, target):
+        """Decodes target, grabbing forward from the current position when that beats a seek."""
+        position = self.position
+        if position is None or not 0 <= target - position <= SEEK_DISTANCE:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+            position = target
+        while position < target and capture.grab():
+            position += 1
+        ok, bgr = capture.read() if position == target else (False, None)
+        self.position = target + 1 if ok else None
+        if not ok:
+            with self.condition:
+                self.end = target if self.end is None else min(self.end, target)
+        return ok, bgr
+
+    def _write(self, capture, image, frame, path, quality):
+        """Saves frame (from the buffer when it is there) via a temporary file, so path is never partial."""
+        tmp_path = os.path.splitext(path)[0] + ".tmp.jpg"
+        if image is not None:
+            ok = image.save(tmp_path, "JPG", quality)
+        else:
+            ok, bgr = self._read(capture, frame)
+            ok = ok and cv2.imwrite(tmp_path, bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        try:
+            if ok:
+                os.replace(tmp_path, path)
+        except OSError:
+            ok = False
+        self.frame_written.emit(frame, path, bool(ok))
@@ -0,0 +1,187 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from csv_handler import CSVHandler
+from augmentation_pipeline import AugmentationPipeline
+from image_writer import ImageWriter, EncoderSettings, FORMATS
+from roi_store import RoiStore, CropCache
+
+logger = logging.getLogger("annotator.virtual_dataset")
+
+
+class VirtualDataset:
+    def __init__(self, output_folder, cache_size=1024, crop_budget_mb=256, size=None, rgb=False,
+                 skip_unsuitable=True):
+        """
+        Augmented samples produced on read from augmentation_recipes.csv instead of _augN files.
+        Each labeled image contributes variants 0..n (0 is the image itself, cropped to its ROI
+        if it has one); variant i is pipeline.apply(image, seed, i), exactly what augmented
+        mode would have written. Decoded sources are kept in a crop cache and produced
+        samples in an LRU of cache_size entries, so epochs over a working set that fits
+        stay in memory. size=(W, H) resizes every sample, which batches() needs.
+        Images relabeled unsuitable are left out unless skip_unsuitable is False.
+        """
+        self.output_folder = output_folder
+        self.size = size
+        self.rgb = rgb
+        csv_handler = CSVHandler.for_folder(output_folder)
+        annotations = csv_handler.load_existing_annotations(output_folder)
+        self.rois = RoiStore(output_folder).rois
+        self.records = []  # [(image_name, source_path, label, seed, pipeline_id)]
+        self.samples = []  # [(record index, variant)]
+        for image_name, (source_path, label, seed, variants, pipeline_id) in sorted(
+                csv_handler.load_augmentation_recipes(output_folder).items()):
+            current = annotations.get(image_name)
+            label = current[0] if current else label  # A later relabel wins over the recorded label
+            if skip_unsuitable and label.lower() == "unsuitable":
+                continue
+            record = len(self.records)
+            self.records.append((image_name, source_path, label, seed, pipeline_id))
+            self.samples.extend((record, variant) for variant in range(variants + 1))
+        self.pipelines = {}  # {pipeline id: AugmentationPipeline}
+        self.sources = CropCache(budget_mb=crop_budget_mb)
+        self.cache = OrderedDict()  # {sample index: ndarray}
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, i):
+        """Returns (image, label) for sample i; image is a uint8 (H, W, 3) array (BGR unless rgb)."""
+        if i < 0:
+            i += len(self.samples)
+        record, variant = self.samples[i]
+        label = self.records[record][2]
+        image = self.cache.get(i)
+        if image is not None:
+            self.cache.move_to_end(i)
+            self.hits += 1
+            return image, label
+        self.misses += 1
+        image = self.produce(record, variant)
+        self.cache[i] = image
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return image, label
+
+    def __iter__(self):
+        for i in range(len(self.samples)):
+            yield self[i]
+
+    @property
+    def classes(self):
+        return sorted({label for _, _, label, _, _ in self.records})
+
+    def variant_name(self, i):
+        """File name the sample is materialized under (<image>_aug<variant><ext>, as augmented mode names it)."""
+        record, variant = self.samples[i]
+        return f"{os.path.splitext(os.path.basename(self.records[record][1]))[0]}_aug{variant}"
+
+    def produce(self, record, variant):
+        image_name, source_path, _, seed, pipeline_id = self.records[record]
+        roi = self.rois.get(image_name)
+        source = self.sources.get(source_path, roi)
+        if source is None:
+            raise FileNotFoundError(f"Could not read source image {source_path}")
+        image = source if variant == 0 else self.pipeline(pipeline_id).apply(source, seed, variant)
+        if self.size and (image.shape[1], image.shape[0]) != tuple(self.size):
+            image = cv2.resize(image, tuple(self.size), interpolation=cv2.INTER_AREA)
+        if self.rgb:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return image
+
+    def batches(self, batch_size=64, shuffle=False, seed=None):
+        """Yields (images, labels) with images stacked to (n, H, W, 3); requires size."""
+        if not self.size:
+            raise ValueError("batches() needs a fixed sample size; pass size=(W, H)")
+        order = np.arange(len(self.samples))
+        if shuffle:
+            order = np.random.RandomState(seed).permutation(order)
+        for start in range(0, len(order), batch_size):
+            items = [self[int(i)] for i in order[start:start + batch_size]]
+            yield np.stack([image for image, _ in items]), [label for _, label in items]
+
+    def pipeline(self, pipeline_id):
+        pipeline = self.pipelines.get(pipeline_id)
+        if pipeline is None:
+            path = os.path.join(self.output_folder, f"augmentation_pipeline_{pipeline_id}.json")
+            pipeline = AugmentationPipeline.from_json(path) if os.path.isfile(path) else AugmentationPipeline()
+            if pipeline.spec_id() != pipeline_id:
+                logger.warning("pipeline %s not found, using the default pipeline %s", pipeline_id, pipeline.spec_id())
+            self.pipelines[pipeline_id] = pipeline
+        return pipeline
+
+    def materialize(self, target_folder, writer=None, csv_handler=None, session_id=None):
+        """
+        Writes every sample to target_folder, with annotations.csv and augmentations.csv rows,
+        i.e. what eager augmented mode would have produced. Returns the writer stats.
+        """
+        writer = writer or ImageWriter()
+        csv_handler = csv_handler or CSVHandler()
+        session_id = session_id or time.strftime("%Y%m%d_%H%M%S")
+        os.makedirs(target_folder, exist_ok=True)
+        rows = []
+        records = []
+        for i in range(len(self.samples)):
+            record, variant = self.samples[i]
+            image_name, source_path, label, seed, pipeline_id = self.records[record]
+            path = os.path.join(target_folder, self.variant_name(i) + writer.extension)
+            # Produced directly rather than through the LRU, so a full pass does not flush the cache
+            writer.write(path, self.produce(record, variant))
+            rows.append((path, label, session_id))
+            records.append((path, source_path, seed, variant, pipeline_id))
+            if len(rows) >= 1000:
+                csv_handler.save_annotations(rows, target_folder)
+                csv_handler.save_augmentations(records, target_folder)
+                rows, records = [], []
+        writer.flush()
+        csv_handler.save_annotations(rows, target_folder)
+        csv_handler.save_augmentations(records, target_folder)
+        return writer.stats()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"samples": len(self.samples), "sources": len(self.records), "cached_samples": len(self.cache),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "source_cache_mb": self.sources.memory_bytes / (1024 * 1024)}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Inspect or materialize the virtual augmented dataset of an output folder.")
+    parser.add_argument("--output-dir", required=True, help="Output folder holding augmentation_recipes.csv")
+    parser.add_argument("--materialize-to", help="Write every augmented sample (and its CSV rows) to this folder")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="jpg", help="Output image format (default: jpg)")
+    parser.add_argument("--quality", type=int, default=95, help="JPEG/WebP quality (default: 95)")
+    parser.add_argument("--writer-threads", type=int, default=4, help="Encode/write threads (default: 4)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    dataset = VirtualDataset(args.output_dir)
+    print(f"{len(dataset.records)} source images, {len(dataset)} samples, {len(dataset.classes)} classes")
+    if not args.materialize_to:
+        return 0
+    writer = ImageWriter(EncoderSettings(args.format, jpeg_quality=args.quality, webp_quality=args.quality),
+                         max_workers=args.writer_threads)
+    start = time.perf_counter()
+    stats = dataset.materialize(args.materialize_to, writer)
+    writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"Materialized {stats['written']} files ({stats['bytes_written'] / (1024 * 1024):.1f} MB, "
+          f"{stats['failed']} failed) in {elapsed:.1f}s to {args.materialize_to}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
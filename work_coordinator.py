@@ -0,0 +1,149 @@
+import os
+import time
+import hashlib
+import socket
+import sqlite3
+import getpass
+
+LEASE_DB_FILE = "work_leases.db"
+
+
+def default_worker_id():
+    """user@host:pid, unique per running annotator."""
+    return f"{getpass.getuser()}@{socket.gethostname()}:{os.getpid()}"
+
+
+def folder_key(folder, shared_root):
+    """
+    Stable lease key of an input folder: a hash of its path relative to shared_root (the
+    directory holding the shared output folder), so annotators that mount the share at
+    different places agree on it and adding images keeps the key.
+    """
+    folder = os.path.abspath(folder)
+    try:
+        relative = os.path.relpath(folder, os.path.abspath(shared_root))
+    except ValueError:  # Different drive on Windows
+        relative = folder
+    return hashlib.sha1(relative.replace(os.sep, "/").encode("utf-8")).hexdigest()[:16]
+
+
+class WorkCoordinator:
+    def __init__(self, db_path, folder_key, worker_id=None, chunk_size=200, lease_ttl=120.0):
+        """
+        SQLite lease table that hands annotators sharing an input folder disjoint chunks
+        of its (sorted) image list. A lease expires lease_ttl seconds after its last
+        heartbeat, so chunks held by an idle or crashed annotator go back to the pool.
+        Each acquire/heartbeat is one short transaction, so coordination cost stays flat
+        as annotators are added; annotation rows themselves go to the shared store.
+        The database uses a rollback journal rather than WAL, because it lives in a
+        shared folder and WAL's shared-memory index does not work over NFS/SMB; every
+        write takes the lock up front with BEGIN IMMEDIATE.
+        """
+        self.db_path = db_path
+        self.folder_key = folder_key
+        self.worker_id = worker_id or default_worker_id()
+        self.chunk_size = chunk_size
+        self.lease_ttl = lease_ttl
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS chunks (
+                                 folder TEXT NOT NULL,
+                                 chunk INTEGER NOT NULL,
+                                 start INTEGER NOT NULL,
+                                 end INTEGER NOT NULL,
+                                 state TEXT NOT NULL DEFAULT 'open',
+                                 owner TEXT,
+                                 expires REAL,
+                                 PRIMARY KEY (folder, chunk))""")
+        self.lease = None  # (chunk, start, end) currently held by this worker
+
+    def register(self, total):
+        """
+        Creates the chunk rows for a folder of total images. If the folder grew, the last
+        chunk is extended (and reopened if it was done) and new chunks are added.
+        """
+        rows = [(self.folder_key, i, start, min(start + self.chunk_size, total))
+                for i, start in enumerate(range(0, total, self.chunk_size))]
+        self._write("INSERT INTO chunks (folder, chunk, start, end) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (folder, chunk) DO UPDATE SET end = excluded.end, "
+                    "state = CASE WHEN state = 'done' THEN 'open' ELSE state END "
+                    "WHERE excluded.end > chunks.end", rows, many=True)
+
+    def acquire(self):
+        """
+        Leases the next chunk to work on: one this worker still holds, else the lowest
+        open or expired one. Returns (chunk, start, end), or None if nothing is left.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")  # Take the write lock so two workers can't pick the same row
+        try:
+            row = self.conn.execute(
+                "SELECT chunk, start, end FROM chunks WHERE folder = ? AND state = 'leased' AND owner = ? "
+                "ORDER BY chunk LIMIT 1", (self.folder_key, self.worker_id)).fetchone()
+            if row is None:
+                row = self.conn.execute(
+                    "SELECT chunk, start, end FROM chunks WHERE folder = ? "
+                    "AND (state = 'open' OR (state = 'leased' AND expires < ?)) ORDER BY chunk LIMIT 1",
+                    (self.folder_key, now)).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE chunks SET state = 'leased', owner = ?, expires = ? "
+                                  "WHERE folder = ? AND chunk = ?",
+                                  (self.worker_id, now + self.lease_ttl, self.folder_key, row[0]))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.lease = tuple(row) if row else None
+        return self.lease
+
+    def heartbeat(self):
+        """Extends the current lease. Returns False if it expired and another worker took the chunk."""
+        if self.lease is None:
+            return False
+        updated = self._write(
+            "UPDATE chunks SET expires = ? WHERE folder = ? AND chunk = ? AND owner = ? AND state = 'leased'",
+            (time.time() + self.lease_ttl, self.folder_key, self.lease[0], self.worker_id))
+        if updated == 0:
+            self.lease = None
+            return False
+        return True
+
+    def complete(self):
+        """Marks the current chunk as done."""
+        if self.lease is not None:
+            self._write("UPDATE chunks SET state = 'done', expires = NULL WHERE folder = ? AND chunk = ? "
+                        "AND owner = ?", (self.folder_key, self.lease[0], self.worker_id))
+            self.lease = None
+
+    def release(self):
+        """Hands the current chunk back unfinished, e.g. when the annotator closes."""
+        if self.lease is not None:
+            self._write("UPDATE chunks SET state = 'open', owner = NULL, expires = NULL "
+                        "WHERE folder = ? AND chunk = ? AND owner = ? AND state = 'leased'",
+                        (self.folder_key, self.lease[0], self.worker_id))
+            self.lease = None
+
+    def progress(self):
+        """Returns {"open": n, "leased": n, "done": n} chunk counts; expired leases count as open."""
+        counts = {"open": 0, "leased": 0, "done": 0}
+        for state, expired, count in self.conn.execute(
+                "SELECT state, state = 'leased' AND expires < ?, COUNT(*) FROM chunks WHERE folder = ? "
+                "GROUP BY 1, 2", (time.time(), self.folder_key)):
+            counts["open" if expired else state] += count
+        return counts
+
+    def close(self):
+        self.release()
+        self.conn.close()
+
+    def _write(self, sql, params, many=False):
+        """Runs one write statement in its own BEGIN IMMEDIATE transaction. Returns the changed row count."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self.conn.executemany(sql, params) if many else self.conn.execute(sql, params)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount